@@ -1,26 +1,41 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 import base64
 from io import BytesIO
 from datetime import datetime
 import os
-import json
+import sys
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.holdings_table import HoldingsTable
+from utils.portfolio_manager import PortfolioManager
+from utils.storage import JsonFileStorage
+from utils.holdings_grid import HoldingsGrid
+from utils.derived_cache import get_derived_cache
+from tabs.holdings_grid import render_holdings_grid
+from utils.chart_service import render_allocation_chart
+from utils.pdf_resources import get_pdf_resources
 
 # Set page configuration
 st.set_page_config(
     page_title="IndexCopilot - Portfolio Manager", page_icon="📊", layout="wide"
 )
 
+# Same file as the modular app, which may be journaling to portfolio.json.log
+portfolio_storage = JsonFileStorage("portfolio.json")
+# Batch metrics (value, gain/loss, CAGR) for every view
+portfolio_manager = PortfolioManager("portfolio.json", storage=portfolio_storage)
+
 # Initialize session state
 if "portfolio" not in st.session_state:
-    st.session_state.portfolio = {"name": "My Portfolio", "holdings": []}
+    st.session_state.portfolio = {"name": "My Portfolio", "holdings": HoldingsTable()}
     
     # Auto-load portfolio from file on first run
     if os.path.exists("portfolio.json"):
         try:
-            with open("portfolio.json", "r") as f:
-                st.session_state.portfolio = json.load(f)
+            st.session_state.portfolio = portfolio_storage.load()
         except Exception as e:
             st.error(f"Error loading portfolio: {str(e)}")
 
@@ -41,7 +56,7 @@ with st.sidebar:
     if st.session_state.portfolio["holdings"]:
         st.subheader("Quick Stats")
         total_holdings = len(st.session_state.portfolio["holdings"])
-        total_value = sum(h["quantity"] * h["current_price"] for h in st.session_state.portfolio["holdings"])
+        total_value = st.session_state.portfolio["holdings"].total_value()
         st.metric("Holdings", total_holdings)
         st.metric("Portfolio Value", f"₹{total_value:,.0f}")
 
@@ -54,39 +69,15 @@ st.markdown("---")
 # Function to generate PDF report
 def generate_pdf(portfolio):
     try:
-        from reportlab.pdfgen import canvas
         from reportlab.lib.pagesizes import letter
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-        from reportlab.lib.styles import getSampleStyleSheet
-        from reportlab.lib.units import inch
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
 
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        
-        # Try to register a Unicode-capable font
-        unicode_font_registered = False
-        font_paths = [
-            'C:/Windows/Fonts/arial.ttf',  # Windows
-            '/System/Library/Fonts/Arial.ttf',  # macOS
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',  # Linux
-        ]
-        
-        for font_path in font_paths:
-            try:
-                if os.path.exists(font_path):
-                    pdfmetrics.registerFont(TTFont('UnicodeFont', font_path))
-                    styles['Normal'].fontName = 'UnicodeFont'
-                    styles['Title'].fontName = 'UnicodeFont'
-                    styles['Heading2'].fontName = 'UnicodeFont'
-                    unicode_font_registered = True
-                    break
-            except:
-                continue
-            
+        # Font registered and styles built once per process
+        resources = get_pdf_resources()
+        styles = resources.styles
+
         story = []
 
         # Title
@@ -95,8 +86,8 @@ def generate_pdf(portfolio):
         story.append(Spacer(1, 12))
 
         # Portfolio summary
-        total_value = sum(h["quantity"] * h["current_price"] for h in portfolio["holdings"])
-        currency = "₹" if unicode_font_registered else "Rs."
+        total_value = portfolio["holdings"].total_value()
+        currency = resources.currency
         summary = Paragraph(f"<b>Total Value:</b> {currency}{total_value:,.2f}<br/><b>Number of Holdings:</b> {len(portfolio['holdings'])}", styles['Normal'])
         story.append(summary)
         story.append(Spacer(1, 12))
@@ -108,29 +99,19 @@ def generate_pdf(portfolio):
 
         # Table data
         data = [['Asset Name', 'Type', 'Quantity', 'Price', 'Value']]
-        for holding in portfolio["holdings"]:
-            value = holding["quantity"] * holding["current_price"]
+        holdings_df = get_derived_cache(st.session_state).metrics(portfolio, portfolio_manager)
+        columns = ["asset_name", "asset_type", "quantity", "current_price", "value"]
+        for asset_name, asset_type, quantity, current_price, value in zip(*(holdings_df[col] for col in columns)):
             data.append([
-                holding["asset_name"][:25],
-                holding["asset_type"],
-                f"{holding['quantity']:.2f}",
-                f"{currency}{holding['current_price']:,.2f}",
+                asset_name[:25],
+                asset_type,
+                f"{quantity:.2f}",
+                f"{currency}{current_price:,.2f}",
                 f"{currency}{value:,.2f}"
             ])
 
         table = Table(data)
-        font_name = 'UnicodeFont' if unicode_font_registered else 'Helvetica'
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), font_name),
-            ('FONTNAME', (0, 1), (-1, -1), font_name),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        table.setStyle(resources.holdings_table_style)
         story.append(table)
 
         doc.build(story)
@@ -163,71 +144,45 @@ with tab1:
 
     # Display holdings if available
     if st.session_state.portfolio["holdings"]:
-        # Convert holdings to DataFrame for display
-        holdings_df = pd.DataFrame(st.session_state.portfolio["holdings"])
+        holdings = st.session_state.portfolio["holdings"]
 
         # Calculate total value
-        total_value = sum(
-            h["quantity"] * h["current_price"]
-            for h in st.session_state.portfolio["holdings"]
-        )
+        total_value = holdings.total_value()
 
         # Display portfolio summary
         col1, col2, col3 = st.columns(3)
         with col1:
             st.metric("Total Value", f"₹{total_value:,.2f}")
         with col2:
-            st.metric("Number of Holdings", len(holdings_df))
+            st.metric("Number of Holdings", len(holdings))
         with col3:
             st.metric("Last Updated", datetime.now().strftime("%Y-%m-%d"))
 
         # Display holdings table
         st.subheader("Holdings")
 
-        # Add value and gain/loss columns
-        holdings_df["value"] = holdings_df["quantity"] * holdings_df["current_price"]
-        holdings_df["gain_loss"] = (holdings_df["current_price"] - holdings_df["purchase_price"]) * holdings_df["quantity"]
-        
-        # Add gain/loss indicators with colors
-        def format_gain_loss(value):
-            if value > 0:
-                return f"▲ ₹{value:,.2f}"
-            elif value < 0:
-                return f"▼ ₹{abs(value):,.2f}"
-            else:
-                return f"₹{value:,.2f}"
-        
-        holdings_df["gain_loss_formatted"] = holdings_df["gain_loss"].apply(format_gain_loss)
-        
-        # Create a custom display for gain/loss with colors
-        for idx, row in holdings_df.iterrows():
-            if row['gain_loss'] > 0:
-                holdings_df.at[idx, 'gain_loss_display'] = f":green[▲ ₹{row['gain_loss']:,.2f}]"
-            elif row['gain_loss'] < 0:
-                holdings_df.at[idx, 'gain_loss_display'] = f":red[▼ ₹{abs(row['gain_loss']):,.2f}]"
-            else:
-                holdings_df.at[idx, 'gain_loss_display'] = f"₹{row['gain_loss']:,.2f}"
+        # Sorted, filtered and paginated on the server, one grid per portfolio change,
+        # built from the batch metrics and their display strings
+        cache = get_derived_cache(st.session_state)
+        grid = cache.get(
+            st.session_state.portfolio, f"holdings_grid:{datetime.now().date().isoformat()}",
+            lambda: HoldingsGrid(cache.display_metrics(st.session_state.portfolio, portfolio_manager))
+        )
 
         # Display as table
-        st.dataframe(
-            holdings_df,
-            column_config={
+        render_holdings_grid(
+            grid,
+            {
                 "asset_id": st.column_config.TextColumn("Asset ID"),
                 "asset_name": st.column_config.TextColumn("Asset Name"),
                 "asset_type": st.column_config.TextColumn("Type"),
                 "quantity": st.column_config.NumberColumn("Quantity", format="%.2f"),
-                "purchase_price": st.column_config.NumberColumn(
-                    "Purchase Price", format="₹%.2f"
-                ),
-                "current_price": st.column_config.NumberColumn(
-                    "Current Price", format="₹%.2f"
-                ),
-                "purchase_date": st.column_config.TextColumn("Purchase Date"),
-                "value": st.column_config.NumberColumn("Value", format="₹%.2f"),
+                "purchase_price_display": st.column_config.TextColumn("Purchase Price"),
+                "current_price_display": st.column_config.TextColumn("Current Price"),
+                "purchase_date": st.column_config.DateColumn("Purchase Date"),
+                "value_display": st.column_config.TextColumn("Value"),
                 "gain_loss_display": st.column_config.TextColumn("Gain/Loss"),
             },
-            hide_index=True,
-            use_container_width=True,
         )
 
         # Asset allocation chart
@@ -236,44 +191,17 @@ with tab1:
         # Center the chart with limited width
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            # Group by asset type
-            asset_allocation = holdings_df.groupby("asset_type")["value"].sum()
-            
-            # Create doughnut chart
-            fig, ax = plt.subplots(figsize=(6, 6))
-            
-            # Create labels with percentage and amount
-            labels = []
-            for asset_type, value in asset_allocation.items():
-                percentage = (value / total_value) * 100
-                labels.append(f"{asset_type}: {percentage:.1f}% - ₹{value:,.0f}")
+            # Per-type values kept up to date by the holdings table
+            asset_allocation = st.session_state.portfolio["holdings"].allocation_by_type()
             
-            wedges, texts, autotexts = ax.pie(
-                asset_allocation,
-                labels=labels,
-                autopct="",
-                startangle=90,
-                pctdistance=0.85,
-                wedgeprops=dict(width=0.5)
-            )
-            
-            # Add center text
-            ax.text(0, 0, f"Total\n₹{total_value:,.0f}", 
-                   horizontalalignment='center', verticalalignment='center',
-                   fontsize=12, fontweight='bold')
-            
-            ax.axis("equal")
-            plt.tight_layout()
-            st.pyplot(fig)
+            # Rendered through the Figure API and cached per allocation vector
+            chart = render_allocation_chart(asset_allocation, total_value)
+            st.image(chart.image)
             
             # Add legend with matching colors
             st.markdown("**Asset Breakdown:**")
-            for i, (asset_type, value) in enumerate(asset_allocation.items()):
-                percentage = (value / total_value) * 100
-                # Get the actual color from the wedge
-                color = wedges[i].get_facecolor()
-                color_hex = f"#{int(color[0]*255):02x}{int(color[1]*255):02x}{int(color[2]*255):02x}"
-                st.markdown(f"<span style='color: {color_hex}'>●</span> **{asset_type}**: {percentage:.1f}% (₹{value:,.2f})", unsafe_allow_html=True)
+            for entry in chart.legend:
+                st.markdown(f"<span style='color: {entry.color}'>●</span> **{entry.asset_type}**: {entry.percentage:.1f}% (₹{entry.value:,.2f})", unsafe_allow_html=True)
 
 
     else:
@@ -329,12 +257,11 @@ with tab2:
                 ]
 
                 if all(col in holdings_df.columns for col in required_columns):
-                    # Convert to list of dictionaries
-                    holdings = holdings_df.to_dict(orient="records")
-
                     # Add current_price equal to purchase_price for now
-                    for holding in holdings:
-                        holding["current_price"] = holding["purchase_price"]
+                    holdings_df["current_price"] = holdings_df["purchase_price"]
+
+                    # Convert to the columnar holdings store
+                    holdings = HoldingsTable.from_frame(holdings_df)
 
                     # Update session state
                     st.session_state.portfolio["holdings"] = holdings
@@ -389,15 +316,14 @@ with tab3:
     st.subheader("Analytics")
     
     if st.session_state.portfolio["holdings"]:
-        holdings_df = pd.DataFrame(st.session_state.portfolio["holdings"])
-        holdings_df["value"] = holdings_df["quantity"] * holdings_df["current_price"]
-        holdings_df["gain_loss"] = (holdings_df["current_price"] - holdings_df["purchase_price"]) * holdings_df["quantity"]
+        # Value and gain/loss of every holding from the cached batch metrics
+        holdings_df = get_derived_cache(st.session_state).metrics(st.session_state.portfolio, portfolio_manager)
         
         # Portfolio performance metrics
         col1, col2, col3, col4 = st.columns(4)
         
-        total_investment = sum(h["quantity"] * h["purchase_price"] for h in st.session_state.portfolio["holdings"])
-        total_current_value = sum(h["quantity"] * h["current_price"] for h in st.session_state.portfolio["holdings"])
+        total_investment = st.session_state.portfolio["holdings"].total_investment()
+        total_current_value = st.session_state.portfolio["holdings"].total_value()
         total_gain_loss = total_current_value - total_investment
         gain_loss_percentage = (total_gain_loss / total_investment) * 100 if total_investment > 0 else 0
         
@@ -423,7 +349,7 @@ with tab4:
 
         with col1:
             # Export to CSV
-            holdings_df = pd.DataFrame(st.session_state.portfolio["holdings"])
+            holdings_df = st.session_state.portfolio["holdings"].to_frame()
             csv = holdings_df.to_csv(index=False)
             st.download_button(
                 label="📊 Download CSV Report",
@@ -454,8 +380,7 @@ with tab4:
     with col1:
         if st.button("💾 Save Portfolio"):
             try:
-                with open("portfolio.json", "w") as f:
-                    json.dump(st.session_state.portfolio, f)
+                portfolio_storage.save(st.session_state.portfolio)
                 st.success("✓ Portfolio saved successfully!")
             except Exception as e:
                 st.error(f"Error saving portfolio: {str(e)}")
@@ -464,8 +389,7 @@ with tab4:
         if os.path.exists("portfolio.json"):
             if st.button("🔄 Reload Portfolio"):
                 try:
-                    with open("portfolio.json", "r") as f:
-                        st.session_state.portfolio = json.load(f)
+                    st.session_state.portfolio = portfolio_storage.load()
                     st.success("✓ Portfolio reloaded successfully!")
                     st.rerun()
                 except Exception as e:
@@ -7,18 +7,31 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from utils.portfolio_manager import PortfolioManager
 from utils.export_manager import ExportManager
+from utils.holdings_table import HoldingsTable
+from utils.price_provider import get_price_provider
+from utils.instrumentation import debug_enabled, registry
 from tabs.summary import render_summary_tab
 from tabs.add_holdings import render_add_holdings_tab
 from tabs.analytics import render_analytics_tab
 from tabs.reports import render_reports_tab
+from tabs.debug import render_debug_panel
 
 # Set page configuration
 st.set_page_config(
     page_title="IndexCopilot - Portfolio Manager", page_icon="📊", layout="wide"
 )
 
+# INDEXCOPILOT_DEBUG=1 records the calls of each rerun for the sidebar timing panel
+DEBUG = debug_enabled()
+if DEBUG:
+    registry.begin_rerun()
+
 # Initialize managers
-portfolio_manager = PortfolioManager()
+# Storage backend follows the file extension: .db/.sqlite for SQLite, .npz/.parquet for binary
+# snapshots, otherwise journaled JSON
+# Current prices come from INDEXCOPILOT_PRICE_SOURCE (quote URL or price file) when set
+portfolio_manager = PortfolioManager(os.environ.get("INDEXCOPILOT_PORTFOLIO", "portfolio.json"), journal=True,
+                                     price_provider=get_price_provider())
 export_manager = ExportManager()
 
 # Initialize session state
@@ -27,7 +40,7 @@ if "portfolio" not in st.session_state:
         st.session_state.portfolio = portfolio_manager.load_portfolio()
     except Exception as e:
         st.error(f"Error loading portfolio: {str(e)}")
-        st.session_state.portfolio = {"name": "My Portfolio", "holdings": []}
+        st.session_state.portfolio = {"name": "My Portfolio", "holdings": HoldingsTable()}
 
 # Remove sidebar - it's redundant with main content
 
@@ -36,20 +49,29 @@ st.title("IndexCopilot")
 st.markdown("### Portfolio Manager")
 st.markdown("---")
 
-# Main content area with tabs
-tab1, tab2, tab3, tab4 = st.tabs(["Portfolio Summary", "Add Holdings", "Analytics", "Reports"])
-
-with tab1:
-    render_summary_tab(portfolio_manager)
+# Main content area: st.tabs would run every tab body on each rerun, so only the
+# selected view's render function is called
+VIEWS = {
+    "Portfolio Summary": lambda: render_summary_tab(portfolio_manager),
+    "Add Holdings": lambda: render_add_holdings_tab(portfolio_manager),
+    "Analytics": lambda: render_analytics_tab(portfolio_manager),
+    "Reports": lambda: render_reports_tab(portfolio_manager, export_manager),
+}
+active_view = st.radio(
+    "View", list(VIEWS), horizontal=True, key="active_view", label_visibility="collapsed"
+)
 
-with tab2:
-    render_add_holdings_tab(portfolio_manager)
+# Revalue at current market prices once per rerun, before the view reads the holdings;
+# a repriced table gets a new version, which invalidates its derived data
+try:
+    portfolio_manager.refresh_prices(st.session_state.portfolio)
+except Exception as e:
+    st.warning(f"Could not refresh prices: {str(e)}")
 
-with tab3:
-    render_analytics_tab(portfolio_manager)
+VIEWS[active_view]()
 
-with tab4:
-    render_reports_tab(portfolio_manager, export_manager)
+if DEBUG:
+    render_debug_panel(registry.end_rerun())
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,60 @@
+"""Headless end-of-day batch: metrics, CSV/JSON summaries and PDF reports for many portfolios
+
+    python batch.py portfolios/ --output reports/ --workers 8
+    python batch.py portfolios/ --format json --format csv --as-of 2025-03-31
+
+Uses the same PortfolioManager and ExportManager as the Streamlit apps
+without importing Streamlit.
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.batch_runner import OUTPUT_FORMATS, find_portfolios, run_batch
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Process a directory of portfolio files in parallel")
+    parser.add_argument("input", help="directory of portfolio files (.json, .db, .sqlite, .npz, .parquet), or a single file")
+    parser.add_argument("-o", "--output", default="batch_output", help="directory for the generated files")
+    parser.add_argument("-f", "--format", dest="formats", action="append", choices=OUTPUT_FORMATS,
+                        help="output to generate; repeat for several (default: all)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count; 1 runs in-process)")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None,
+                        help="valuation date for holding periods, CAGR and XIRR (default: today)")
+    parser.add_argument("--no-chart", action="store_true", help="leave the allocation chart out of PDFs")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the throughput report")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if os.path.isdir(args.input):
+        paths = find_portfolios(args.input, output_dir=args.output)
+    elif os.path.isfile(args.input):
+        paths = [args.input]
+    else:
+        print(f"No such file or directory: {args.input}", file=sys.stderr)
+        return 2
+    if not paths:
+        print(f"No portfolio files found in {args.input}", file=sys.stderr)
+        return 2
+
+    def report_progress(result):
+        if not args.quiet:
+            status = f"{result.holdings} holdings in {result.seconds:.2f}s" if result.ok else f"FAILED: {result.error}"
+            print(f"{result.path}: {status}", flush=True)
+
+    report = run_batch(paths, args.output, formats=args.formats or OUTPUT_FORMATS, workers=args.workers,
+                       as_of=args.as_of, include_chart=not args.no_chart, progress_callback=report_progress)
+    print(report.format())
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""Benchmarks for the core hot paths on synthetic portfolios
+
+    python benchmarks/run_benchmarks.py                         # all sizes, compare with baseline.json
+    python benchmarks/run_benchmarks.py --sizes 10 1000 --check # exit 1 on a regression
+    python benchmarks/run_benchmarks.py --save-baseline         # record new baseline numbers
+
+Every benchmark is timed (best of --repeat runs) and then run once more under
+tracemalloc for its peak Python memory, so the tracing overhead never shows
+up in the timings. Results are compared with a stored baseline JSON; a
+benchmark is flagged when its time or peak memory grows beyond the tolerance.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.export_manager import ExportManager
+from utils.holdings_table import HoldingsTable
+from utils.portfolio_manager import PortfolioManager
+from utils.tax_lots import TaxLotLedger
+
+DEFAULT_SIZES = (10, 1_000, 100_000, 1_000_000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_REPEAT = 3
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.25
+# Differences below these floors are noise, not regressions
+MIN_SECONDS = 0.005
+MIN_PEAK_MB = 1.0
+# PDF layout is linear but slow (~0.7ms per row); larger sizes need --pdf-max-rows
+PDF_MAX_ROWS = 100_000
+
+ASSET_TYPES = np.array(["Equity", "Mutual Fund", "ETF", "Bond", "Insurance"])
+
+
+def synthetic_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    """Holdings CSV frame with n rows spread over n // 10 + 1 distinct assets"""
+    rng = np.random.default_rng(seed)
+    asset_numbers = rng.integers(0, n // 10 + 1, n)
+    purchase_price = np.round(rng.uniform(10, 5_000, n), 2)
+    start = np.datetime64("2015-01-01")
+    purchase_dates = start + rng.integers(0, 3_650, n).astype("timedelta64[D]")
+    return pd.DataFrame({
+        "asset_type": ASSET_TYPES[asset_numbers % len(ASSET_TYPES)],
+        "asset_id": np.char.add("ASSET", asset_numbers.astype(str)),
+        "asset_name": np.char.add("Synthetic Asset ", asset_numbers.astype(str)),
+        "quantity": rng.integers(1, 500, n).astype(np.float64),
+        "purchase_price": purchase_price,
+        "current_price": np.round(purchase_price * rng.uniform(0.5, 2.0, n), 2),
+        "purchase_date": np.datetime_as_string(purchase_dates, unit="D"),
+    })
+
+
+def synthetic_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """A buy per holding on its purchase date, then every third holding sold in half FIFO at year end"""
+    buys = pd.DataFrame({
+        "date": df["purchase_date"], "action": "buy", "asset_id": df["asset_id"],
+        "quantity": df["quantity"], "price": df["purchase_price"],
+    })
+    sold = df.iloc[::3]
+    sells = pd.DataFrame({
+        "date": "2024-12-31", "action": "sell", "asset_id": sold["asset_id"],
+        "quantity": sold["quantity"] / 2, "price": sold["current_price"],
+    })
+    return pd.concat([buys, sells], ignore_index=True)
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # setup(frame, workdir) returns the zero-argument callable that is measured
+    setup: Callable[[pd.DataFrame, str], Callable[[], object]]
+    max_rows: Optional[int] = None
+
+
+def _portfolio(df: pd.DataFrame) -> Dict:
+    return {"name": "Benchmark", "holdings": HoldingsTable.from_frame(df)}
+
+
+def _setup_validate(df, workdir):
+    portfolio_manager = PortfolioManager(os.path.join(workdir, "validate.json"))
+    csv_df = df.drop(columns=["current_price"])
+    return lambda: portfolio_manager.validate_csv_data(csv_df)
+
+
+def _setup_metrics(df, workdir):
+    # The frame-wide form of calculate_gain_loss and calculate_cagr
+    portfolio_manager = PortfolioManager(os.path.join(workdir, "metrics.json"))
+    return lambda: portfolio_manager.compute_metrics(df)
+
+
+def _setup_save(extension):
+    def setup(df, workdir):
+        portfolio = _portfolio(df)
+        path = os.path.join(workdir, f"save{extension}")
+
+        def run():
+            if os.path.exists(path):
+                os.remove(path)
+            PortfolioManager(path).save_portfolio(portfolio)
+        return run
+    return setup
+
+
+def _setup_load(extension):
+    def setup(df, workdir):
+        path = os.path.join(workdir, f"load{extension}")
+        PortfolioManager(path).save_portfolio(_portfolio(df))
+        return lambda: PortfolioManager(path).load_portfolio()
+    return setup
+
+
+def _setup_export_csv(df, workdir):
+    export_manager = ExportManager()
+    portfolio = _portfolio(df)
+    return lambda: export_manager.export_to_csv(portfolio)
+
+
+def _setup_pdf(df, workdir):
+    export_manager = ExportManager()
+    portfolio = _portfolio(df)
+    return lambda: export_manager.generate_pdf_report(portfolio)
+
+
+def _setup_replay(df, workdir):
+    trades = synthetic_trades(df)
+    return lambda: TaxLotLedger().replay(trades)
+
+
+def _setup_positions(df, workdir):
+    holdings = _portfolio(df)["holdings"]
+    return lambda: TaxLotLedger.from_holdings(holdings).positions()
+
+
+def _setup_import(df, workdir):
+    # Full replace: parse every row, then rewrite the stored table
+    csv_bytes = df.to_csv(index=False).encode()
+    portfolio_manager = PortfolioManager(os.path.join(workdir, "import.db"))
+
+    def run():
+        result = portfolio_manager.import_csv(io.BytesIO(csv_bytes))
+        portfolio_manager.save_portfolio({"name": "Benchmark", "holdings": result.holdings})
+    return run
+
+
+def _setup_merge(df, workdir):
+    # Re-import of the stored portfolio with 1% of the quantities changed; each
+    # run merges into a fresh table over the same buffers and rewrites the same rows
+    path = os.path.join(workdir, "merge.db")
+    portfolio_manager = PortfolioManager(path)
+    portfolio_manager.save_portfolio(_portfolio(df))
+    columns = _portfolio(df)["holdings"].to_columns()
+    changed = df.copy()
+    changed.loc[changed.index[::100], "quantity"] += 1
+    csv_bytes = changed.to_csv(index=False).encode()
+
+    def run():
+        portfolio = {"name": "Benchmark", "holdings": HoldingsTable.from_columns(*columns)}
+        return portfolio_manager.merge_csv(portfolio, io.BytesIO(csv_bytes))
+    return run
+
+
+BENCHMARKS = [
+    Benchmark("validate_csv_data", _setup_validate),
+    Benchmark("compute_metrics", _setup_metrics),
+    Benchmark("save_portfolio_json", _setup_save(".json")),
+    Benchmark("load_portfolio_json", _setup_load(".json")),
+    Benchmark("save_portfolio_sqlite", _setup_save(".db")),
+    Benchmark("load_portfolio_sqlite", _setup_load(".db")),
+    Benchmark("save_portfolio_npz", _setup_save(".npz")),
+    Benchmark("load_portfolio_npz", _setup_load(".npz")),
+    Benchmark("export_to_csv", _setup_export_csv),
+    Benchmark("generate_pdf_report", _setup_pdf, max_rows=PDF_MAX_ROWS),
+    Benchmark("replay_trades", _setup_replay),
+    Benchmark("tax_lot_positions", _setup_positions),
+    Benchmark("import_csv_sqlite", _setup_import),
+    Benchmark("merge_csv_sqlite", _setup_merge),
+]
+
+
+def measure(run: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Best wall time over ``repeat`` runs and peak traced memory of one more run"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": min(timings), "peak_mb": peak / 2 ** 20}
+
+
+def run_benchmarks(sizes, names: Optional[List[str]] = None, repeat: int = DEFAULT_REPEAT,
+                   pdf_max_rows: int = PDF_MAX_ROWS, progress_callback=None) -> Dict[str, Dict[str, float]]:
+    """Results keyed "<benchmark>@<rows>"; benchmarks above their row limit are skipped"""
+    results: Dict[str, Dict[str, float]] = {}
+    workdir = tempfile.mkdtemp(prefix="indexcopilot-bench-")
+    try:
+        for size in sizes:
+            df = synthetic_frame(size)
+            for benchmark in BENCHMARKS:
+                if names and benchmark.name not in names:
+                    continue
+                max_rows = pdf_max_rows if benchmark.name == "generate_pdf_report" else benchmark.max_rows
+                if max_rows is not None and size > max_rows:
+                    continue
+                key = f"{benchmark.name}@{size}"
+                results[key] = measure(benchmark.setup(df, workdir), repeat if size < 1_000_000 else 1)
+                if progress_callback:
+                    progress_callback(key, results[key])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            time_tolerance: float = TIME_TOLERANCE, memory_tolerance: float = MEMORY_TOLERANCE) -> List[str]:
+    """Regressions against the baseline, one message per slower or hungrier benchmark"""
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        seconds_limit = max(before["seconds"] * (1 + time_tolerance), before["seconds"] + MIN_SECONDS)
+        if result["seconds"] > seconds_limit:
+            regressions.append(f"{key}: {result['seconds']:.4f}s vs baseline {before['seconds']:.4f}s")
+        memory_limit = max(before["peak_mb"] * (1 + memory_tolerance), before["peak_mb"] + MIN_PEAK_MB)
+        if result["peak_mb"] > memory_limit:
+            regressions.append(f"{key}: {result['peak_mb']:.1f}MB peak vs baseline {before['peak_mb']:.1f}MB")
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f).get("results", {})
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]]) -> None:
+    """Merge results into the baseline file, keeping entries that were not re-run"""
+    merged = load_baseline(path)
+    merged.update({key: {name: round(value, 6) for name, value in result.items()} for key, result in results.items()})
+    payload = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": dict(sorted(merged.items())),
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the core hot paths on synthetic portfolios")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="holdings per portfolio")
+    parser.add_argument("--only", nargs="+", choices=[benchmark.name for benchmark in BENCHMARKS],
+                        help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--pdf-max-rows", type=int, default=PDF_MAX_ROWS, help="largest size the PDF benchmark runs at")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results into the baseline file")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--check", action="store_true", help="exit with status 1 when a regression is found")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    baseline = load_baseline(args.baseline)
+
+    def report(key, result):
+        before = baseline.get(key)
+        change = f"  ({result['seconds'] / before['seconds']:.2f}x baseline)" if before and before["seconds"] else ""
+        print(f"{key:<36} {result['seconds']:>10.4f}s {result['peak_mb']:>10.1f}MB{change}", flush=True)
+
+    print(f"{'benchmark@rows':<36} {'time':>11} {'peak':>12}")
+    results = run_benchmarks(args.sizes, args.only, args.repeat, args.pdf_max_rows, progress_callback=report)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print("No regressions" if baseline else f"No baseline at {args.baseline}; run with --save-baseline")
+    return 1 if regressions and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
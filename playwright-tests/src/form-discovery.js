@@ -72,8 +72,8 @@ class FormDiscovery {
     // Wait longer for Streamlit to fully load
     await page.waitForTimeout(5000);
     
-    // Click through tabs to discover all forms
-    const tabs = await page.locator('[data-testid="stTabs"] button, .stTabs button').all();
+    // Click through tabs (or the view selector of the modular app) to discover all forms
+    const tabs = await page.locator('[data-testid="stTabs"] button, .stTabs button, .st-key-active_view label').all();
     console.log(`  Found ${tabs.length} tabs to explore`);
     
     const allForms = [];
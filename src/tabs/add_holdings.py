@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 
+from utils.csv_importer import read_rejects
+from utils.derived_cache import get_derived_cache
+from utils.instrumentation import timed
 
+
+@timed
 def render_add_holdings_tab(portfolio_manager):
     """Render the Add Holdings tab"""
     st.subheader("Add Holdings")
@@ -46,48 +51,109 @@ def _render_csv_upload(portfolio_manager):
         mime="text/csv",
     )
 
+    # Chosen before the upload, since the file is imported as soon as it arrives
+    mode = st.radio(
+        "Import mode", ["Replace", "Merge"], horizontal=True,
+        help="Replace swaps in the file's holdings. Merge updates holdings with the same asset_id and "
+             "purchase date, adds new ones and keeps holdings the file does not mention.",
+    )
     uploaded_file = st.file_uploader("Upload CSV file", type="csv")
 
-    if uploaded_file is not None:
+    # Report of the last import survives the rerun that shows the new data, until
+    # the file is removed or another one is uploaded
+    if uploaded_file is None or st.session_state.get("imported_file_id") != uploaded_file.file_id:
+        _clear_import_report()
+    _render_import_report()
+
+    # Skip files that were already imported, otherwise every rerun (or a change of
+    # mode) would import the same file again
+    if uploaded_file is not None and st.session_state.get("imported_file_id") != uploaded_file.file_id:
         try:
-            holdings_df = pd.read_csv(uploaded_file)
-            
-            # Validate CSV data
-            is_valid, error_message = portfolio_manager.validate_csv_data(holdings_df)
+            progress_bar = st.progress(0.0, text="Importing holdings...")
+
+            def update_progress(fraction, rows):
+                progress_bar.progress(fraction or 0.0, text=f"Imported {rows:,} rows...")
+
+            # Stream the file in chunks; bad rows go to a reject report instead of failing the upload
+            if mode == "Merge":
+                # Drop cached views of the current state before the table is mutated
+                get_derived_cache(st.session_state).invalidate(st.session_state.portfolio)
+                result = portfolio_manager.merge_csv(st.session_state.portfolio, uploaded_file,
+                                                     progress_callback=update_progress)
+            else:
+                result = portfolio_manager.import_csv(uploaded_file, progress_callback=update_progress)
+            progress_bar.empty()
             
-            if not is_valid:
-                st.error(f"❌ CSV validation failed: {error_message}")
+            if not result.ok:
+                st.error(f"❌ CSV validation failed: {result.error}")
+                return
+            if result.accepted == 0:
+                st.error(f"❌ CSV validation failed: all {result.rejected} rows were rejected")
+                _render_rejects_download(result.rejected, result.rejects_file)
                 return
             
-            # Convert to list of dictionaries
-            holdings = holdings_df.to_dict(orient="records")
-
-            # Add current_price with random variation for demo
-            import random
-            for holding in holdings:
-                # Add random variation: -20% to +30% for realistic demo
-                variation = random.uniform(-0.20, 0.30)
-                holding["current_price"] = round(holding["purchase_price"] * (1 + variation), 2)
-                # Ensure purchase_date is string
-                if "purchase_date" in holding:
-                    holding["purchase_date"] = str(holding["purchase_date"])
-
-            # Update session state
-            st.session_state.portfolio["holdings"] = holdings
-            
-            # Auto-save to JSON file
-            try:
-                portfolio_manager.save_portfolio(st.session_state.portfolio)
-            except Exception as save_error:
-                st.warning(f"Data loaded but auto-save failed: {str(save_error)}")
+            if result.merge is None:
+                # Update session state
+                st.session_state.portfolio["holdings"] = result.holdings
+                get_derived_cache(st.session_state).invalidate()
+                
+                # Auto-save to JSON file
+                try:
+                    portfolio_manager.save_portfolio(st.session_state.portfolio)
+                except Exception as save_error:
+                    st.warning(f"Data loaded but auto-save failed: {str(save_error)}")
             
-            st.success(f"✓ Successfully loaded {len(holdings)} holdings from CSV!")
+            st.session_state.imported_file_id = uploaded_file.file_id
+            st.session_state.import_report = {
+                "accepted": result.accepted,
+                "rejected": result.rejected,
+                "rejects_file": result.rejects_file,
+                "merge": None if result.merge is None else {
+                    "added": result.merge.added,
+                    "updated": result.merge.updated,
+                    "unchanged": result.merge.unchanged,
+                },
+            }
             st.rerun()  # Force refresh to show new data
             
         except Exception as e:
             st.error(f"❌ Error loading CSV: {str(e)}")
 
 
+def _render_import_report():
+    """Show the outcome of the last CSV import with a download for rejected rows"""
+    report = st.session_state.get("import_report")
+    if not report:
+        return
+    merge = report.get("merge")
+    if merge:
+        st.success(f"✓ Merged {report['accepted']} rows from CSV: {merge['added']} added, "
+                   f"{merge['updated']} updated, {merge['unchanged']} unchanged")
+    else:
+        st.success(f"✓ Successfully loaded {report['accepted']} holdings from CSV!")
+    if report["rejected"]:
+        st.warning(f"{report['rejected']} rows were rejected and not imported.")
+        _render_rejects_download(report["rejected"], report["rejects_file"])
+
+
+def _clear_import_report():
+    """Forget the last import report and release its reject file"""
+    report = st.session_state.pop("import_report", None)
+    if report and report["rejects_file"] is not None:
+        report["rejects_file"].close()
+
+
+def _render_rejects_download(rejected, rejects_file):
+    """Download button for the reject file (row number, reason and original values)"""
+    st.download_button(
+        label=f"⚠️ Download {rejected} Rejected Rows",
+        # Read only when the button is clicked
+        data=lambda: read_rejects(rejects_file),
+        file_name="rejected_rows.csv",
+        mime="text/csv",
+    )
+
+
 def _render_manual_entry(portfolio_manager):
     """Render manual entry form"""
     st.write("Add a holding manually")
@@ -108,28 +174,28 @@ def _render_manual_entry(portfolio_manager):
         submit = st.form_submit_button("Add Holding")
 
         if submit:
-            if asset_id and asset_name and quantity > 0 and purchase_price > 0:
-                # Create new holding
-                new_holding = {
-                    "asset_type": asset_type,
-                    "asset_id": asset_id,
-                    "asset_name": asset_name,
-                    "quantity": quantity,
-                    "purchase_price": purchase_price,
-                    "current_price": purchase_price,  # Set current price equal to purchase price initially
-                    "purchase_date": purchase_date.isoformat(),
-                }
-
-                # Add to session state
-                st.session_state.portfolio["holdings"].append(new_holding)
-                
-                # Auto-save to JSON file
+            # Create new holding
+            new_holding = {
+                "asset_type": asset_type,
+                "asset_id": asset_id.strip(),
+                "asset_name": asset_name.strip(),
+                "quantity": quantity,
+                "purchase_price": purchase_price,
+                "current_price": purchase_price,  # Set current price equal to purchase price initially
+                "purchase_date": purchase_date.isoformat(),
+            }
+
+            # Same schema as the CSV upload, reporting every problem at once
+            validation = portfolio_manager.validate_holdings(pd.DataFrame([new_holding]))
+            if validation.valid:
+                # Add to session state and auto-save (a single journal append in journal mode)
+                get_derived_cache(st.session_state).invalidate(st.session_state.portfolio)
                 try:
-                    portfolio_manager.save_portfolio(st.session_state.portfolio)
+                    portfolio_manager.add_holding(st.session_state.portfolio, new_holding)
                 except Exception as save_error:
                     st.warning(f"Holding added but auto-save failed: {str(save_error)}")
                 
                 st.success(f"✓ Successfully added {asset_name} to portfolio!")
                 st.rerun()  # Force refresh to show new data
             else:
-                st.error("Please fill in all required fields")
\ No newline at end of file
+                st.error("Please fix the following: " + "; ".join(validation.violations()["message"]))
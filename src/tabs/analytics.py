@@ -1,76 +1,94 @@
 import streamlit as st
 import pandas as pd
+from datetime import date
 
+from utils.derived_cache import get_derived_cache
+from utils.formatting import format_amount, format_metrics
+from utils.instrumentation import timed
 
+
+@timed
 def render_analytics_tab(portfolio_manager):
     """Render the Analytics tab with CAGR calculations"""
     st.subheader("Analytics")
     
     if st.session_state.portfolio["holdings"]:
-        # Create fresh dataframe from current session state
-        holdings_df = pd.DataFrame(st.session_state.portfolio["holdings"]).copy()
-        holdings_df["value"] = holdings_df["quantity"] * holdings_df["current_price"]
-        holdings_df["gain_loss"] = holdings_df.apply(
-            lambda row: portfolio_manager.calculate_gain_loss(row.to_dict()), axis=1
-        )
+        portfolio = st.session_state.portfolio
+        # Derived data is computed once per portfolio change and shared with the other tabs
+        cache = get_derived_cache(st.session_state)
         
-        # Calculate CAGR for each holding
-        holdings_df["cagr"] = holdings_df.apply(
-            lambda row: portfolio_manager.calculate_cagr(
-                row["purchase_price"], 
-                row["current_price"], 
-                row.get("purchase_date", "2023-01-01")
-            ), axis=1
-        )
+        # Every holding period is measured against this one date, so back-dated views are reproducible
+        as_of = st.date_input("As of", value=date.today(), max_value=date.today(), key="analytics_as_of")
+        
+        # Value, gain/loss and CAGR for every holding in one vectorized pass
+        holdings_df = cache.metrics(portfolio, portfolio_manager, as_of)
+        _display_date_issues(portfolio_manager, holdings_df)
         
         # Portfolio performance metrics - recalculate from fresh data
-        col1, col2, col3, col4 = st.columns(4)
+        col1, col2, col3, col4, col5 = st.columns(5)
         
-        # Recalculate totals from current holdings
-        current_holdings = st.session_state.portfolio["holdings"]
-        total_investment = sum(h["quantity"] * h["purchase_price"] for h in current_holdings)
-        total_current_value = sum(h["quantity"] * h["current_price"] for h in current_holdings)
+        # Recalculate totals from current holdings (pushed down to storage when supported)
+        totals = cache.totals(portfolio, portfolio_manager)
+        total_investment = totals["total_investment"]
+        total_current_value = totals["total_value"]
         total_gain_loss = total_current_value - total_investment
         gain_loss_percentage = (total_gain_loss / total_investment) * 100 if total_investment > 0 else 0
         
         with col1:
-            st.metric("Total Investment", f"₹{total_investment:,.2f}")
+            st.metric("Total Investment", format_amount(total_investment))
         with col2:
-            st.metric("Current Value", f"₹{total_current_value:,.2f}")
+            st.metric("Current Value", format_amount(total_current_value))
         with col3:
             delta_color = "normal" if total_gain_loss >= 0 else "inverse"
-            st.metric("Total Gain/Loss", f"₹{total_gain_loss:,.2f}", f"{gain_loss_percentage:.2f}%", delta_color=delta_color)
+            st.metric("Total Gain/Loss", format_amount(total_gain_loss), f"{gain_loss_percentage:.2f}%", delta_color=delta_color)
         with col4:
             if not holdings_df.empty:
-                best_performer = holdings_df.loc[holdings_df['gain_loss'].idxmax()]
-                st.metric("Best Performer", best_performer['asset_name'][:15], f"₹{best_performer['gain_loss']:,.2f}")
+                best_performer = cache.get(
+                    portfolio, "best_performer", lambda: portfolio_manager.top_by_gain(portfolio, 1).iloc[0]
+                )
+                st.metric("Best Performer", best_performer['asset_name'][:15], format_amount(best_performer['gain_loss']))
+        with col5:
+            # Money-weighted return over every purchase date, solved once per portfolio change
+            portfolio_xirr = cache.portfolio_xirr(portfolio, portfolio_manager, as_of)
+            st.metric("Portfolio XIRR", "N/A" if pd.isna(portfolio_xirr) else f"{portfolio_xirr:.2f}%")
         
         # CAGR Analysis
         st.subheader("CAGR Analysis")
         
-        # Display CAGR table
-        cagr_df = holdings_df[['asset_name', 'asset_type', 'cagr', 'gain_loss']].copy()
-        cagr_df = cagr_df.sort_values('cagr', ascending=False)
-        
-        # Format CAGR display with colors - create once to avoid flickering
-        cagr_display_data = []
-        for _, row in cagr_df.iterrows():
-            if row['cagr'] > 0:
-                cagr_display_data.append(f"{row['cagr']:.2f}%")
-            elif row['cagr'] < 0:
-                cagr_display_data.append(f"{row['cagr']:.2f}%")
-            else:
-                cagr_display_data.append(f"{row['cagr']:.2f}%")
-        
-        cagr_df['cagr_display'] = cagr_display_data
+        # Display CAGR table (sorted and formatted once per portfolio change)
+        cagr_df = cache.get(
+            portfolio, f"cagr_display:{as_of.isoformat()}",
+            lambda: _with_display(cache.cagr_table(portfolio, portfolio_manager, as_of))
+        )
         
         st.dataframe(
-            cagr_df[['asset_name', 'asset_type', 'cagr_display', 'gain_loss']],
+            cagr_df[['asset_name', 'asset_type', 'cagr_display', 'xirr_display', 'gain_loss_display']],
             column_config={
                 "asset_name": st.column_config.TextColumn("Asset Name"),
                 "asset_type": st.column_config.TextColumn("Type"),
                 "cagr_display": st.column_config.TextColumn("CAGR"),
-                "gain_loss": st.column_config.NumberColumn("Total Gain/Loss", format="₹%.2f"),
+                "xirr_display": st.column_config.TextColumn("XIRR"),
+                "gain_loss_display": st.column_config.TextColumn("Total Gain/Loss"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        
+        # XIRR per asset across all of its purchase lots
+        st.subheader("XIRR by Asset")
+        xirr_df = cache.get(
+            portfolio, f"xirr_display:{as_of.isoformat()}",
+            lambda: _with_display(cache.xirr_by_asset(portfolio, portfolio_manager, as_of))
+        )
+        st.dataframe(
+            xirr_df[['asset_name', 'asset_type', 'lots', 'investment_display', 'value_display', 'xirr_display']],
+            column_config={
+                "asset_name": st.column_config.TextColumn("Asset Name"),
+                "asset_type": st.column_config.TextColumn("Type"),
+                "lots": st.column_config.NumberColumn("Lots"),
+                "investment_display": st.column_config.TextColumn("Investment"),
+                "value_display": st.column_config.TextColumn("Current Value"),
+                "xirr_display": st.column_config.TextColumn("XIRR"),
             },
             hide_index=True,
             use_container_width=True
@@ -87,19 +105,48 @@ def render_analytics_tab(portfolio_manager):
             top_performers = cagr_df.head(3)
             for _, row in top_performers.iterrows():
                 color = "🟢" if row['cagr'] > 0 else "🔴"
-                st.write(f"{color} {row['asset_name'][:20]}: {row['cagr']:.2f}%")
+                st.write(f"{color} {row['asset_name'][:20]}: {row['cagr_display']}")
         
         with col2:
             # Asset type performance
             st.markdown("**📊 Asset Type Performance**")
-            type_performance = holdings_df.groupby('asset_type').agg({
-                'cagr': 'mean',
-                'gain_loss': 'sum'
-            }).round(2)
+            type_performance = cache.get(
+                portfolio, f"type_performance:{as_of.isoformat()}",
+                lambda: holdings_df.groupby('asset_type').agg({
+                    'cagr': 'mean',
+                    'gain_loss': 'sum'
+                }).round(2)
+            )
             
             for asset_type, data in type_performance.iterrows():
                 color = "🟢" if data['cagr'] > 0 else "🔴"
                 st.write(f"{color} {asset_type}: {data['cagr']:.2f}% avg CAGR")
         
     else:
-        st.info("Add holdings to view analytics")
\ No newline at end of file
+        st.info("Add holdings to view analytics")
+
+
+def _display_date_issues(portfolio_manager, holdings_df):
+    """Warn about holdings whose CAGR could not be measured, one row per holding"""
+    issues = portfolio_manager.date_issues(holdings_df)
+    if issues.empty:
+        return
+    st.warning(f"{len(issues)} holding(s) have no usable purchase date; their CAGR is shown as 0 "
+               f"and they are left out of XIRR")
+    with st.expander("Holdings with date issues"):
+        st.dataframe(
+            issues,
+            column_config={
+                "asset_id": st.column_config.TextColumn("Asset ID"),
+                "asset_name": st.column_config.TextColumn("Asset Name"),
+                "purchase_date": st.column_config.DateColumn("Purchase Date"),
+                "date_issue": st.column_config.TextColumn("Issue"),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+
+def _with_display(table):
+    """Table plus the ``<column>_display`` strings of its amount and percent columns"""
+    return table.join(format_metrics(table))
@@ -0,0 +1,60 @@
+import streamlit as st
+import pandas as pd
+
+from utils.instrumentation import registry
+
+
+def render_debug_panel(spans):
+    """Render the sidebar timing panel for the rerun that produced ``spans``"""
+    with st.sidebar:
+        st.subheader("Debug: Timings")
+
+        # Call tree of this rerun, parents before their children
+        st.markdown("**Last rerun**")
+        if spans:
+            rerun_ms = sum(span.seconds for span in spans if span.depth == 0) * 1000
+            st.caption(f"{rerun_ms:.1f} ms in instrumented calls")
+            st.dataframe(
+                pd.DataFrame({
+                    "call": [" " * span.depth + span.name for span in spans],
+                    "ms": [span.seconds * 1000 for span in spans],
+                }),
+                column_config={"ms": st.column_config.NumberColumn("ms", format="%.2f")},
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.caption("No instrumented calls")
+
+        snapshot = registry.snapshot()
+        st.markdown("**Since start**")
+        if snapshot["timers"]:
+            totals = pd.DataFrame.from_dict(snapshot["timers"], orient="index")
+            totals["mean_ms"] = totals["total_seconds"] / totals["count"] * 1000
+            totals["total_ms"] = totals["total_seconds"] * 1000
+            totals["max_ms"] = totals["max_seconds"] * 1000
+            st.dataframe(
+                totals.sort_values("total_ms", ascending=False)[["count", "total_ms", "mean_ms", "max_ms"]],
+                column_config={
+                    "count": st.column_config.NumberColumn("Calls"),
+                    "total_ms": st.column_config.NumberColumn("Total ms", format="%.1f"),
+                    "mean_ms": st.column_config.NumberColumn("Mean ms", format="%.2f"),
+                    "max_ms": st.column_config.NumberColumn("Max ms", format="%.2f"),
+                },
+                use_container_width=True
+            )
+        for name, value in snapshot["counters"].items():
+            st.write(f"{name}: {value:,.0f}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="Prometheus",
+                data=registry.prometheus_text(),
+                file_name="indexcopilot_metrics.prom",
+                mime="text/plain"
+            )
+        with col2:
+            if st.button("Reset", key="debug_reset_metrics"):
+                registry.reset()
+                st.rerun()
@@ -0,0 +1,52 @@
+import streamlit as st
+
+PAGE_SIZES = [25, 50, 100, 250]
+ALL_TYPES = "All types"
+# Formatted "<column>_display" columns sort by the numbers behind them
+DISPLAY_SUFFIX = "_display"
+
+
+@st.fragment
+def render_holdings_grid(grid, column_config, key="holdings_grid"):
+    """Paginated holdings grid; only the visible page is sent to the browser
+
+    As a fragment, paging, sorting and searching rerun just this grid. ``column_config``
+    doubles as the list of displayed columns.
+    """
+    labels = {column.removesuffix(DISPLAY_SUFFIX): config["label"] for column, config in column_config.items()}
+    sortable = [column for column in labels if column in grid.frame.columns]
+
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
+    with col1:
+        search = st.text_input("Search", key=f"{key}_search", placeholder="Asset ID or name")
+    with col2:
+        asset_type = st.selectbox("Type", [ALL_TYPES] + grid.asset_types(), key=f"{key}_type")
+    with col3:
+        sort_by = st.selectbox("Sort by", [None] + sortable, key=f"{key}_sort",
+                               format_func=lambda column: "As entered" if column is None else labels[column])
+    with col4:
+        page_size = st.selectbox("Rows", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    descending = st.toggle("Descending", key=f"{key}_descending")
+
+    query = dict(sort_by=sort_by, ascending=not descending,
+                 asset_type=None if asset_type == ALL_TYPES else asset_type, search=search)
+    total = len(grid.rows(**query))
+    pages = max(1, -(-total // page_size))
+    # A narrower filter can leave the stored page number past the end
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page_number = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+    page = grid.page(page_number, page_size, **query)
+    st.dataframe(
+        page.rows[[column for column in column_config if column in page.rows.columns]],
+        column_config=column_config,
+        hide_index=True,
+        use_container_width=True,
+    )
+    if page.total:
+        st.caption(f"Rows {page.start + 1:,}–{page.start + len(page.rows):,} of {page.total:,} "
+                   f"· page {page.page} of {page.pages}")
+    else:
+        st.caption("No holdings match the search")
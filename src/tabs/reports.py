@@ -1,7 +1,20 @@
+import hashlib
+import os
 import streamlit as st
 import pandas as pd
 
+from utils.derived_cache import get_derived_cache
+from utils.formatting import format_amount
+from utils.holdings_grid import HoldingsGrid
+from utils.instrumentation import timed
+from utils.report_jobs import DEFAULT_WORKERS, ReportJobQueue
+from utils.tax_lots import LONG_TERM_DAYS
+from tabs.holdings_grid import render_holdings_grid
 
+REPORT_POLL_SECONDS = 1
+
+
+@timed
 def render_reports_tab(portfolio_manager, export_manager):
     """Render the Reports & Export tab"""
     st.subheader("Reports & Export")
@@ -12,7 +25,9 @@ def render_reports_tab(portfolio_manager, export_manager):
 
         with col1:
             # Export to CSV
-            csv_data = export_manager.export_to_csv(st.session_state.portfolio)
+            formatted = st.checkbox("Formatted amounts (₹, Indian digit grouping)", key="csv_formatted")
+            csv_data = get_derived_cache(st.session_state).csv_export(st.session_state.portfolio, export_manager,
+                                                                      formatted=formatted)
             if csv_data:
                 st.download_button(
                     label="📊 Download CSV Report",
@@ -22,20 +37,12 @@ def render_reports_tab(portfolio_manager, export_manager):
                 )
 
         with col2:
-            # Export to PDF
-            if st.button("📄 Generate PDF Report"):
-                try:
-                    pdf_data = export_manager.generate_pdf_report(st.session_state.portfolio)
-                    st.download_button(
-                        label="Download PDF Report",
-                        data=pdf_data,
-                        file_name=f"{st.session_state.portfolio['name'].replace(' ', '_')}_report.pdf",
-                        mime="application/pdf",
-                    )
-                except Exception as e:
-                    st.error(f"Error generating PDF: {str(e)}")
+            _render_pdf_export()
     else:
         st.info("Add holdings to generate reports")
+
+    st.markdown("---")
+    _render_capital_gains()
     
     st.markdown("---")
     
@@ -54,7 +61,140 @@ def render_reports_tab(portfolio_manager, export_manager):
         if st.button("🔄 Reload Portfolio"):
             try:
                 st.session_state.portfolio = portfolio_manager.load_portfolio()
+                get_derived_cache(st.session_state).invalidate()
                 st.success("✓ Portfolio reloaded successfully!")
                 st.rerun()
             except Exception as e:
-                st.error(f"Error loading portfolio: {str(e)}")
\ No newline at end of file
+                st.error(f"Error loading portfolio: {str(e)}")
+
+
+@st.fragment
+def _render_capital_gains():
+    """Realized and unrealized gains from an uploaded trades CSV, sells matched FIFO or by lot"""
+    st.subheader("Capital Gains")
+    uploaded_file = st.file_uploader(
+        "Upload trades CSV (date, action, asset_id, quantity, price, optional lot_id)", type="csv", key="trades_csv"
+    )
+    if uploaded_file is None:
+        return
+    include_holdings = st.checkbox(
+        "Use current holdings as the opening lots", value=True, key="trades_include_holdings",
+        help="The file must then only hold trades made after the holdings were recorded; buys already "
+             "in the holdings would be counted twice. Untick it to replay a complete trade history."
+    )
+
+    portfolio = st.session_state.portfolio
+    cache = get_derived_cache(st.session_state)
+    trades_csv = uploaded_file.getvalue()
+    report_key = f"{hashlib.sha1(trades_csv).hexdigest()}:{include_holdings}"
+    try:
+        # Grids keep their sort orders across reruns, so build them once per upload
+        realized, unrealized = cache.get(
+            portfolio, f"capital_gains_grids:{report_key}",
+            lambda: tuple(HoldingsGrid(frame) for frame in cache.tax_report(portfolio, trades_csv, include_holdings))
+        )
+    except Exception as e:
+        st.error(f"Error replaying trades: {str(e)}")
+        return
+
+    gains = realized.frame.groupby("term")["gain"].sum()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Short-term Realized", format_amount(gains.get("short", 0.0)))
+    with col2:
+        st.metric(f"Long-term Realized (> {LONG_TERM_DAYS} days)", format_amount(gains.get("long", 0.0)))
+    with col3:
+        st.metric("Unrealized", format_amount(unrealized.frame["gain"].sum()))
+
+    lot_columns = {
+        "asset_id": st.column_config.TextColumn("Asset ID"),
+        "asset_name": st.column_config.TextColumn("Asset Name"),
+        "lot_id": st.column_config.TextColumn("Lot"),
+        "purchase_date": st.column_config.DateColumn("Purchase Date"),
+        "quantity": st.column_config.NumberColumn("Quantity", format="%.2f"),
+        "cost_basis_display": st.column_config.TextColumn("Cost Basis"),
+    }
+    st.markdown("**Realized Gains**")
+    render_holdings_grid(realized, {
+        **lot_columns,
+        "sale_date": st.column_config.DateColumn("Sale Date"),
+        "proceeds_display": st.column_config.TextColumn("Proceeds"),
+        "gain_display": st.column_config.TextColumn("Gain/Loss"),
+        "holding_days": st.column_config.NumberColumn("Days Held", format="%d"),
+        "term": st.column_config.TextColumn("Term"),
+    }, key="realized_grid")
+    st.markdown("**Unrealized Gains**")
+    render_holdings_grid(unrealized, {
+        **lot_columns,
+        "value_display": st.column_config.TextColumn("Value"),
+        "gain_display": st.column_config.TextColumn("Gain/Loss"),
+        "holding_days": st.column_config.NumberColumn("Days Held", format="%d"),
+        "term": st.column_config.TextColumn("Term"),
+    }, key="unrealized_grid")
+
+    col1, col2 = st.columns(2)
+    for column, (label, grid) in zip((col1, col2), (("realized", realized), ("unrealized", unrealized))):
+        with column:
+            st.download_button(
+                label=f"📊 Download {label.capitalize()} Gains CSV",
+                # Written only when the button is clicked
+                data=lambda frame=grid.frame: _raw_csv(frame),
+                file_name=f"{portfolio['name'].replace(' ', '_')}_{label}_gains.csv",
+                mime="text/csv",
+                key=f"{label}_gains_download",
+            )
+
+
+def _raw_csv(frame: pd.DataFrame) -> str:
+    """CSV of a report frame without its display string columns"""
+    return frame.drop(columns=frame.columns[frame.columns.str.endswith("_display")]).to_csv(index=False)
+
+
+@st.cache_resource
+def _get_report_queue() -> ReportJobQueue:
+    """One report job queue per server process, shared by every session"""
+    return ReportJobQueue(int(os.environ.get("INDEXCOPILOT_REPORT_WORKERS", DEFAULT_WORKERS)))
+
+
+@st.fragment
+def _render_pdf_export():
+    """PDF export; as a fragment, the button click reruns only this section"""
+    queue = _get_report_queue()
+    portfolio = st.session_state.portfolio
+    job_id = queue.job_id(portfolio)
+
+    # Export to PDF
+    if st.button("📄 Generate PDF Report"):
+        try:
+            st.session_state.report_job_id = queue.submit(portfolio)
+        except Exception as e:
+            st.error(f"Error generating PDF: {str(e)}")
+
+    status = queue.status(job_id)
+    if status is None:
+        return
+    pdf_data = queue.result(job_id) if status.state == "done" else None
+    if pdf_data is not None:
+        # Served from the finished-report cache, whichever session generated it
+        st.download_button(
+            label="Download PDF Report",
+            data=pdf_data,
+            file_name=f"{portfolio['name'].replace(' ', '_')}_report.pdf",
+            mime="application/pdf",
+        )
+    elif status.state == "failed":
+        st.error(f"Error generating PDF: {status.error}")
+    elif st.session_state.get("report_job_id") == job_id:
+        _render_report_progress(queue, job_id)
+
+
+@st.fragment(run_every=REPORT_POLL_SECONDS)
+def _render_report_progress(queue: ReportJobQueue, job_id: str):
+    """Poll a pending report job without blocking the rest of the page"""
+    status = queue.status(job_id)
+    if status is None or status.state in ("done", "failed"):
+        st.rerun()
+    if status.state == "queued":
+        st.progress(0.0, text="Report queued...")
+    else:
+        st.progress(status.progress or 0.0, text="Generating PDF report...")
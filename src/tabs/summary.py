@@ -1,139 +1,154 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
 
+from utils.chart_service import render_allocation_chart
+from utils.derived_cache import get_derived_cache
+from utils.formatting import format_amount
+from utils.instrumentation import timed
+from utils.holdings_grid import HoldingsGrid
+from utils.price_history import get_price_history
+from tabs.holdings_grid import render_holdings_grid
 
+
+@timed
 def render_summary_tab(portfolio_manager):
     """Render the Portfolio Summary tab"""
     st.subheader("My Portfolio")
 
-    # Inline editable portfolio name
-    col1, col2 = st.columns([4, 1])
-    with col1:
-        portfolio_name = st.text_input(
-            "Portfolio Name", 
-            value=st.session_state.portfolio["name"], 
-            key="portfolio_name_input"
-        )
-        st.session_state.portfolio["name"] = portfolio_name
-    with col2:
-        st.markdown("<br>", unsafe_allow_html=True)
-        if st.button("✏️ Edit"):
-            st.info("Click in the text field above to edit the portfolio name")
+    _render_portfolio_name()
 
     # Display holdings if available
     if st.session_state.portfolio["holdings"]:
-        holdings_df = pd.DataFrame(st.session_state.portfolio["holdings"])
-        total_value = sum(h["quantity"] * h["current_price"] for h in st.session_state.portfolio["holdings"])
+        portfolio = st.session_state.portfolio
+        # Derived data is computed once per portfolio change and shared with the other tabs
+        cache = get_derived_cache(st.session_state)
+        # Totals and allocation are pushed down to the storage backend when it supports queries
+        totals = cache.totals(portfolio, portfolio_manager)
+        total_value = totals["total_value"]
 
         # Display portfolio summary
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total Value", f"₹{total_value:,.2f}")
+            st.metric("Total Value", format_amount(total_value))
         with col2:
-            st.metric("Number of Holdings", len(holdings_df))
+            st.metric("Number of Holdings", totals["holdings"])
         with col3:
             st.metric("Last Updated", datetime.now().strftime("%Y-%m-%d"))
 
         # Display holdings table
         st.subheader("Holdings")
-        _display_holdings_table(holdings_df, portfolio_manager)
+        _display_holdings_table(portfolio, portfolio_manager, cache)
+
+        # Lots of the same asset_id aggregated into one position
+        st.subheader("Positions by Asset")
+        _display_positions(portfolio, cache)
         
         # Asset allocation chart
-        _display_asset_allocation_chart(holdings_df, total_value)
+        asset_allocation = cache.allocation(portfolio, portfolio_manager)
+        _display_asset_allocation_chart(asset_allocation, total_value)
+
+        # Value over time, when a price history store is configured
+        _display_value_over_time(portfolio, cache)
     else:
         st.info("No holdings in your portfolio yet. Add holdings in the 'Add Holdings' tab.")
 
 
-def _display_holdings_table(holdings_df, portfolio_manager):
-    """Display the holdings table with gain/loss calculations"""
-    # Create a copy to avoid modifying original data
-    display_df = holdings_df.copy()
-    
-    # Add value and gain/loss columns
-    display_df["value"] = display_df["quantity"] * display_df["current_price"]
-    display_df["gain_loss"] = display_df.apply(
-        lambda row: portfolio_manager.calculate_gain_loss(row.to_dict()), axis=1
+@st.fragment
+def _render_portfolio_name():
+    """Inline editable portfolio name; as a fragment, typing here does not rerun the whole view"""
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        portfolio_name = st.text_input(
+            "Portfolio Name", 
+            value=st.session_state.portfolio["name"], 
+            key="portfolio_name_input"
+        )
+        st.session_state.portfolio["name"] = portfolio_name
+    with col2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("✏️ Edit"):
+            st.info("Click in the text field above to edit the portfolio name")
+
+
+def _display_holdings_table(portfolio, portfolio_manager, cache):
+    """Display the paginated holdings grid with gain/loss calculations"""
+    # Sort orders and search results live on the grid, built once per portfolio change
+    # from the metrics and their display strings
+    grid = cache.get(
+        portfolio, f"holdings_grid:{datetime.now().date().isoformat()}",
+        lambda: HoldingsGrid(cache.display_metrics(portfolio, portfolio_manager))
     )
-    
-    # Create color-coded gain/loss display
-    gain_loss_display = []
-    for _, row in display_df.iterrows():
-        if row['gain_loss'] > 0:
-            gain_loss_display.append(f"▲ ₹{row['gain_loss']:,.2f}")
-        elif row['gain_loss'] < 0:
-            gain_loss_display.append(f"▼ ₹{abs(row['gain_loss']):,.2f}")
-        else:
-            gain_loss_display.append(f"₹{row['gain_loss']:,.2f}")
-    
-    display_df['gain_loss_display'] = gain_loss_display
 
-    # Display table
-    st.dataframe(
-        display_df,
-        column_config={
+    render_holdings_grid(
+        grid,
+        {
             "asset_id": st.column_config.TextColumn("Asset ID"),
             "asset_name": st.column_config.TextColumn("Asset Name"),
             "asset_type": st.column_config.TextColumn("Type"),
             "quantity": st.column_config.NumberColumn("Quantity", format="%.2f"),
-            "purchase_price": st.column_config.NumberColumn("Purchase Price", format="₹%.2f"),
-            "current_price": st.column_config.NumberColumn("Current Price", format="₹%.2f"),
-            "purchase_date": st.column_config.TextColumn("Purchase Date"),
-            "value": st.column_config.NumberColumn("Value", format="₹%.2f"),
+            "purchase_price_display": st.column_config.TextColumn("Purchase Price"),
+            "current_price_display": st.column_config.TextColumn("Current Price"),
+            "purchase_date": st.column_config.DateColumn("Purchase Date"),
+            "value_display": st.column_config.TextColumn("Value"),
+            "investment_display": st.column_config.TextColumn("Investment"),
+            "gain_pct_display": st.column_config.TextColumn("Gain %"),
+            "holding_years": st.column_config.NumberColumn("Years Held", format="%.1f"),
+            "cagr_display": st.column_config.TextColumn("CAGR"),
             "gain_loss_display": st.column_config.TextColumn("Gain/Loss"),
+            "date_issue": st.column_config.TextColumn("Date Issue"),
         },
-        hide_index=True,
-        use_container_width=True,
     )
 
 
-def _display_asset_allocation_chart(holdings_df, total_value):
+def _display_positions(portfolio, cache):
+    """Display one row per asset: open lots, quantity, average cost, value and gains"""
+    grid = cache.get(portfolio, "positions_grid", lambda: HoldingsGrid(cache.positions(portfolio)))
+
+    render_holdings_grid(
+        grid,
+        {
+            "asset_id": st.column_config.TextColumn("Asset ID"),
+            "asset_name": st.column_config.TextColumn("Asset Name"),
+            "asset_type": st.column_config.TextColumn("Type"),
+            "lots": st.column_config.NumberColumn("Lots"),
+            "quantity": st.column_config.NumberColumn("Quantity", format="%.2f"),
+            "avg_cost_display": st.column_config.TextColumn("Avg Cost"),
+            "current_price_display": st.column_config.TextColumn("Current Price"),
+            "cost_basis_display": st.column_config.TextColumn("Cost Basis"),
+            "value_display": st.column_config.TextColumn("Value"),
+            "unrealized_gain_display": st.column_config.TextColumn("Unrealized Gain/Loss"),
+        },
+        key="positions_grid",
+    )
+
+
+def _display_asset_allocation_chart(asset_allocation, total_value):
     """Display the asset allocation doughnut chart"""
     st.subheader("Asset Allocation")
     
     # Center the chart with limited width
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        # Ensure value column exists
-        if "value" not in holdings_df.columns:
-            holdings_df["value"] = holdings_df["quantity"] * holdings_df["current_price"]
-        
-        # Group by asset type
-        asset_allocation = holdings_df.groupby("asset_type")["value"].sum()
-        
-        # Create doughnut chart
-        fig, ax = plt.subplots(figsize=(6, 6))
-        
-        # Create labels with percentage and amount
-        labels = []
-        for asset_type, value in asset_allocation.items():
-            percentage = (value / total_value) * 100
-            labels.append(f"{asset_type}: {percentage:.1f}% - ₹{value:,.0f}")
-        
-        wedges, texts, autotexts = ax.pie(
-            asset_allocation,
-            labels=labels,
-            autopct="",
-            startangle=90,
-            pctdistance=0.85,
-            wedgeprops=dict(width=0.5)
-        )
-        
-        # Add center text
-        ax.text(0, 0, f"Total\n₹{total_value:,.0f}", 
-               horizontalalignment='center', verticalalignment='center',
-               fontsize=12, fontweight='bold')
-        
-        ax.axis("equal")
-        plt.tight_layout()
-        st.pyplot(fig)
+        # Rendered once per allocation vector and shared with the PDF report
+        chart = render_allocation_chart(asset_allocation, total_value)
+        st.image(chart.image)
         
         # Add legend with matching colors
         st.markdown("**Asset Breakdown:**")
-        for i, (asset_type, value) in enumerate(asset_allocation.items()):
-            percentage = (value / total_value) * 100
-            # Get the actual color from the wedge
-            color = wedges[i].get_facecolor()
-            color_hex = f"#{int(color[0]*255):02x}{int(color[1]*255):02x}{int(color[2]*255):02x}"
-            st.markdown(f"<span style='color: {color_hex}'>●</span> **{asset_type}**: {percentage:.1f}% (₹{value:,.2f})", unsafe_allow_html=True)
\ No newline at end of file
+        for entry in chart.legend:
+            st.markdown(f"<span style='color: {entry.color}'>●</span> **{entry.asset_type}**: {entry.percentage:.1f}% ({format_amount(entry.value)})", unsafe_allow_html=True)
+
+
+def _display_value_over_time(portfolio, cache):
+    """Line chart of daily portfolio value against the amount invested"""
+    store = get_price_history()
+    if store is None or store.version is None:
+        return
+    # Keyed on the store version too, so ingesting new prices recomputes the series
+    history = cache.get(portfolio, f"value_over_time:{store.version}",
+                        lambda: store.value_over_time(portfolio["holdings"]))
+    if history.empty:
+        return
+    st.subheader("Value Over Time")
+    st.line_chart(history.rename(columns={"value": "Value", "investment": "Invested"}))
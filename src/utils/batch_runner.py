@@ -0,0 +1,195 @@
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from .portfolio_manager import PortfolioManager
+from .storage import NPZ_EXTENSIONS, PARQUET_EXTENSIONS, SQLITE_EXTENSIONS
+
+PORTFOLIO_EXTENSIONS = (".json",) + SQLITE_EXTENSIONS + NPZ_EXTENSIONS + PARQUET_EXTENSIONS
+OUTPUT_FORMATS = ("csv", "pdf", "json")
+
+# Worker process state, created on the first portfolio a worker handles
+_worker_export_manager = None
+
+
+class PortfolioResult(NamedTuple):
+    path: str
+    name: Optional[str]
+    holdings: int
+    seconds: float
+    outputs: List[str]
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchReport:
+    """Per-portfolio results and throughput of one batch run"""
+
+    def __init__(self, results: List[PortfolioResult], elapsed: float, workers: int):
+        self.results = results
+        self.elapsed = elapsed
+        self.workers = workers
+
+    @property
+    def succeeded(self) -> List[PortfolioResult]:
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> List[PortfolioResult]:
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def holdings(self) -> int:
+        return sum(result.holdings for result in self.succeeded)
+
+    @property
+    def portfolios_per_second(self) -> float:
+        return len(self.succeeded) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def holdings_per_second(self) -> float:
+        return self.holdings / self.elapsed if self.elapsed > 0 else 0.0
+
+    def format(self) -> str:
+        """Throughput report for the console"""
+        lines = [
+            f"Portfolios: {len(self.succeeded)} processed, {len(self.failed)} failed",
+            f"Holdings:   {self.holdings:,}",
+            f"Workers:    {self.workers}",
+            f"Elapsed:    {self.elapsed:.2f}s",
+            f"Throughput: {self.portfolios_per_second:.2f} portfolios/sec, "
+            f"{self.holdings_per_second:,.0f} holdings/sec",
+        ]
+        for result in self.failed:
+            lines.append(f"FAILED {result.path}: {result.error}")
+        return "\n".join(lines)
+
+
+def output_stem(path: str) -> str:
+    """File name the outputs of a portfolio start with; keeps the extension, so a.json and a.db do not clash"""
+    return os.path.basename(path)
+
+
+def _is_batch_output(entry: str) -> bool:
+    """Whether a file name is one a batch writes, e.g. the a.db.json summary of a.db"""
+    stem, extension = os.path.splitext(entry)
+    if extension.lower().lstrip(".") not in OUTPUT_FORMATS:
+        return False
+    return os.path.splitext(stem)[1].lower() in PORTFOLIO_EXTENSIONS
+
+
+def find_portfolios(directory: str, output_dir: Optional[str] = None) -> List[str]:
+    """Portfolio files in any storage format directly inside a directory, sorted by name
+
+    When ``output_dir`` is the same directory, the summaries an earlier batch
+    wrote there are not mistaken for portfolios.
+    """
+    skip_outputs = output_dir is not None and os.path.realpath(output_dir) == os.path.realpath(directory)
+    return sorted(
+        os.path.join(directory, entry) for entry in os.listdir(directory)
+        if os.path.splitext(entry)[1].lower() in PORTFOLIO_EXTENSIONS
+        and os.path.isfile(os.path.join(directory, entry))
+        and not (skip_outputs and _is_batch_output(entry))
+    )
+
+
+def portfolio_summary(portfolio: Dict, metrics_df, portfolio_manager, as_of: date) -> Dict:
+    """JSON-serializable totals, returns and allocation of one portfolio"""
+    total_investment = float(metrics_df["investment"].sum()) if len(metrics_df) else 0.0
+    total_value = float(metrics_df["value"].sum()) if len(metrics_df) else 0.0
+    gain_loss = total_value - total_investment
+    xirr = portfolio_manager.portfolio_xirr(metrics_df) if len(metrics_df) else float("nan")
+    allocation = metrics_df.groupby(metrics_df["asset_type"].astype(str))["value"].sum() if len(metrics_df) else {}
+    return {
+        "name": portfolio["name"],
+        "as_of": as_of.isoformat(),
+        "holdings": len(metrics_df),
+        "total_investment": round(total_investment, 2),
+        "total_value": round(total_value, 2),
+        "gain_loss": round(gain_loss, 2),
+        "gain_pct": round(gain_loss / total_investment * 100, 4) if total_investment > 0 else 0.0,
+        "xirr": None if math.isnan(xirr) else round(xirr, 4),
+        "allocation": {asset_type: round(float(value), 2) for asset_type, value in dict(allocation).items()},
+    }
+
+
+def process_portfolio(path: str, output_dir: str, formats: Sequence[str] = OUTPUT_FORMATS,
+                      as_of: Optional[date] = None, include_chart: bool = True) -> PortfolioResult:
+    """Load one portfolio, compute its metrics and write the requested outputs
+
+    Runs inside a worker process; failures are returned, not raised, so one bad
+    file does not stop the batch.
+    """
+    global _worker_export_manager
+    start = time.perf_counter()
+    as_of = as_of or date.today()
+    stem = output_stem(path)
+    outputs: List[str] = []
+    try:
+        # A JSON file's journal log is replayed on load, so holdings the app appended
+        # since its last compaction are part of the report
+        portfolio_manager = PortfolioManager(path)
+        portfolio = portfolio_manager.load_portfolio()
+        metrics_df = portfolio_manager.compute_metrics(portfolio["holdings"].to_frame(), as_of=as_of)
+
+        if "csv" in formats:
+            csv_path = os.path.join(output_dir, f"{stem}.csv")
+            metrics_df.to_csv(csv_path, index=False)
+            outputs.append(csv_path)
+        if "json" in formats:
+            json_path = os.path.join(output_dir, f"{stem}.json")
+            with open(json_path, "w") as f:
+                json.dump(portfolio_summary(portfolio, metrics_df, portfolio_manager, as_of), f, indent=2)
+            outputs.append(json_path)
+        if "pdf" in formats:
+            if _worker_export_manager is None:
+                from .export_manager import ExportManager
+                _worker_export_manager = ExportManager()
+            pdf_path = os.path.join(output_dir, f"{stem}.pdf")
+            with open(pdf_path, "wb") as f:
+                _worker_export_manager.write_pdf_report(portfolio, f, include_chart=include_chart)
+            outputs.append(pdf_path)
+        return PortfolioResult(path, portfolio["name"], len(metrics_df), time.perf_counter() - start, outputs)
+    except Exception as e:
+        return PortfolioResult(path, None, 0, time.perf_counter() - start, outputs, str(e))
+
+
+def run_batch(paths: Sequence[str], output_dir: str, formats: Sequence[str] = OUTPUT_FORMATS,
+              workers: Optional[int] = None, as_of: Optional[date] = None, include_chart: bool = True,
+              progress_callback=None) -> BatchReport:
+    """Process portfolios over a process pool; ``workers=1`` runs them in this process
+
+    ``progress_callback(result)`` is called as each portfolio finishes.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    as_of = as_of or date.today()
+    results: List[PortfolioResult] = []
+    start = time.perf_counter()
+    if workers == 1:
+        for path in paths:
+            results.append(process_portfolio(path, output_dir, formats, as_of, include_chart))
+            if progress_callback:
+                progress_callback(results[-1])
+    else:
+        # spawn for the same start-up behaviour on every platform as the report pool
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(min(workers, max(len(paths), 1)), mp_context=context) as executor:
+            pending = [executor.submit(process_portfolio, path, output_dir, formats, as_of, include_chart)
+                       for path in paths]
+            for future in as_completed(pending):
+                results.append(future.result())
+                if progress_callback:
+                    progress_callback(results[-1])
+    elapsed = time.perf_counter() - start
+    order = {path: i for i, path in enumerate(paths)}
+    results.sort(key=lambda result: order[result.path])
+    return BatchReport(results, elapsed, workers)
@@ -0,0 +1,90 @@
+import functools
+from io import BytesIO
+from typing import List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_hex
+from matplotlib.figure import Figure
+
+from .formatting import format_amount
+from .instrumentation import timed
+
+CHART_CACHE_SIZE = 32
+
+
+class LegendEntry(NamedTuple):
+    asset_type: str
+    value: float
+    percentage: float
+    color: str
+
+
+class AllocationChart(NamedTuple):
+    """Rendered doughnut chart image plus the wedge colour legend"""
+    image: bytes
+    format: str
+    legend: Tuple[LegendEntry, ...]
+
+
+@timed
+def render_allocation_chart(asset_allocation: pd.Series, total_value: Optional[float] = None,
+                            fmt: str = "png") -> AllocationChart:
+    """Render the asset allocation doughnut, cached on the allocation vector"""
+    labels = tuple(str(label) for label in asset_allocation.index)
+    values = tuple(float(value) for value in asset_allocation.to_numpy())
+    if total_value is None:
+        total_value = sum(values)
+    return _render_allocation_chart(labels, values, float(total_value), fmt)
+
+
+@functools.lru_cache(maxsize=CHART_CACHE_SIZE)
+@timed("render_allocation_chart.draw")
+def _render_allocation_chart(labels: Tuple[str, ...], values: Tuple[float, ...], total_value: float,
+                             fmt: str) -> AllocationChart:
+    # Object-oriented Figure API: nothing is registered with pyplot, so the figure
+    # is garbage collected with this frame instead of accumulating in pyplot's registry
+    fig = Figure(figsize=(6, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+
+    # Create labels with percentage and amount
+    chart_labels = []
+    for asset_type, value in zip(labels, values):
+        percentage = (value / total_value) * 100
+        chart_labels.append(f"{asset_type}: {percentage:.1f}% - {format_amount(value, decimals=0)}")
+
+    wedges, texts, autotexts = ax.pie(
+        values,
+        labels=chart_labels,
+        autopct="",
+        startangle=90,
+        pctdistance=0.85,
+        wedgeprops=dict(width=0.5)
+    )
+
+    # Add center text
+    ax.text(0, 0, f"Total\n{format_amount(total_value, decimals=0)}",
+            horizontalalignment='center', verticalalignment='center',
+            fontsize=12, fontweight='bold')
+
+    ax.axis("equal")
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format=fmt)
+
+    legend: List[LegendEntry] = []
+    for wedge, asset_type, value in zip(wedges, labels, values):
+        legend.append(LegendEntry(asset_type, value, (value / total_value) * 100, to_hex(wedge.get_facecolor())))
+    return AllocationChart(buffer.getvalue(), fmt, tuple(legend))
+
+
+def clear_chart_cache() -> None:
+    """Drop all cached chart images"""
+    _render_allocation_chart.cache_clear()
+
+
+def chart_cache_info():
+    """Hit/miss statistics of the chart cache"""
+    return _render_allocation_chart.cache_info()
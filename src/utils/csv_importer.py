@@ -0,0 +1,103 @@
+import pandas as pd
+import tempfile
+from typing import IO, Callable, Optional
+
+from .holdings_table import HoldingsTable, UpsertResult
+from .schema import HOLDINGS_SCHEMA
+
+DEFAULT_CHUNKSIZE = 10_000
+# Reject reports larger than this are spooled to a temporary file instead of memory
+REJECTS_SPOOL_BYTES = 1024 * 1024
+
+
+class ImportResult:
+    """Outcome of a streaming CSV import"""
+
+    def __init__(self, holdings: HoldingsTable, rejected: int, rejects_file: Optional[IO[str]] = None,
+                 error: Optional[str] = None, has_prices: bool = False):
+        self.holdings = holdings
+        self.rejected = rejected
+        # Reject CSV (row, reason and the original values), None when no row was rejected
+        self.rejects_file = rejects_file
+        self.error = error
+        # Whether the file has a current_price column, so a merge may overwrite prices
+        self.has_prices = has_prices
+        # UpsertResult when the rows were merged into an existing portfolio
+        self.merge: Optional[UpsertResult] = None
+
+    @property
+    def accepted(self) -> int:
+        return len(self.holdings)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def rejects_csv(self) -> str:
+        return read_rejects(self.rejects_file)
+
+
+def read_rejects(rejects_file: Optional[IO[str]]) -> str:
+    """Whole text of a reject file; read on demand, e.g. when it is downloaded"""
+    if rejects_file is None:
+        return ""
+    rejects_file.seek(0)
+    return rejects_file.read()
+
+
+def import_csv(source, chunksize: int = DEFAULT_CHUNKSIZE,
+               progress_callback: Optional[Callable[[Optional[float], int], None]] = None) -> ImportResult:
+    """Stream a holdings CSV in fixed-size chunks into a HoldingsTable
+
+    Each chunk is validated and converted with vectorized operations. Rows that
+    fail a check are written to a reject CSV with their 1-based row number and
+    reason instead of aborting the import, so peak memory is bounded by the
+    chunk size plus the typed holdings that were accepted; a large reject CSV
+    spills over to a temporary file.
+    """
+    total_bytes = getattr(source, "size", None)
+    holdings = HoldingsTable()
+    rejects = None
+    rejected = 0
+    rows = 0
+    header_checked = False
+    has_prices = False
+
+    try:
+        reader = pd.read_csv(source, chunksize=chunksize, dtype=str, skipinitialspace=True)
+    except pd.errors.EmptyDataError:
+        return ImportResult(holdings, 0, error="CSV file is empty")
+    for chunk in reader:
+        # One vectorized validation and coercion pass per chunk
+        result = HOLDINGS_SCHEMA.validate(chunk)
+        if not header_checked:
+            header_checked = True
+            has_prices = "current_price" in chunk.columns
+            if result.missing_columns:
+                return ImportResult(holdings, 0, error=f"Missing required columns: {', '.join(result.missing_columns)}")
+
+        bad = result.invalid_rows
+        if bad.any():
+            reject_df = chunk[bad].copy()
+            reject_df.insert(0, "row", chunk.index[bad] + 1)
+            reject_df.insert(1, "reason", result.reasons()[bad])
+            if rejects is None:
+                rejects = tempfile.SpooledTemporaryFile(max_size=REJECTS_SPOOL_BYTES, mode="w+", newline="")
+            reject_df.to_csv(rejects, index=False, header=rejected == 0)
+            rejected += int(bad.sum())
+
+        good = ~bad
+        if good.any():
+            converted = result.data[good]
+            if "current_price" in converted.columns:
+                converted = converted.assign(current_price=converted["current_price"].fillna(converted["purchase_price"]))
+            holdings.append_frame(converted)
+
+        rows += len(chunk)
+        if progress_callback is not None:
+            position = source.tell() if total_bytes and hasattr(source, "tell") else None
+            fraction = min(position / total_bytes, 1.0) if position is not None else None
+            progress_callback(fraction, rows)
+
+    return ImportResult(holdings, rejected, rejects, has_prices=has_prices)
@@ -0,0 +1,156 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, MutableMapping, Optional, Tuple
+
+import pandas as pd
+
+from .formatting import format_metrics
+from .instrumentation import count
+from .tax_lots import TaxLotLedger
+
+SESSION_KEY = "derived_cache"
+
+
+class DerivedDataCache:
+    """Per-portfolio derived data (metrics, allocation, tables, exports) computed once per change
+
+    Entries are keyed on the holdings table's (token, version) pair, which changes on
+    every mutation and for every newly loaded table, so a stale entry can never be
+    served. At most ``max_entries`` portfolio states are kept, least recently used first out.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._states: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(portfolio: Dict) -> tuple:
+        holdings = portfolio["holdings"]
+        return holdings.token, holdings.version
+
+    def get(self, portfolio: Dict, name: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for ``name`` or compute and store it"""
+        key = self.key(portfolio)
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+                if name in state:
+                    self.hits += 1
+                    count("derived_cache.hits")
+                    return state[name]
+        value = compute()
+        count("derived_cache.misses")
+        with self._lock:
+            self.misses += 1
+            state = self._states.setdefault(key, {})
+            state[name] = value
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+        return value
+
+    def invalidate(self, portfolio: Optional[Dict] = None) -> None:
+        """Drop the entries of one portfolio state, or everything"""
+        with self._lock:
+            if portfolio is None:
+                self._states.clear()
+            else:
+                self._states.pop(self.key(portfolio), None)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    # ------------------------------------------------------------------ shared payloads
+
+    def metrics(self, portfolio: Dict, portfolio_manager, as_of: Optional[date] = None) -> pd.DataFrame:
+        """Metrics frame (value, gain/loss, CAGR, ...) as of a date, today by default"""
+        as_of = as_of or date.today()
+        return self.get(portfolio, f"metrics:{as_of.isoformat()}",
+                        lambda: portfolio_manager.compute_metrics(portfolio["holdings"].to_frame(), as_of=as_of))
+
+    def display_metrics(self, portfolio: Dict, portfolio_manager, as_of: Optional[date] = None) -> pd.DataFrame:
+        """Metrics frame plus its ``<column>_display`` strings, formatted once per portfolio change"""
+        as_of = as_of or date.today()
+        def compute():
+            metrics_df = self.metrics(portfolio, portfolio_manager, as_of)
+            return metrics_df.join(format_metrics(metrics_df))
+        return self.get(portfolio, f"display_metrics:{as_of.isoformat()}", compute)
+
+    def totals(self, portfolio: Dict, portfolio_manager) -> Dict:
+        """Number of holdings, total investment and total value
+
+        Read straight from the table's running aggregates, which are cheaper than a cache lookup.
+        """
+        return portfolio_manager.portfolio_totals(portfolio)
+
+    def allocation(self, portfolio: Dict, portfolio_manager) -> pd.Series:
+        """Current value per asset_type, from the table's running aggregates"""
+        return portfolio_manager.allocation_by_type(portfolio)
+
+    def cagr_table(self, portfolio: Dict, portfolio_manager, as_of: Optional[date] = None) -> pd.DataFrame:
+        """Holdings sorted by CAGR, best first"""
+        as_of = as_of or date.today()
+        return self.get(
+            portfolio, f"cagr_table:{as_of.isoformat()}",
+            lambda: self.metrics(portfolio, portfolio_manager, as_of)[
+                ["asset_name", "asset_type", "cagr", "xirr", "gain_loss"]
+            ].sort_values("cagr", ascending=False)
+        )
+
+    def xirr_by_asset(self, portfolio: Dict, portfolio_manager, as_of: Optional[date] = None) -> pd.DataFrame:
+        """XIRR per asset over all of its lots, best first"""
+        as_of = as_of or date.today()
+        return self.get(
+            portfolio, f"xirr_by_asset:{as_of.isoformat()}",
+            lambda: portfolio_manager.xirr_by_asset(
+                self.metrics(portfolio, portfolio_manager, as_of)
+            ).sort_values("xirr", ascending=False)
+        )
+
+    def portfolio_xirr(self, portfolio: Dict, portfolio_manager, as_of: Optional[date] = None) -> float:
+        """XIRR of the whole portfolio in percent"""
+        as_of = as_of or date.today()
+        return self.get(
+            portfolio, f"portfolio_xirr:{as_of.isoformat()}",
+            lambda: portfolio_manager.portfolio_xirr(self.metrics(portfolio, portfolio_manager, as_of))
+        )
+
+    def positions(self, portfolio: Dict) -> pd.DataFrame:
+        """Open position per asset_id over all of its lots, plus display strings"""
+        def compute():
+            positions = TaxLotLedger.from_holdings(portfolio["holdings"]).positions()
+            return positions.join(format_metrics(positions))
+        return self.get(portfolio, "positions", compute)
+
+    def tax_report(self, portfolio: Dict, trades_csv: bytes,
+                   include_holdings: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Realized and unrealized gains after replaying a trades CSV, optionally over the holdings' lots"""
+        as_of = date.today()
+        def compute():
+            ledger = TaxLotLedger.from_holdings(portfolio["holdings"]) if include_holdings else TaxLotLedger()
+            ledger.replay(pd.read_csv(io.BytesIO(trades_csv), dtype={"asset_id": str, "lot_id": str}))
+            realized, unrealized = ledger.realized_gains(), ledger.unrealized_gains(as_of)
+            return realized.join(format_metrics(realized)), unrealized.join(format_metrics(unrealized))
+        digest = hashlib.sha1(trades_csv).hexdigest()
+        return self.get(portfolio, f"tax_report:{digest}:{include_holdings}:{as_of.isoformat()}", compute)
+
+    def csv_export(self, portfolio: Dict, export_manager, formatted: bool = False) -> str:
+        """CSV export payload, raw numbers or display strings"""
+        return self.get(portfolio, f"csv_export:{'formatted' if formatted else 'raw'}",
+                        lambda: export_manager.export_to_csv(portfolio, formatted=formatted))
+
+
+def get_derived_cache(session_state: MutableMapping) -> DerivedDataCache:
+    """The cache stored in a session state mapping, created on first use"""
+    cache = session_state.get(SESSION_KEY)
+    if cache is None:
+        cache = DerivedDataCache()
+        session_state[SESSION_KEY] = cache
+    return cache
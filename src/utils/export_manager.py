@@ -1,108 +1,205 @@
+import numpy as np
 import pandas as pd
 from io import BytesIO
-from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import os
-from typing import Dict
+from reportlab.platypus import SimpleDocTemplate, LongTable, Table, Paragraph, Spacer, Image
+from reportlab.lib.units import inch
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .holdings_table import as_holdings_table, holdings_frame
+from .chart_service import render_allocation_chart
+from .formatting import format_amount, formatted_holdings
+from .instrumentation import timed
+from .pdf_resources import get_pdf_resources
+
+# Holdings above this count switch the PDF to sectioned, page-sized tables
+LARGE_REPORT_ROWS = 500
+PDF_PAGE_ROWS = 40
+HOLDINGS_HEADER = ['Asset Name', 'Type', 'Quantity', 'Price', 'Value']
+HOLDINGS_COL_WIDTHS = [2.2 * inch, 1.1 * inch, 0.9 * inch, 1.2 * inch, 1.4 * inch]
+HOLDINGS_DISPLAY_COLUMNS = ["quantity_display", "current_price_display", "value_display"]
 
 
 class ExportManager:
-    def __init__(self):
-        self.unicode_font_registered = self._register_unicode_font()
+    def __init__(self, font: Optional[str] = None):
+        # Fonts and styles are prepared once per process and shared by every instance
+        self.resources = get_pdf_resources(font)
+        self.unicode_font_registered = self.resources.unicode_font
     
-    def _register_unicode_font(self) -> bool:
-        """Try to register a Unicode-capable font"""
-        font_paths = [
-            'C:/Windows/Fonts/arial.ttf',  # Windows
-            '/System/Library/Fonts/Arial.ttf',  # macOS
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',  # Linux
-        ]
+    @timed
+    def export_to_csv(self, portfolio: Dict, formatted: bool = False) -> str:
+        """Export portfolio to CSV format
         
-        for font_path in font_paths:
-            try:
-                if os.path.exists(font_path):
-                    pdfmetrics.registerFont(TTFont('UnicodeFont', font_path))
-                    return True
-            except:
-                continue
-        return False
-    
-    def export_to_csv(self, portfolio: Dict) -> str:
-        """Export portfolio to CSV format"""
+        With ``formatted``, prices come out as display strings (₹ with Indian digit
+        grouping) followed by value and gain/loss columns, as shown in the app.
+        """
         if not portfolio["holdings"]:
             return ""
         
-        df = pd.DataFrame(portfolio["holdings"])
+        df = holdings_frame(portfolio["holdings"])
+        if formatted:
+            display = formatted_holdings(portfolio["holdings"])
+            df = df.assign(
+                purchase_price=display["purchase_price_display"].to_numpy(),
+                current_price=display["current_price_display"].to_numpy(),
+                value=display["value_display"].to_numpy(),
+                gain_loss=display["gain_loss_display"].to_numpy(),
+            )
         return df.to_csv(index=False)
     
-    def generate_pdf_report(self, portfolio: Dict) -> bytes:
+    @timed
+    def generate_pdf_report(self, portfolio: Dict, include_chart: bool = True) -> bytes:
         """Generate PDF report from portfolio data"""
+        buffer = BytesIO()
+        self.write_pdf_report(portfolio, buffer, include_chart=include_chart)
+        pdf_data = buffer.getvalue()
+        buffer.close()
+        return pdf_data
+    
+    @timed
+    def write_pdf_report(self, portfolio: Dict, sink: BinaryIO, include_chart: bool = True,
+                         large: Optional[bool] = None, page_rows: int = PDF_PAGE_ROWS,
+                         progress_callback: Optional[Callable[[float], None]] = None) -> None:
+        """Write the PDF report to a file-like sink
+        
+        Portfolios above LARGE_REPORT_ROWS holdings (or any portfolio when ``large``
+        is True) are laid out as one section per asset type, split into page-sized
+        LongTables with a repeating header and a subtotal row per section.
+        ``progress_callback`` receives the fraction of holdings laid out so far.
+        """
         try:
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            styles = getSampleStyleSheet()
-            
-            # Set Unicode font if available
-            if self.unicode_font_registered:
-                styles['Normal'].fontName = 'UnicodeFont'
-                styles['Title'].fontName = 'UnicodeFont'
-                styles['Heading2'].fontName = 'UnicodeFont'
+            doc = SimpleDocTemplate(sink, pagesize=letter, pageCompression=1)
+            styles = self.resources.styles
             
-            story = []
+            story = _FlowableStream()
             
             # Title
             title = Paragraph(f"Portfolio Report: {portfolio['name']}", styles['Title'])
             story.append(title)
             story.append(Spacer(1, 12))
             
-            # Portfolio summary
-            total_value = sum(h["quantity"] * h["current_price"] for h in portfolio["holdings"])
-            currency = "₹" if self.unicode_font_registered else "Rs."
-            summary = Paragraph(f"<b>Total Value:</b> {currency}{total_value:,.2f}<br/><b>Number of Holdings:</b> {len(portfolio['holdings'])}", styles['Normal'])
+            # Portfolio summary; totals come from the table's running aggregates
+            holdings = as_holdings_table(portfolio["holdings"])
+            holdings_df = holdings.to_frame()
+            total_value = holdings.total_value()
+            allocation = holdings.allocation_by_type()
+            currency = self.resources.currency
+            # Display strings for every row, formatted once per table version and currency symbol;
+            # a plain object array iterates much faster than the string columns
+            formatted = formatted_holdings(holdings, currency)[HOLDINGS_DISPLAY_COLUMNS].to_numpy(dtype=object)
+            summary = Paragraph(f"<b>Total Value:</b> {format_amount(total_value, currency)}<br/><b>Number of Holdings:</b> {len(holdings_df)}", styles['Normal'])
             story.append(summary)
             story.append(Spacer(1, 12))
             
+            # Asset allocation chart, reusing the image cached for the Summary tab
+            if include_chart and total_value > 0:
+                chart = render_allocation_chart(allocation, total_value)
+                story.append(Image(BytesIO(chart.image), width=4 * inch, height=4 * inch))
+                story.append(Spacer(1, 12))
+            
             # Holdings table
             holdings_title = Paragraph("<b>Holdings</b>", styles['Heading2'])
             story.append(holdings_title)
             story.append(Spacer(1, 6))
             
-            # Table data
-            data = [['Asset Name', 'Type', 'Quantity', 'Price', 'Value']]
-            for holding in portfolio["holdings"]:
-                value = holding["quantity"] * holding["current_price"]
-                data.append([
-                    holding["asset_name"][:25],
-                    holding["asset_type"],
-                    f"{holding['quantity']:.2f}",
-                    f"{currency}{holding['current_price']:,.2f}",
-                    f"{currency}{value:,.2f}"
-                ])
-            
-            table = Table(data)
-            font_name = 'UnicodeFont' if self.unicode_font_registered else 'Helvetica'
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), font_name),
-                ('FONTNAME', (0, 1), (-1, -1), font_name),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(table)
+            if large is None:
+                large = len(holdings_df) > LARGE_REPORT_ROWS
+            if large and len(holdings_df):
+                story.extend_lazily(self._sectioned_holdings(holdings_df, formatted, allocation, currency, page_rows,
+                                                             progress_callback))
+            else:
+                story.append(self._holdings_table(holdings_df, formatted))
             
             doc.build(story)
-            pdf_data = buffer.getvalue()
-            buffer.close()
-            
-            return pdf_data
+            if progress_callback is not None:
+                progress_callback(1.0)
         except Exception as e:
-            raise Exception(f"Error generating PDF: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error generating PDF: {str(e)}")
+    
+    def _holdings_table(self, holdings_df: pd.DataFrame, formatted: np.ndarray) -> Table:
+        """Single table of every holding, used for regular-sized portfolios"""
+        data = [HOLDINGS_HEADER]
+        if len(holdings_df):
+            data.extend(_holding_rows(holdings_df, formatted))
+        
+        table = Table(data)
+        table.setStyle(self.resources.holdings_table_style)
+        return table
+    
+    def _sectioned_holdings(self, holdings_df: pd.DataFrame, formatted: np.ndarray, subtotals: pd.Series, currency: str,
+                            page_rows: int, progress_callback: Optional[Callable[[float], None]] = None) -> Iterator:
+        """Per asset type sections of page-sized LongTables, each section closed by a subtotal row
+        
+        Small fixed-size tables keep ReportLab's layout cost linear in the number of
+        rows; one huge Table is re-measured on every page split. Tables are generated
+        as the document consumes them, so only a few pages of rows exist at a time.
+        """
+        styles = self.resources.styles
+        chunk_style = self.resources.section_table_style
+        subtotal_style = self.resources.subtotal_row_style
+        
+        done = 0
+        for asset_type, positions in holdings_df.groupby("asset_type", observed=True, sort=True).indices.items():
+            section_df = holdings_df.iloc[positions]
+            section_formatted = formatted[positions]
+            yield Paragraph(f"<b>{asset_type}</b> ({len(positions)} holdings)", styles['Normal'])
+            yield Spacer(1, 4)
+            
+            for start in range(0, len(positions), page_rows):
+                stop = start + page_rows
+                data = [HOLDINGS_HEADER]
+                data.extend(_holding_rows(section_df.iloc[start:stop], section_formatted[start:stop]))
+                last_chunk = stop >= len(positions)
+                if last_chunk:
+                    data.append([f"Subtotal: {asset_type}", "", "", "", format_amount(float(subtotals[asset_type]), currency)])
+                table = LongTable(data, colWidths=HOLDINGS_COL_WIDTHS, repeatRows=1)
+                table.setStyle(chunk_style)
+                if last_chunk:
+                    table.setStyle(subtotal_style)
+                yield table
+                done += min(stop, len(positions)) - start
+                if progress_callback is not None:
+                    progress_callback(min(done / len(holdings_df), 1.0))
+            yield Spacer(1, 12)
+
+
+class _FlowableStream(list):
+    """Story list that pulls flowables from iterators as the document build consumes it
+    
+    ReportLab only touches the front of the story (index, del, insert, slice
+    assignment) plus len(), so refilling a small lookahead window on those calls
+    lets a report of any size be built without materializing every flowable.
+    """
+    
+    def __init__(self, lookahead: int = 8):
+        super().__init__()
+        self._lookahead = lookahead
+        self._sources: List[Iterator] = []
+    
+    def extend_lazily(self, flowables: Iterable) -> None:
+        self._sources.append(iter(flowables))
+    
+    def _fill(self) -> None:
+        while self._sources and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._sources[0]))
+            except StopIteration:
+                self._sources.pop(0)
+    
+    def __len__(self) -> int:
+        self._fill()
+        return list.__len__(self)
+    
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
+def _holding_rows(holdings_df: pd.DataFrame, formatted: np.ndarray) -> List[List[str]]:
+    """Table rows from the name and type columns plus the HOLDINGS_DISPLAY_COLUMNS strings"""
+    return [
+        [str(asset_name)[:25], asset_type, *display]
+        for asset_name, asset_type, display in zip(
+            holdings_df["asset_name"], holdings_df["asset_type"], formatted.tolist()
+        )
+    ]
@@ -0,0 +1,180 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from .holdings_table import HoldingsTable, holdings_frame
+from .instrumentation import timed
+
+CURRENCY_SYMBOL = "₹"
+GAIN_ARROW = "▲"
+LOSS_ARROW = "▼"
+NOT_AVAILABLE = "N/A"
+# Indian digit grouping of an integer string: last three digits, then pairs (12,34,567)
+INDIAN_GROUPING = re.compile(r"(\d)(?=(?:\d{2})*\d{3}$)")
+
+CURRENCY_COLUMNS = ("purchase_price", "current_price", "value", "investment", "avg_cost", "unit_cost", "cost_basis",
+                    "proceeds")
+GAIN_COLUMNS = ("gain_loss", "unrealized_gain", "realized_gain", "gain")
+PERCENT_COLUMNS = ("gain_pct", "cagr", "xirr")
+FORMATTED_CACHE_SIZE = 8
+
+# Scaled magnitudes below 2**53 are exactly representable integers in float64
+EXACT_INTEGER_LIMIT = 2.0 ** 53
+
+
+def group_indian(digits: str) -> str:
+    """Insert Indian grouping commas into a string of digits"""
+    return INDIAN_GROUPING.sub(r"\1,", digits)
+
+
+def format_amount(value: float, symbol: str = CURRENCY_SYMBOL, decimals: int = 2) -> str:
+    """Single currency amount with Indian grouping, for metrics and summary lines"""
+    if value is None or not np.isfinite(value):
+        return NOT_AVAILABLE
+    whole, _, fraction = f"{abs(value):.{decimals}f}".partition(".")
+    sign = "-" if value < 0 and float(f"{abs(value):.{decimals}f}") else ""
+    return f"{sign}{symbol}{group_indian(whole)}{'.' if decimals else ''}{fraction}"
+
+
+@lru_cache(maxsize=None)
+def _number_strings(width: int, padded: bool) -> np.ndarray:
+    """'0' .. '<10**width - 1>' as a lookup table, zero-padded to width when asked"""
+    return np.array([str(i).zfill(width) if padded else str(i) for i in range(10 ** width)])
+
+
+def _integer_text(whole: np.ndarray, grouped: bool) -> np.ndarray:
+    """Non-negative int64 values as digit strings, with Indian grouping when asked
+
+    The text is built from the right out of the last three digits and then
+    pairs (or triples when ungrouped), each looked up in a small table, so a
+    column needs a handful of array operations rather than one call per value.
+    """
+    step, separator = (2, ",") if grouped else (3, "")
+    rest = whole // 1000
+    text = np.where(rest > 0, _number_strings(3, True)[whole % 1000], _number_strings(3, False)[whole % 1000])
+    active = np.flatnonzero(rest > 0)
+    while len(active):
+        piece, remaining = np.divmod(rest[active], 10 ** step)[::-1]
+        rest[active] = remaining
+        head = np.where(remaining > 0, _number_strings(step, True)[piece], _number_strings(step, False)[piece])
+        text = text.astype(f"U{text.dtype.itemsize // 4 + step + len(separator)}")
+        text[active] = np.char.add(np.char.add(head, separator), text[active])
+        active = active[remaining > 0]
+    return text
+
+
+def _fixed_point(values, decimals: int, grouped: bool):
+    """Text of |values| rounded like '%.2f', plus the sign after rounding and a finite mask
+
+    Rows whose scaled value is an exact float64 integer are rounded with NumPy.
+    Rows that are too large for that, or whose scaled value lands exactly on
+    .5 (a tie the binary value may not really be on), use Python's formatting.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    magnitudes = np.abs(np.where(finite, values, 0.0))
+    product = magnitudes * 10.0 ** decimals
+    fast = (product < EXACT_INTEGER_LIMIT) & (product - np.floor(product) != 0.5)
+    whole, fraction = np.divmod(np.rint(np.where(fast, product, 0.0)).astype(np.int64), 10 ** decimals)
+    text = _integer_text(whole, grouped)
+    if decimals:
+        text = np.char.add(np.char.add(text, "."), _number_strings(decimals, True)[fraction])
+    nonzero = (whole > 0) | (fraction > 0)
+    slow = np.flatnonzero(~fast)
+    if len(slow):
+        exact = [f"{magnitude:.{decimals}f}" for magnitude in magnitudes[slow].tolist()]
+        nonzero[slow] = [float(digits) != 0 for digits in exact]
+        if grouped:
+            exact = ["{}{}{}".format(group_indian(integer), point, fraction)
+                     for integer, point, fraction in (digits.partition(".") for digits in exact)]
+        exact = np.array(exact)
+        text = text.astype(np.result_type(text, exact))
+        text[slow] = exact
+    return text, np.sign(values) * nonzero, finite
+
+
+@timed
+def format_currency(values, symbol: str = CURRENCY_SYMBOL, decimals: int = 2) -> np.ndarray:
+    """Currency strings with Indian grouping (-₹12,34,567.89) for a whole column"""
+    text, sign, finite = _fixed_point(values, decimals, grouped=True)
+    formatted = np.char.add(np.where(sign < 0, "-" + symbol, symbol), text)
+    return np.where(finite, formatted, NOT_AVAILABLE)
+
+
+@timed
+def format_gain_loss(values, symbol: str = CURRENCY_SYMBOL, decimals: int = 2) -> np.ndarray:
+    """Gain/loss strings with an arrow for the direction (▲ ₹1,200.00, ▼ ₹300.00, ₹0.00)"""
+    text, sign, finite = _fixed_point(values, decimals, grouped=True)
+    prefix = np.where(sign < 0, f"{LOSS_ARROW} {symbol}", np.where(sign > 0, f"{GAIN_ARROW} {symbol}", symbol))
+    return np.where(finite, np.char.add(prefix, text), NOT_AVAILABLE)
+
+
+def format_percent(values, decimals: int = 2) -> np.ndarray:
+    """Percentage labels (12.34%) for a whole column; NaN becomes N/A"""
+    text, sign, finite = _fixed_point(values, decimals, grouped=False)
+    formatted = np.char.add(np.char.add(np.where(sign < 0, "-", ""), text), "%")
+    return np.where(finite, formatted, NOT_AVAILABLE)
+
+
+def format_number(values, decimals: int = 2) -> np.ndarray:
+    """Plain fixed-point numbers such as quantities (1234.50)"""
+    text, sign, finite = _fixed_point(values, decimals, grouped=False)
+    return np.where(finite, np.char.add(np.where(sign < 0, "-", ""), text), NOT_AVAILABLE)
+
+
+def format_metrics(df: pd.DataFrame, symbol: str = CURRENCY_SYMBOL) -> pd.DataFrame:
+    """``<column>_display`` strings for whichever quantity, currency, gain and percent columns df has"""
+    columns: Dict[str, np.ndarray] = {}
+    if "quantity" in df.columns:
+        columns["quantity_display"] = format_number(df["quantity"])
+    for column in CURRENCY_COLUMNS:
+        if column in df.columns:
+            columns[f"{column}_display"] = format_currency(df[column], symbol)
+    for column in GAIN_COLUMNS:
+        if column in df.columns:
+            columns[f"{column}_display"] = format_gain_loss(df[column], symbol)
+    for column in PERCENT_COLUMNS:
+        if column in df.columns:
+            columns[f"{column}_display"] = format_percent(df[column])
+    return pd.DataFrame(columns, index=df.index)
+
+
+_formatted: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+_formatted_lock = threading.Lock()
+
+
+def formatted_holdings(holdings: Union[HoldingsTable, list], symbol: str = CURRENCY_SYMBOL) -> pd.DataFrame:
+    """Display strings for holdings plus their value and gain/loss, formatted once per table version
+
+    Shared by the CSV and PDF exports; the last few (table, version, symbol) results are
+    kept process-wide, so re-exporting an unchanged portfolio does not format it again.
+    """
+    key = (holdings.token, holdings.version, symbol) if isinstance(holdings, HoldingsTable) else None
+    if key is not None:
+        with _formatted_lock:
+            cached = _formatted.get(key)
+            if cached is not None:
+                _formatted.move_to_end(key)
+                return cached
+    df = holdings_frame(holdings)
+    frame = pd.DataFrame({
+        "quantity": df["quantity"],
+        "purchase_price": df["purchase_price"],
+        "current_price": df["current_price"],
+        "value": df["quantity"] * df["current_price"],
+        "investment": df["quantity"] * df["purchase_price"],
+        "gain_loss": (df["current_price"] - df["purchase_price"]) * df["quantity"],
+    }) if len(df) else pd.DataFrame(columns=["quantity", "purchase_price", "current_price", "value",
+                                              "investment", "gain_loss"], dtype=np.float64)
+    formatted = format_metrics(frame, symbol)
+    if key is not None:
+        with _formatted_lock:
+            _formatted[key] = formatted
+            while len(_formatted) > FORMATTED_CACHE_SIZE:
+                _formatted.popitem(last=False)
+    return formatted
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import timed
+
+# Free-text search matches either of these columns, case-insensitively
+SEARCH_COLUMNS = ("asset_id", "asset_name")
+QUERY_CACHE_SIZE = 8
+
+
+class GridPage(NamedTuple):
+    rows: pd.DataFrame
+    total: int
+    page: int
+    pages: int
+    start: int
+
+
+class HoldingsGrid:
+    """Server-side sorted, filtered and paginated view over a holdings or metrics frame
+
+    Sort orders are computed once per (column, direction) and the row positions of
+    the last few queries are kept, so turning a page only slices an index array and
+    takes ``page_size`` rows from the frame. Build one per portfolio state.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame.reset_index(drop=True)
+        self._orders: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._queries: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def asset_types(self) -> List[str]:
+        """Distinct asset types present in the frame, sorted"""
+        return sorted(self.frame["asset_type"].dropna().astype(str).unique())
+
+    def _sort_key(self, column: str) -> np.ndarray:
+        """Float key per row that sorts like the column; NaN for missing values"""
+        values = self.frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Rank the (few) categories once, then map every row through its code
+            categories = values.cat.categories.astype(str)
+            ranks = np.empty(len(categories) + 1, dtype=np.float64)
+            ranks[:-1] = np.argsort(np.argsort(categories.str.lower().to_numpy(), kind="stable"), kind="stable")
+            ranks[-1] = np.nan
+            return ranks[values.cat.codes.to_numpy()]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            keys = values.to_numpy().view(np.int64).astype(np.float64)
+            keys[values.isna().to_numpy()] = np.nan
+            return keys
+        if pd.api.types.is_numeric_dtype(values):
+            return values.to_numpy(dtype=np.float64, na_value=np.nan)
+        codes, _ = pd.factorize(values.astype(str).str.lower(), sort=True)
+        return codes.astype(np.float64)
+
+    def sort_order(self, column: str, ascending: bool = True) -> np.ndarray:
+        """Stable row order for a column with missing values last, computed once per direction"""
+        key = (column, ascending)
+        with self._lock:
+            order = self._orders.get(key)
+        if order is None:
+            sort_key = self._sort_key(column)
+            # Negating keeps NaN at the end and ties in frame order when descending
+            order = np.argsort(sort_key if ascending else -sort_key, kind="stable")
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def _mask(self, asset_type: Optional[str], search: str) -> Optional[np.ndarray]:
+        mask = None
+        if asset_type:
+            mask = (self.frame["asset_type"].astype(str) == asset_type).to_numpy()
+        if search:
+            hits = np.zeros(len(self.frame), dtype=bool)
+            for column in SEARCH_COLUMNS:
+                values = self.frame[column]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    # Match the distinct values only, then broadcast through the codes
+                    matched = values.cat.categories.astype(str).str.contains(search, case=False, regex=False)
+                    hits |= np.append(matched, False)[values.cat.codes.to_numpy()]
+                else:
+                    hits |= values.astype(str).str.contains(search, case=False, regex=False).to_numpy(dtype=bool)
+            mask = hits if mask is None else mask & hits
+        return mask
+
+    @timed
+    def rows(self, sort_by: Optional[str] = None, ascending: bool = True, asset_type: Optional[str] = None,
+             search: str = "") -> np.ndarray:
+        """Positions of the matching rows in display order"""
+        search = search.strip()
+        key = (sort_by, ascending, asset_type or None, search.lower())
+        with self._lock:
+            positions = self._queries.get(key)
+            if positions is not None:
+                self._queries.move_to_end(key)
+                return positions
+        order = self.sort_order(sort_by, ascending) if sort_by else np.arange(len(self.frame))
+        mask = self._mask(asset_type, search)
+        positions = order if mask is None else order[mask[order]]
+        with self._lock:
+            self._queries[key] = positions
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return positions
+
+    def page(self, page: int = 1, page_size: int = 50, sort_by: Optional[str] = None, ascending: bool = True,
+             asset_type: Optional[str] = None, search: str = "") -> GridPage:
+        """One page of matching rows; out-of-range page numbers are clamped"""
+        positions = self.rows(sort_by, ascending, asset_type, search)
+        total = len(positions)
+        pages = max(1, -(-total // page_size))
+        page = min(max(page, 1), pages)
+        start = (page - 1) * page_size
+        return GridPage(self.frame.take(positions[start:start + page_size]), total, page, pages, start)
@@ -0,0 +1,675 @@
+import hashlib
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+FLOAT_COLUMNS = ("quantity", "purchase_price", "current_price")
+STRING_COLUMNS = ("asset_type", "asset_id", "asset_name")
+DATE_COLUMN = "purchase_date"
+COLUMNS = ("asset_type", "asset_id", "asset_name", "quantity", "purchase_price", "current_price", DATE_COLUMN)
+
+# Second resolution is the coarsest datetime64 unit pandas keeps without converting
+DATE_DTYPE = "datetime64[s]"
+
+_tokens = itertools.count(1)
+
+# Packed (asset_id code, day) key: the day keeps the low 32 bits, and a missing
+# purchase date gets a value no real day in datetime64 range reaches
+_NO_DAY = 0x80000000
+
+
+class HoldingsAggregates:
+    """Running totals of a HoldingsTable, kept up to date by its mutations
+
+    Holding count, invested amount and current value are kept as running
+    sums, overall and in per-asset_type buckets indexed by the asset_type
+    code. Appending, removing or repricing k rows costs O(k); nothing is ever
+    recomputed from the full table. Float sums can drift from a fresh
+    recompute by rounding error only.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.investment = 0.0
+        self.value = 0.0
+        self.type_count = np.zeros(0, dtype=np.int64)
+        self.type_investment = np.zeros(0, dtype=np.float64)
+        self.type_value = np.zeros(0, dtype=np.float64)
+
+    def copy(self) -> "HoldingsAggregates":
+        aggregates = HoldingsAggregates()
+        aggregates.count, aggregates.investment, aggregates.value = self.count, self.investment, self.value
+        aggregates.type_count = self.type_count.copy()
+        aggregates.type_investment = self.type_investment.copy()
+        aggregates.type_value = self.type_value.copy()
+        return aggregates
+
+    def _grow(self, n_types: int) -> None:
+        if n_types <= len(self.type_count):
+            return
+        extra = n_types - len(self.type_count)
+        self.type_count = np.concatenate((self.type_count, np.zeros(extra, dtype=np.int64)))
+        self.type_investment = np.concatenate((self.type_investment, np.zeros(extra)))
+        self.type_value = np.concatenate((self.type_value, np.zeros(extra)))
+
+    def add_one(self, type_code: int, quantity: float, purchase_price: float, current_price: float) -> None:
+        self._grow(type_code + 1)
+        investment, value = quantity * purchase_price, quantity * current_price
+        self.count += 1
+        self.investment += investment
+        self.value += value
+        self.type_count[type_code] += 1
+        self.type_investment[type_code] += investment
+        self.type_value[type_code] += value
+
+    def add(self, type_codes: np.ndarray, quantity: np.ndarray, purchase_price: np.ndarray,
+            current_price: np.ndarray, sign: int = 1) -> None:
+        """Add (sign=1) or subtract (sign=-1) a batch of rows"""
+        if not len(type_codes):
+            return
+        n_types = max(len(self.type_count), int(type_codes.max()) + 1)
+        self._grow(n_types)
+        investment, value = quantity * purchase_price, quantity * current_price
+        self.count += sign * len(type_codes)
+        self.investment += sign * float(investment.sum())
+        self.value += sign * float(value.sum())
+        self.type_count += sign * np.bincount(type_codes, minlength=n_types)
+        self.type_investment += sign * np.bincount(type_codes, weights=investment, minlength=n_types)
+        self.type_value += sign * np.bincount(type_codes, weights=value, minlength=n_types)
+        if sign < 0:
+            # Emptied buckets are exactly zero, not the rounding residue of their removals
+            empty = self.type_count == 0
+            self.type_investment[empty] = 0.0
+            self.type_value[empty] = 0.0
+            if self.count == 0:
+                self.investment = self.value = 0.0
+
+    def reprice(self, type_codes: np.ndarray, quantity: np.ndarray, old_price: np.ndarray,
+                new_price: np.ndarray) -> None:
+        """Apply price changes of the given rows to the value sums"""
+        if not len(type_codes):
+            return
+        delta = quantity * (new_price - old_price)
+        self.value += float(delta.sum())
+        self.type_value += np.bincount(type_codes, weights=delta, minlength=len(self.type_value))
+
+
+class UpsertResult(NamedTuple):
+    added: int
+    updated: int
+    unchanged: int
+    # Updated rows first, then added ones, as they now are in the table
+    changes: "HoldingsTable"
+    # Per change, its rank among rows sharing its asset_id and purchase date
+    occurrence: np.ndarray
+
+
+class _KeyIndex:
+    """Row lookup on (asset_id, purchase date, occurrence) that appends extend in place
+
+    Rows present when it is built go into a hash MultiIndex. Rows appended
+    later go into a dict, with their occurrence counted from the sorted base
+    keys, so an append costs O(appended rows) instead of a rebuild.
+    """
+
+    def __init__(self, keys: np.ndarray):
+        self.base = pd.MultiIndex.from_arrays([keys, _occurrence(keys)])
+        self.sorted_keys = np.sort(keys)
+        self.size = len(keys)
+        self.appended: Dict[Tuple[int, int], int] = {}
+        self.appended_counts: Dict[int, int] = {}
+
+    def extend(self, keys: np.ndarray) -> None:
+        """Add rows appended at the end of the table"""
+        base_counts = (np.searchsorted(self.sorted_keys, keys, side="right")
+                       - np.searchsorted(self.sorted_keys, keys, side="left"))
+        for key, base_count in zip(keys.tolist(), base_counts.tolist()):
+            appended = self.appended_counts.get(key, 0)
+            self.appended[(key, base_count + appended)] = self.size
+            self.appended_counts[key] = appended + 1
+            self.size += 1
+
+    def get_indexer(self, keys: np.ndarray, occurrence: np.ndarray) -> np.ndarray:
+        """Row of each (key, occurrence) pair, -1 where the table has none"""
+        positions = self.base.get_indexer(pd.MultiIndex.from_arrays([keys, occurrence]))
+        if self.appended:
+            missing = np.flatnonzero(positions < 0)
+            positions[missing] = [self.appended.get(pair, -1)
+                                  for pair in zip(keys[missing].tolist(), occurrence[missing].tolist())]
+        return positions
+
+
+class HoldingsTable:
+    """Columnar holdings store backed by typed NumPy arrays
+
+    Quantities and prices are float64, purchase dates datetime64 and the string
+    columns are interned into per-column category lists and stored as int32 codes.
+    Rows inside a buffer that may back a frame or view handed out earlier are
+    never written in place: appends fill spare capacity, removals swap in new
+    buffers and updates copy such a buffer before patching it, so frames
+    returned by to_frame() stay valid, zero-copy snapshots.
+    """
+
+    def __init__(self, capacity: int = 16):
+        capacity = max(int(capacity), 1)
+        self._size = 0
+        self._floats = {col: np.empty(capacity, dtype=np.float64) for col in FLOAT_COLUMNS}
+        self._codes = {col: np.empty(capacity, dtype=np.int32) for col in STRING_COLUMNS}
+        self._dates = np.empty(capacity, dtype=DATE_DTYPE)
+        self._categories: Dict[str, List[str]] = {col: [] for col in STRING_COLUMNS}
+        self._lookup: Dict[str, Dict[str, int]] = {col: {} for col in STRING_COLUMNS}
+        self._category_index: Dict[str, Optional[pd.Index]] = {col: None for col in STRING_COLUMNS}
+        # Unique per instance, so (token, version) identifies one state of one table
+        self.token = next(_tokens)
+        self.version = 0
+        self._content_hash: Optional[tuple] = None
+        self._key_index: Optional[_KeyIndex] = None
+        self._aggregates = HoldingsAggregates()
+        # Columns whose current buffer may be referenced outside the table
+        self._shared: set = set()
+
+    # ------------------------------------------------------------------ construction
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "HoldingsTable":
+        """Build a table from a list of holding dicts (the JSON format)"""
+        records = list(records)
+        table = cls(capacity=len(records))
+        if records:
+            table.append_frame(pd.DataFrame.from_records(records))
+        return table
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "HoldingsTable":
+        """Build a table from a holdings DataFrame"""
+        table = cls(capacity=len(df))
+        table.append_frame(df)
+        return table
+
+    @classmethod
+    def from_columns(cls, floats: Dict[str, np.ndarray], codes: Dict[str, np.ndarray],
+                     categories: Dict[str, Sequence[str]], dates: np.ndarray) -> "HoldingsTable":
+        """Adopt column arrays as the table's buffers without copying or re-interning
+
+        This is the inverse of to_columns(). Arrays that already have the
+        buffer dtype become the buffers themselves, so the caller must not
+        modify them afterwards.
+        """
+        n = len(dates)
+        table = cls(capacity=1)
+        for col in FLOAT_COLUMNS:
+            table._floats[col] = np.asarray(floats[col], dtype=np.float64)
+        for col in STRING_COLUMNS:
+            table._codes[col] = np.asarray(codes[col], dtype=np.int32)
+            values = [str(value) for value in categories[col]]
+            table._categories[col] = values
+            table._lookup[col] = {value: code for code, value in enumerate(values)}
+            if len(table._codes[col]) and (table._codes[col].min() < 0 or table._codes[col].max() >= len(values)):
+                raise ValueError(f"Codes of {col} do not match its categories")
+        table._dates = np.asarray(dates, dtype=DATE_DTYPE)
+        lengths = {len(arr) for arr in itertools.chain(table._floats.values(), table._codes.values())}
+        if lengths - {n}:
+            raise ValueError("Holdings columns have different lengths")
+        table._size = n
+        table._shared.update(COLUMNS)
+        table._aggregates.add(table._codes["asset_type"], *(table._floats[col] for col in FLOAT_COLUMNS))
+        return table
+
+    def snapshot(self) -> "HoldingsTable":
+        """Table with this one's current rows that shares its buffers, e.g. to roll back a merge
+
+        Costs no column copies: both tables treat the shared buffers as
+        exported, so whichever is changed first copies the columns it touches.
+        """
+        n = self._size
+        table = HoldingsTable(capacity=1)
+        table._floats = {col: arr[:n] for col, arr in self._floats.items()}
+        table._codes = {col: arr[:n] for col, arr in self._codes.items()}
+        table._dates = self._dates[:n]
+        table._categories = {col: list(values) for col, values in self._categories.items()}
+        table._lookup = {col: dict(lookup) for col, lookup in self._lookup.items()}
+        table._size = n
+        table._aggregates = self._aggregates.copy()
+        table._shared.update(COLUMNS)
+        self._shared.update(COLUMNS)
+        return table
+
+    # ------------------------------------------------------------------ sizing
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.to_records())
+
+    def _reserve(self, extra: int) -> None:
+        """Grow the buffers geometrically so appends are amortized O(1)"""
+        needed = self._size + extra
+        capacity = len(self._dates)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for store in (self._floats, self._codes):
+            for col, arr in store.items():
+                grown = np.empty(new_capacity, dtype=arr.dtype)
+                grown[:self._size] = arr[:self._size]
+                store[col] = grown
+        grown = np.empty(new_capacity, dtype=DATE_DTYPE)
+        grown[:self._size] = self._dates[:self._size]
+        self._dates = grown
+        self._shared.clear()
+
+    # ------------------------------------------------------------------ interning
+
+    def _intern(self, col: str, value: str) -> int:
+        lookup = self._lookup[col]
+        code = lookup.get(value)
+        if code is None:
+            code = len(self._categories[col])
+            lookup[value] = code
+            self._categories[col].append(value)
+            self._category_index[col] = None
+        return code
+
+    def _intern_many(self, col: str, values: pd.Series) -> np.ndarray:
+        """Map a column of strings to codes, adding unseen values as new categories"""
+        # Hash-based factorize, then only the distinct values are sorted so new
+        # categories are still interned in sorted order
+        inverse, uniques = pd.factorize(values.astype(str))
+        uniques = np.asarray(uniques, dtype=object)
+        order = np.argsort(uniques, kind="stable")
+        unique_codes = np.empty(len(uniques), dtype=np.int32)
+        unique_codes[order] = np.fromiter((self._intern(col, value) for value in uniques[order]), dtype=np.int32,
+                                          count=len(uniques))
+        return unique_codes[inverse]
+
+    def categories(self, col: str) -> pd.Index:
+        """Interned values of a string column, indexed by code"""
+        index = self._category_index[col]
+        if index is None:
+            index = pd.Index(self._categories[col], dtype=object)
+            self._category_index[col] = index
+        return index
+
+    # ------------------------------------------------------------------ mutation
+
+    def append(self, holding: Dict) -> None:
+        """Append a single holding dict"""
+        self._reserve(1)
+        i = self._size
+        for col in STRING_COLUMNS:
+            self._codes[col][i] = self._intern(col, str(holding[col]))
+        self._floats["quantity"][i] = holding["quantity"]
+        self._floats["purchase_price"][i] = holding["purchase_price"]
+        self._floats["current_price"][i] = holding.get("current_price", holding["purchase_price"])
+        self._dates[i] = _to_datetime64(holding.get(DATE_COLUMN))
+        self._aggregates.add_one(int(self._codes["asset_type"][i]),
+                                 *(float(self._floats[col][i]) for col in FLOAT_COLUMNS))
+        self._size += 1
+        self._extend_key_index(i)
+        self.version += 1
+
+    def append_frame(self, df: pd.DataFrame) -> None:
+        """Append every row of a holdings DataFrame with column-wise copies"""
+        n = len(df)
+        if n == 0:
+            return
+        self._reserve(n)
+        start, stop = self._size, self._size + n
+        for col in STRING_COLUMNS:
+            self._codes[col][start:stop] = self._intern_many(col, df[col])
+        for col in ("quantity", "purchase_price"):
+            self._floats[col][start:stop] = df[col].to_numpy(dtype=np.float64)
+        current = df["current_price"] if "current_price" in df.columns else df["purchase_price"]
+        self._floats["current_price"][start:stop] = current.to_numpy(dtype=np.float64)
+        if DATE_COLUMN in df.columns:
+            self._dates[start:stop] = _to_datetime64_array(df[DATE_COLUMN])
+        else:
+            self._dates[start:stop] = np.datetime64("NaT")
+        self._aggregates.add(self._codes["asset_type"][start:stop],
+                             *(self._floats[col][start:stop] for col in FLOAT_COLUMNS))
+        self._size = stop
+        self._extend_key_index(start)
+        self.version += 1
+
+    def remove_at(self, positions: Union[int, Iterable[int]]) -> int:
+        """Remove rows by position; returns the number of rows removed"""
+        keep = np.ones(self._size, dtype=bool)
+        keep[np.atleast_1d(np.asarray(positions, dtype=np.intp))] = False
+        return self._compact(keep)
+
+    def remove(self, asset_id: str, purchase_date=None) -> int:
+        """Remove holdings by asset_id, optionally narrowed to one purchase_date"""
+        code = self._lookup["asset_id"].get(str(asset_id))
+        if code is None:
+            return 0
+        match = self._codes["asset_id"][:self._size] == code
+        if purchase_date is not None:
+            match &= self._dates[:self._size] == _to_datetime64(purchase_date)
+        return self._compact(~match)
+
+    def set_current_prices(self, prices: np.ndarray) -> None:
+        """Replace the current_price column with an aligned array of new prices"""
+        prices = np.asarray(prices, dtype=np.float64)
+        if prices.shape != (self._size,):
+            raise ValueError(f"Expected {self._size} prices, got {prices.shape[0] if prices.ndim else 1}")
+        old = self._floats["current_price"][:self._size]
+        changed = np.flatnonzero(prices != old)
+        self._aggregates.reprice(self._codes["asset_type"][changed], self._floats["quantity"][changed],
+                                 old[changed], prices[changed])
+        # New buffer instead of an in-place write, leaving earlier frame views intact
+        buffer = np.empty(len(self._dates), dtype=np.float64)
+        buffer[:self._size] = prices
+        self._floats["current_price"] = buffer
+        self._shared.discard("current_price")
+        self.version += 1
+
+    def update_rows(self, positions: Union[Sequence[int], np.ndarray], df: pd.DataFrame) -> None:
+        """Overwrite the rows at the given positions with the aligned rows of a holdings DataFrame
+
+        Only columns whose values change are written, so the cost follows the
+        number of rows updated, plus one copy of each changed column whose
+        buffer may back an earlier frame.
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        if not len(positions):
+            return
+        self._aggregates.add(self._codes["asset_type"][positions],
+                             *(self._floats[col][positions] for col in FLOAT_COLUMNS), sign=-1)
+        values = {col: self._intern_many(col, df[col]) for col in STRING_COLUMNS}
+        for col in ("quantity", "purchase_price"):
+            values[col] = df[col].to_numpy(dtype=np.float64)
+        current = df["current_price"] if "current_price" in df.columns else df["purchase_price"]
+        values["current_price"] = current.to_numpy(dtype=np.float64)
+        if DATE_COLUMN in df.columns:
+            values[DATE_COLUMN] = _to_datetime64_array(df[DATE_COLUMN])
+        else:
+            values[DATE_COLUMN] = np.full(len(positions), np.datetime64("NaT"), dtype=DATE_DTYPE)
+        for col, new in values.items():
+            if self._patch(col, positions, new) and col in ("asset_id", DATE_COLUMN):
+                # Rows changed key, so the lookup is rebuilt on next use
+                self._key_index = None
+        self._aggregates.add(values["asset_type"], *(values[col] for col in FLOAT_COLUMNS))
+        self.version += 1
+
+    def _patch(self, col: str, positions: np.ndarray, new: np.ndarray) -> bool:
+        """Write one column at the given rows; returns False when no value changes"""
+        buffer = self._dates if col == DATE_COLUMN else self._floats[col] if col in FLOAT_COLUMNS else self._codes[col]
+        old = buffer[positions]
+        # int64 views compare NaT equal to NaT
+        if col == DATE_COLUMN and not (old.view(np.int64) != new.view(np.int64)).any():
+            return False
+        if col != DATE_COLUMN and not (old != new).any():
+            return False
+        if col in self._shared:
+            # Copy on write, leaving earlier frame views intact
+            buffer = buffer.copy()
+            if col == DATE_COLUMN:
+                self._dates = buffer
+            elif col in FLOAT_COLUMNS:
+                self._floats[col] = buffer
+            else:
+                self._codes[col] = buffer
+            self._shared.discard(col)
+        buffer[positions] = new
+        return True
+
+    def upsert(self, df: pd.DataFrame, update_prices: bool = True) -> UpsertResult:
+        """Merge holdings keyed by asset_id and purchase date: update changed rows, append new ones
+
+        Incoming rows are matched through the key lookup, with repeated keys paired
+        by occurrence (taken from an ``occurrence`` column when the frame has
+        one). Matched rows whose type, name, quantity or purchase price differ
+        are rewritten in place of the old row; current_price only counts when
+        update_prices is set and the frame has the column. Rows of the table
+        that are absent from the frame are kept.
+        """
+        n = len(df)
+        if "current_price" not in df.columns:
+            update_prices = False
+            df = df.assign(current_price=df["purchase_price"])
+        if DATE_COLUMN in df.columns:
+            dates = _to_datetime64_array(df[DATE_COLUMN])
+        else:
+            dates = np.full(n, np.datetime64("NaT"), dtype=DATE_DTYPE)
+        local_ids, asset_ids = _factorize(df["asset_id"])
+        if "occurrence" in df.columns:
+            occurrence = df["occurrence"].to_numpy(dtype=np.int64)
+        else:
+            occurrence = _occurrence(_pack_keys(local_ids, dates))
+
+        positions = np.full(n, -1, dtype=np.intp)
+        id_codes = self._existing_codes("asset_id", local_ids, asset_ids)
+        known = np.flatnonzero(id_codes >= 0)
+        if len(known):
+            positions[known] = self._key_lookup().get_indexer(_pack_keys(id_codes[known], dates[known]),
+                                                               occurrence[known])
+
+        matched = np.flatnonzero(positions >= 0)
+        rows = positions[matched]
+        differs = np.zeros(len(matched), dtype=bool)
+        for col in ("asset_type", "asset_name"):
+            codes = self._existing_codes(col, *_factorize(df[col]))
+            differs |= codes[matched] != self._codes[col][rows]
+        for col in ("quantity", "purchase_price") + (("current_price",) if update_prices else ()):
+            differs |= df[col].to_numpy(dtype=np.float64)[matched] != self._floats[col][rows]
+
+        updated, added = matched[differs], np.flatnonzero(positions < 0)
+        updates = df.iloc[updated]
+        if not update_prices:
+            updates = updates.assign(current_price=self._floats["current_price"][positions[updated]])
+        additions = df.iloc[added]
+        self.update_rows(positions[updated], updates)
+        self.append_frame(additions)
+        changes = HoldingsTable.from_frame(pd.concat([updates, additions]) if len(updates) else additions)
+        return UpsertResult(len(added), len(updated), len(matched) - len(updated), changes,
+                            np.concatenate((occurrence[updated], occurrence[added])))
+
+    def _existing_codes(self, col: str, local_codes: np.ndarray, values: pd.Index) -> np.ndarray:
+        """Codes of this table for factorized values, -1 where a value was never interned"""
+        mapping = self.categories(col).get_indexer(values)
+        return mapping[local_codes]
+
+    def _key_lookup(self) -> _KeyIndex:
+        """Lookup of the live rows on (asset_id, purchase date, occurrence), kept up to date by appends
+
+        Occurrence numbers rows sharing an asset_id and purchase date in table
+        order, so separate lots bought on the same day keep distinct keys.
+        """
+        if self._key_index is None:
+            self._key_index = _KeyIndex(_pack_keys(self._codes["asset_id"][:self._size], self._dates[:self._size]))
+        return self._key_index
+
+    def _extend_key_index(self, start: int) -> None:
+        """Add the rows from start on, just appended, to an existing key lookup"""
+        if self._key_index is not None:
+            self._key_index.extend(_pack_keys(self._codes["asset_id"][start:self._size],
+                                              self._dates[start:self._size]))
+
+    def _compact(self, keep: np.ndarray) -> int:
+        """Drop the rows where keep is False; copies every column, so O(n) even for one row"""
+        removed = int(self._size - keep.sum())
+        if removed == 0:
+            return 0
+        gone = np.flatnonzero(~keep)
+        self._aggregates.add(self._codes["asset_type"][gone], *(self._floats[col][gone] for col in FLOAT_COLUMNS),
+                             sign=-1)
+        # Fancy indexing allocates new buffers, leaving earlier frame views intact
+        for store in (self._floats, self._codes):
+            for col, arr in store.items():
+                store[col] = arr[:self._size][keep]
+        self._dates = self._dates[:self._size][keep]
+        self._size -= removed
+        self._shared.clear()
+        self._key_index = None
+        self.version += 1
+        return removed
+
+    # ------------------------------------------------------------------ views
+
+    def column(self, col: str) -> np.ndarray:
+        """Read-only view of a numeric or date column"""
+        arr = self._dates if col == DATE_COLUMN else self._floats[col]
+        self._shared.add(col)
+        view = arr[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def codes(self, col: str) -> np.ndarray:
+        """Read-only view of the integer codes of a string column"""
+        self._shared.add(col)
+        view = self._codes[col][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame over the live region of the buffers without copying numeric data"""
+        n = self._size
+        self._shared.update(COLUMNS)
+        data = {}
+        for col in COLUMNS:
+            if col in STRING_COLUMNS:
+                data[col] = pd.Categorical.from_codes(self._codes[col][:n], categories=self.categories(col))
+            elif col == DATE_COLUMN:
+                data[col] = self._dates[:n]
+            else:
+                data[col] = self._floats[col][:n]
+        return pd.DataFrame(data, copy=False)
+
+    def to_columns(self) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], Dict[str, List[str]], np.ndarray]:
+        """Float, code and category columns plus dates of the live region, as views of the buffers"""
+        n = self._size
+        self._shared.update(COLUMNS)
+        floats = {col: self._floats[col][:n] for col in FLOAT_COLUMNS}
+        codes = {col: self._codes[col][:n] for col in STRING_COLUMNS}
+        categories = {col: list(self._categories[col]) for col in STRING_COLUMNS}
+        return floats, codes, categories, self._dates[:n]
+
+    def to_records(self) -> List[Dict]:
+        """List of plain holding dicts in the JSON format"""
+        n = self._size
+        columns = {}
+        for col in STRING_COLUMNS:
+            columns[col] = self.categories(col).to_numpy()[self._codes[col][:n]].tolist()
+        for col in FLOAT_COLUMNS:
+            columns[col] = self._floats[col][:n].tolist()
+        dates = self._dates[:n]
+        columns[DATE_COLUMN] = [None if np.isnat(d) else str(d.astype("datetime64[D]")) for d in dates]
+        return [dict(zip(COLUMNS, row)) for row in zip(*(columns[col] for col in COLUMNS))]
+
+    def content_hash(self) -> str:
+        """SHA-256 of the live rows, independent of interning order and spare capacity"""
+        if self._content_hash is not None and self._content_hash[0] == self.version:
+            return self._content_hash[1]
+        n = self._size
+        digest = hashlib.sha256(np.int64(n).tobytes())
+        for col in STRING_COLUMNS:
+            # Rank the used categories alphabetically so equal contents hash equally
+            # however their values were first interned
+            codes = self._codes[col][:n]
+            used = np.unique(codes)
+            names = np.asarray(self._categories[col], dtype=object)[used]
+            order = np.argsort(names, kind="stable")
+            rank = np.zeros(len(self._categories[col]), dtype=np.int32)
+            rank[used[order]] = np.arange(len(used), dtype=np.int32)
+            digest.update("\x1f".join(names[order]).encode("utf-8") + b"\x1e")
+            digest.update(rank[codes].tobytes())
+        for col in FLOAT_COLUMNS:
+            digest.update(self._floats[col][:n].tobytes())
+        digest.update(self._dates[:n].tobytes())
+        self._content_hash = (self.version, digest.hexdigest())
+        return self._content_hash[1]
+
+    # ------------------------------------------------------------------ totals
+
+    @property
+    def aggregates(self) -> HoldingsAggregates:
+        """Running totals; read-only for callers"""
+        return self._aggregates
+
+    def total_value(self) -> float:
+        """Sum of quantity * current_price"""
+        return self._aggregates.value
+
+    def total_investment(self) -> float:
+        """Sum of quantity * purchase_price"""
+        return self._aggregates.investment
+
+    def totals_by_type(self) -> pd.DataFrame:
+        """Holding count, investment and value per asset_type that has holdings, sorted by type"""
+        aggregates = self._aggregates
+        n_types = len(aggregates.type_count)
+        held = np.flatnonzero(aggregates.type_count > 0)
+        by_type = pd.DataFrame({
+            "holdings": aggregates.type_count[held],
+            "investment": aggregates.type_investment[held],
+            "value": aggregates.type_value[held],
+        }, index=pd.Index(self.categories("asset_type")[:n_types][held], name="asset_type"))
+        return by_type.sort_index()
+
+    def allocation_by_type(self) -> pd.Series:
+        """Current value per asset_type"""
+        return self.totals_by_type()["value"]
+
+
+def _to_datetime64(value) -> np.datetime64:
+    """Convert a date, string or None to a day-normalized datetime64 (NaT when missing or invalid)"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return np.datetime64("NaT")
+    return _to_datetime64_array(pd.Series([value]))[0]
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Parse purchase dates to datetime64, accepting '/' separators; unparseable values become NaT"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    normalized = values.astype("string").str.replace("/", "-", regex=False)
+    return pd.to_datetime(normalized, errors="coerce", format="ISO8601")
+
+
+def _to_datetime64_array(values: pd.Series) -> np.ndarray:
+    return parse_dates(values).dt.normalize().to_numpy(dtype=DATE_DTYPE)
+
+
+def _factorize(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Codes and string uniques of a column, reusing the codes of a categorical"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), pd.Index(values.cat.categories.astype(str), dtype=object)
+    codes, uniques = pd.factorize(values.astype(str))
+    return codes, pd.Index(uniques, dtype=object)
+
+
+def _pack_keys(asset_codes: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    """One int64 per row combining the asset_id code and the purchase day"""
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    days = np.where(np.isnat(dates), _NO_DAY, days & 0xFFFFFFFF)
+    return (asset_codes.astype(np.int64) << 32) | days
+
+
+def _occurrence(keys: np.ndarray) -> np.ndarray:
+    """Rank of each row among the rows with the same key, in row order"""
+    n = len(keys)
+    order = np.argsort(keys, kind="stable")
+    ordered = keys[order]
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    positions = np.arange(n)
+    ranks = positions - np.maximum.accumulate(np.where(starts, positions, 0))
+    occurrence = np.empty(n, dtype=np.int64)
+    occurrence[order] = ranks
+    return occurrence
+
+
+def holdings_frame(holdings: Union[HoldingsTable, List[Dict]]) -> pd.DataFrame:
+    """DataFrame for either a HoldingsTable or a plain list of holding dicts"""
+    if isinstance(holdings, HoldingsTable):
+        return holdings.to_frame()
+    return pd.DataFrame(holdings)
+
+
+def as_holdings_table(holdings: Union[HoldingsTable, List[Dict]]) -> HoldingsTable:
+    """Return holdings as a HoldingsTable, converting a list of dicts if needed"""
+    if isinstance(holdings, HoldingsTable):
+        return holdings
+    return HoldingsTable.from_records(holdings)
@@ -0,0 +1,224 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+METRICS_ENV_VAR = "INDEXCOPILOT_METRICS"
+DEBUG_ENV_VAR = "INDEXCOPILOT_DEBUG"
+METRIC_PREFIX = "indexcopilot"
+LOGGER_NAME = "indexcopilot.metrics"
+
+
+def _flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def debug_enabled() -> bool:
+    """Whether the debug timing panel is switched on (INDEXCOPILOT_DEBUG)"""
+    return _flag(DEBUG_ENV_VAR)
+
+
+# Checked on every instrumented call; when False a timer costs one global lookup
+_enabled = _flag(METRICS_ENV_VAR) or debug_enabled()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(flag: bool = True) -> None:
+    """Switch collection on or off for the whole process"""
+    global _enabled
+    _enabled = flag
+
+
+class Span(NamedTuple):
+    name: str
+    depth: int
+    seconds: float
+
+
+class TimerStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class MetricsRegistry:
+    """Process-wide timers and counters, plus per-thread spans of the current rerun
+
+    Timers keep call count, total and maximum seconds per name. Between
+    begin_rerun() and end_rerun() every timer finished on the calling thread is
+    also recorded as a span with its nesting depth, which is what the debug
+    panel shows for the Streamlit script thread of one session.
+    """
+
+    def __init__(self):
+        self._timers: Dict[str, TimerStats] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._timers.get(name)
+            if stats is None:
+                stats = self._timers[name] = TimerStats()
+            stats.count += 1
+            stats.total += seconds
+            if seconds > stats.max:
+                stats.max = seconds
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    # ------------------------------------------------------------------ rerun spans
+
+    def begin_rerun(self) -> None:
+        """Start recording spans on this thread"""
+        self._local.spans = []
+        self._local.depth = 0
+
+    def end_rerun(self) -> List[Span]:
+        """Stop recording on this thread and return its spans in call order"""
+        spans = getattr(self._local, "spans", None) or []
+        self._local.spans = None
+        return [Span(*span) for span in spans]
+
+    def _enter(self) -> Optional[list]:
+        spans = getattr(self._local, "spans", None)
+        if spans is None:
+            return None
+        # Placeholder filled in on exit, so parents are listed before their children
+        span = [None, self._local.depth, 0.0]
+        spans.append(span)
+        self._local.depth += 1
+        return span
+
+    def _exit(self, span: Optional[list], name: str, seconds: float) -> None:
+        self.observe(name, seconds)
+        if span is not None:
+            span[0], span[2] = name, seconds
+            self._local.depth -= 1
+
+    # ------------------------------------------------------------------ export
+
+    def snapshot(self) -> Dict:
+        """Timers and counters as plain, JSON-serializable data"""
+        with self._lock:
+            return {
+                "timers": {
+                    name: {"count": stats.count, "total_seconds": stats.total, "max_seconds": stats.max}
+                    for name, stats in sorted(self._timers.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for metric, field, kind, help_text in (
+            ("calls_total", "count", "counter", "Instrumented calls"),
+            ("seconds_total", "total_seconds", "counter", "Total seconds spent in instrumented calls"),
+            ("seconds_max", "max_seconds", "gauge", "Slowest instrumented call in seconds"),
+        ):
+            full_name = f"{METRIC_PREFIX}_timer_{metric}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for name, stats in snapshot["timers"].items():
+                lines.append(f'{full_name}{{name="{_label(name)}"}} {stats[field]:.9g}')
+        full_name = f"{METRIC_PREFIX}_events_total"
+        lines.append(f"# HELP {full_name} Instrumented event counts")
+        lines.append(f"# TYPE {full_name} counter")
+        for name, value in snapshot["counters"].items():
+            lines.append(f'{full_name}{{name="{_label(name)}"}} {value:.9g}')
+        return "\n".join(lines) + "\n"
+
+    def log(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO) -> None:
+        """Write the snapshot as one structured JSON log line"""
+        (logger or logging.getLogger(LOGGER_NAME)).log(level, json.dumps({"metrics": self.snapshot()}))
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+class _Timer:
+    __slots__ = ("name", "_span", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._span = registry._enter()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry._exit(self._span, self.name, time.perf_counter() - self._start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str):
+    """Context manager timing its block under ``name``; a shared no-op when collection is off"""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name: Union[str, Callable, None] = None):
+    """Decorator timing every call, named after the function's qualified name by default
+
+    Usable bare (``@timed``) or with a name (``@timed("tab.summary")``).
+    """
+    def decorate(func: Callable) -> Callable:
+        metric = name if isinstance(name, str) else func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            span = registry._enter()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry._exit(span, metric, time.perf_counter() - start)
+        return wrapper
+
+    if callable(name):
+        return decorate(name)
+    return decorate
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add to an event counter when collection is on"""
+    if _enabled:
+        registry.increment(name, value)
@@ -0,0 +1,261 @@
+import json
+import os
+import tempfile
+import threading
+import pandas as pd
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from .holdings_table import HoldingsTable
+from .instrumentation import timed
+
+SEQ_KEY = "journal_seq"
+
+
+@timed
+def write_atomic(path: str, text: str) -> None:
+    """Write a file via a temp file in the same directory and an atomic rename"""
+    _write_atomic(path, "w", lambda f: f.write(text))
+
+
+@timed
+def write_atomic_binary(path: str, write: Callable[[BinaryIO], None]) -> None:
+    """Like write_atomic, for a writer that fills a binary file object"""
+    _write_atomic(path, "wb", write)
+
+
+def _write_atomic(path: str, mode: str, write: Callable) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.basename(path), dir=directory)
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class PortfolioJournal:
+    """Append-only mutation log kept next to a JSON portfolio snapshot
+
+    Each mutation is appended to ``<snapshot>.log`` as one JSON line carrying a
+    sequence number. The snapshot records the last sequence number folded into
+    it, so loading reads the snapshot and replays only the newer log records.
+    Compaction folds the log into a new snapshot written atomically.
+    """
+
+    def __init__(self, snapshot_path: str, compact_threshold: int = 500, fsync: bool = True):
+        self.snapshot_path = snapshot_path
+        self.log_path = snapshot_path + ".log"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._seq: Optional[int] = None
+        self._snapshot_seq: Optional[int] = None
+        self._pending = 0
+        self._compaction: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------ reading
+
+    def _read_snapshot(self) -> Dict:
+        if not os.path.exists(self.snapshot_path):
+            return {"name": "My Portfolio", "holdings": [], SEQ_KEY: 0}
+        with open(self.snapshot_path, "r") as f:
+            snapshot = json.load(f)
+        snapshot.setdefault(SEQ_KEY, 0)
+        return snapshot
+
+    def _read_log(self) -> List[Dict]:
+        """Log records in order; a torn final line from a crash mid-append is ignored"""
+        if not os.path.exists(self.log_path):
+            return []
+        records = []
+        with open(self.log_path, "r") as f:
+            lines = f.readlines()
+        for i, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                if i != len(lines) - 1:
+                    raise
+        return records
+
+    def _replay(self, upto: Optional[int] = None) -> Tuple[Dict, HoldingsTable, int]:
+        """Snapshot plus log records newer than it (and not newer than ``upto``)"""
+        snapshot = self._read_snapshot()
+        holdings = HoldingsTable.from_records(snapshot.get("holdings", []))
+        seq = snapshot[SEQ_KEY]
+        for record in self._read_log():
+            if record["seq"] <= snapshot[SEQ_KEY]:
+                continue  # already folded into the snapshot
+            if upto is not None and record["seq"] > upto:
+                break
+            _apply(holdings, record)
+            seq = record["seq"]
+        return snapshot, holdings, seq
+
+    @timed
+    def load(self) -> Dict:
+        """Read the snapshot and replay the log tail"""
+        with self._lock:
+            self._repair_tail()
+            snapshot, holdings, seq = self._replay()
+            self._seq = seq
+            self._snapshot_seq = snapshot[SEQ_KEY]
+            self._pending = seq - snapshot[SEQ_KEY]
+        return {"name": snapshot.get("name", "My Portfolio"), "holdings": holdings}
+
+    # ------------------------------------------------------------------ writing
+
+    def _repair_tail(self) -> None:
+        """Cut a torn final record left by a crash, so the next append starts on its own line"""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end != len(data):
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _sync(self) -> None:
+        if self._seq is None:
+            self._repair_tail()
+            snapshot, _, self._seq = self._replay()
+            self._snapshot_seq = snapshot[SEQ_KEY]
+            self._pending = self._seq - self._snapshot_seq
+
+    def _next_seq(self) -> int:
+        self._sync()
+        self._seq += 1
+        return self._seq
+
+    @timed
+    def append(self, op: str, **payload) -> None:
+        """Append one mutation record to the log"""
+        with self._lock:
+            record = {"seq": self._next_seq(), "op": op, **payload}
+            try:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+            except BaseException:
+                # The record may be partly written; resync (and repair the tail) before the next append
+                self._seq = None
+                raise
+            self._pending += 1
+            if self._pending >= self.compact_threshold:
+                self.compact_in_background()
+
+    @timed
+    def write_snapshot(self, portfolio: Dict) -> None:
+        """Replace snapshot and log with a full snapshot of the given portfolio"""
+        with self._lock:
+            seq = self._next_seq()
+            _write_snapshot(self.snapshot_path, portfolio["name"], _records(portfolio["holdings"]), seq)
+            self._truncate_log(seq)
+            self._snapshot_seq = seq
+            self._pending = 0
+
+    # ------------------------------------------------------------------ compaction
+
+    @property
+    def pending(self) -> int:
+        """Number of log records not yet folded into the snapshot"""
+        return self._pending
+
+    @timed
+    def compact(self) -> None:
+        """Fold the log into a new snapshot, then drop the folded records
+
+        The replay and serialization run without the lock, so appends made while
+        compacting are not blocked; they stay in the log for the next compaction.
+        """
+        with self._lock:
+            self._sync()
+            target, base_seq = self._seq, self._snapshot_seq
+        if target == base_seq:
+            return
+        snapshot, holdings, seq = self._replay(upto=target)
+        text = _snapshot_text(snapshot.get("name", "My Portfolio"), holdings.to_records(), seq)
+        with self._lock:
+            if self._snapshot_seq != base_seq:
+                return  # a full snapshot was written meanwhile and supersedes this one
+            write_atomic(self.snapshot_path, text)
+            self._truncate_log(seq)
+            self._snapshot_seq = seq
+            self._pending = self._seq - seq
+
+    def compact_in_background(self) -> None:
+        """Start compaction on a daemon thread unless one is already running"""
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = threading.Thread(target=self.compact, name="portfolio-compaction", daemon=True)
+            self._compaction.start()
+
+    def wait(self) -> None:
+        """Block until a running background compaction has finished"""
+        thread = self._compaction
+        if thread is not None:
+            thread.join()
+
+    def _truncate_log(self, seq: int) -> None:
+        # Records newer than the snapshot survive, e.g. appends made during compaction
+        remaining = [r for r in self._read_log() if r["seq"] > seq]
+        if remaining:
+            write_atomic(self.log_path, "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in remaining))
+        elif os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+
+def _records(holdings) -> List[Dict]:
+    return holdings.to_records() if isinstance(holdings, HoldingsTable) else list(holdings)
+
+
+def _snapshot_text(name: str, records: List[Dict], seq: int) -> str:
+    return json.dumps({"name": name, "holdings": records, SEQ_KEY: seq}, separators=(",", ":"))
+
+
+def _write_snapshot(path: str, name: str, records: List[Dict], seq: int) -> None:
+    write_atomic(path, _snapshot_text(name, records, seq))
+
+
+def _apply(holdings: HoldingsTable, record: Dict) -> None:
+    """Apply one log record to a holdings table"""
+    op = record["op"]
+    if op == "add":
+        holdings.append(record["holding"])
+    elif op == "remove":
+        holdings.remove(record["asset_id"], record.get("purchase_date"))
+    elif op == "upsert":
+        holdings.upsert(pd.DataFrame.from_records(record["holdings"]))
+    else:
+        raise ValueError(f"Unknown journal operation: {op}")
+
+
+_journals: Dict[str, PortfolioJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(snapshot_path: str, compact_threshold: Optional[int] = None) -> PortfolioJournal:
+    """Process-wide journal for a snapshot path, so concurrent sessions share one lock
+
+    A compact_threshold passed here replaces the journal's current one, so the
+    most recently configured threshold applies to every user of the path.
+    """
+    key = os.path.abspath(snapshot_path)
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = PortfolioJournal(snapshot_path, compact_threshold=compact_threshold or 500)
+            _journals[key] = journal
+        elif compact_threshold is not None:
+            journal.compact_threshold = compact_threshold
+        return journal
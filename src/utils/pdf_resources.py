@@ -0,0 +1,112 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.styles import StyleSheet1, getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import TableStyle
+
+FONT_ENV_VAR = "INDEXCOPILOT_PDF_FONT"
+UNICODE_FONT_NAME = "UnicodeFont"
+FALLBACK_FONT_NAME = "Helvetica"
+DEFAULT_FONT_PATHS = (
+    'C:/Windows/Fonts/arial.ttf',  # Windows
+    '/System/Library/Fonts/Arial.ttf',  # macOS
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',  # Linux
+)
+
+
+class PdfResources:
+    """Registered font plus prepared paragraph and table styles for PDF reports
+
+    Instances are shared by every session and report thread, so the styles must
+    be treated as read-only; ReportLab only reads them while building.
+    """
+
+    def __init__(self, font_name: str, unicode_font: bool):
+        self.font_name = font_name
+        self.unicode_font = unicode_font
+        self.currency = "₹" if unicode_font else "Rs."
+        self.styles = _stylesheet(font_name)
+        self.holdings_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), font_name),
+            ('FONTNAME', (0, 1), (-1, -1), font_name),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        self.section_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (1, -1), 'LEFT'),
+            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, -1), font_name),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+        ])
+        self.subtotal_row_style = TableStyle([
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+            ('FONTSIZE', (0, -1), (-1, -1), 9),
+        ])
+
+
+def _stylesheet(font_name: str) -> StyleSheet1:
+    styles = getSampleStyleSheet()
+    if font_name != FALLBACK_FONT_NAME:
+        styles['Normal'].fontName = font_name
+        styles['Title'].fontName = font_name
+        styles['Heading2'].fontName = font_name
+    return styles
+
+
+def _register_font(setting: Optional[str]) -> Tuple[str, bool]:
+    """Resolve the font setting to a registered font name and whether it covers ₹
+
+    The setting is a TrueType file path or the name of a font ReportLab already
+    knows (e.g. Times-Roman). Without a usable setting the platform fonts are probed.
+    """
+    if setting and not os.path.isfile(setting):
+        try:
+            # Only TrueType fonts carry the rupee glyph; the standard Type 1 fonts do not
+            return setting, isinstance(pdfmetrics.getFont(setting), TTFont)
+        except KeyError:
+            setting = None
+    font_paths = [setting] if setting else DEFAULT_FONT_PATHS
+    for font_path in font_paths:
+        try:
+            if os.path.exists(font_path):
+                # A configured file gets its own name so it never replaces the probed font
+                font_name = os.path.splitext(os.path.basename(font_path))[0] if setting else UNICODE_FONT_NAME
+                pdfmetrics.registerFont(TTFont(font_name, font_path))
+                return font_name, True
+        except Exception:
+            continue
+    return FALLBACK_FONT_NAME, False
+
+
+_resources: Dict[Optional[str], PdfResources] = {}
+_resources_lock = threading.Lock()
+
+
+def get_pdf_resources(font: Optional[str] = None) -> PdfResources:
+    """Process-wide PDF resources; the font defaults to the INDEXCOPILOT_PDF_FONT setting
+
+    The font file is parsed and the styles are built once per setting, not per
+    ExportManager or per report.
+    """
+    setting = font or os.environ.get(FONT_ENV_VAR) or None
+    resources = _resources.get(setting)
+    if resources is None:
+        with _resources_lock:
+            resources = _resources.get(setting)
+            if resources is None:
+                resources = PdfResources(*_register_font(setting))
+                _resources[setting] = resources
+    return resources
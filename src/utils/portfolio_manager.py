@@ -1,78 +1,324 @@
-import json
-import os
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from .holdings_table import as_holdings_table, holdings_frame, parse_dates
+from .instrumentation import timed
+from .storage import StorageBackend, storage_for_path
+from .csv_importer import DEFAULT_CHUNKSIZE, ImportResult, import_csv
+from .schema import HOLDINGS_SCHEMA, ValidationResult
+from .price_provider import PriceFetchError, PriceProvider
+from .xirr import grouped_xirr
+
+DAYS_PER_YEAR = 365.25
+
+
+def _gain_loss(quantity, purchase_price, current_price):
+    """Gain/loss for scalars or aligned NumPy arrays"""
+    return (current_price - purchase_price) * quantity
+
+
+def _cagr(purchase_price, current_price, years):
+    """CAGR in percent for aligned NumPy arrays; 0.0 where the period is not positive"""
+    purchase_price = np.asarray(purchase_price, dtype=np.float64)
+    current_price = np.asarray(current_price, dtype=np.float64)
+    years = np.asarray(years, dtype=np.float64)
+    valid = (years > 0) & (purchase_price > 0)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        cagr = (np.power(current_price / purchase_price, 1 / years) - 1) * 100
+    return np.where(valid & np.isfinite(cagr), cagr, 0.0)
+
 
 class PortfolioManager:
-    def __init__(self, file_path: str = "portfolio.json"):
+    def __init__(self, file_path: str = "portfolio.json", journal: bool = False, compact_threshold: int = 500,
+                 storage: Optional[StorageBackend] = None, price_provider: Optional[PriceProvider] = None):
         self.file_path = file_path
+        # Backend is picked from the file extension unless one is passed in:
+        # .db/.sqlite files use SQLite, anything else the JSON file (optionally journaled)
+        self.storage = storage or storage_for_path(file_path, journal=journal, compact_threshold=compact_threshold)
+        self.price_provider = price_provider
     
+    @property
+    def journal(self):
+        """Journal of the JSON backend, or None when not journaling"""
+        return getattr(self.storage, "journal", None)
+    
+    @timed
     def load_portfolio(self) -> Dict:
-        """Load portfolio from JSON file"""
-        if os.path.exists(self.file_path):
-            try:
-                with open(self.file_path, "r") as f:
-                    return json.load(f)
-            except Exception as e:
-                raise Exception(f"Error loading portfolio: {str(e)}")
-        return {"name": "My Portfolio", "holdings": []}
+        """Load portfolio from storage; holdings are returned as a HoldingsTable"""
+        try:
+            return self.storage.load()
+        except Exception as e:
+            raise Exception(f"Error loading portfolio: {str(e)}")
     
+    @timed
     def save_portfolio(self, portfolio: Dict) -> None:
-        """Save portfolio to JSON file"""
+        """Save the whole portfolio to storage"""
         try:
-            with open(self.file_path, "w") as f:
-                json.dump(portfolio, f, indent=2)
+            self.storage.save(portfolio)
         except Exception as e:
             raise Exception(f"Error saving portfolio: {str(e)}")
     
-    def validate_csv_data(self, df: pd.DataFrame) -> tuple[bool, str]:
-        """Validate CSV data format and types"""
-        required_columns = ["asset_type", "asset_id", "asset_name", "quantity", "purchase_price"]
-        
-        # Check required columns
-        missing_cols = [col for col in required_columns if col not in df.columns]
-        if missing_cols:
-            return False, f"Missing required columns: {', '.join(missing_cols)}"
-        
-        # Validate data types
+    @timed
+    def add_holding(self, portfolio: Dict, holding: Dict) -> None:
+        """Add a holding and persist only that change where the backend allows it"""
+        portfolio["holdings"].append(holding)
         try:
-            df["quantity"] = pd.to_numeric(df["quantity"], errors="raise")
-            df["purchase_price"] = pd.to_numeric(df["purchase_price"], errors="raise")
-        except ValueError as e:
-            return False, f"Invalid numeric data in quantity or purchase_price: {str(e)}"
+            self.storage.record_add(portfolio, holding)
+        except Exception as e:
+            raise Exception(f"Error saving portfolio: {str(e)}")
+    
+    @timed
+    def remove_holding(self, portfolio: Dict, asset_id: str, purchase_date: Optional[str] = None) -> int:
+        """Remove holdings by asset_id (and optionally purchase_date) and persist the change"""
+        removed = portfolio["holdings"].remove(asset_id, purchase_date)
+        if removed:
+            date = str(purchase_date) if purchase_date is not None else None
+            try:
+                self.storage.record_remove(portfolio, asset_id, date)
+            except Exception as e:
+                raise Exception(f"Error saving portfolio: {str(e)}")
+        return removed
+    
+    @timed
+    def refresh_prices(self, portfolio: Dict, provider: Optional[PriceProvider] = None) -> int:
+        """Revalue holdings at the provider's current prices; returns the number of holdings repriced
         
-        # Check for negative values
-        if (df["quantity"] <= 0).any():
-            return False, "Quantity must be positive"
-        if (df["purchase_price"] <= 0).any():
-            return False, "Purchase price must be positive"
+        All distinct asset_ids are quoted in one batch. Holdings without a quote keep
+        their price, and the table is only touched when a price actually changed.
+        When some quotes could not be fetched, the ones that arrived are applied
+        and the failure is raised afterwards.
+        """
+        provider = provider or self.price_provider
+        holdings = portfolio["holdings"]
+        if provider is None or not len(holdings):
+            return 0
+        codes = holdings.codes("asset_id")
+        used = np.unique(codes)
+        asset_ids = holdings.categories("asset_id")[used]
+        fetch_error = None
+        try:
+            quotes = provider.get_prices(asset_ids)
+        except PriceFetchError as e:
+            quotes, fetch_error = e.prices, e
+        except Exception as e:
+            raise Exception(f"Error fetching prices: {str(e)}")
         
-        # Validate date format if present
-        if "purchase_date" in df.columns:
+        # Price per asset_id code, broadcast to the rows through the codes
+        price_by_code = np.full(len(holdings.categories("asset_id")), np.nan)
+        price_by_code[used] = pd.Series(asset_ids).map(quotes).to_numpy(dtype=np.float64)
+        current = holdings.column("current_price")
+        prices = price_by_code[codes]
+        prices = np.where(np.isnan(prices), current, prices)
+        changed = prices != current
+        if changed.any():
+            holdings.set_current_prices(prices)
             try:
-                pd.to_datetime(df["purchase_date"], errors="raise")
-            except ValueError:
-                return False, "Invalid date format in purchase_date. Use YYYY-MM-DD"
+                self.storage.record_prices(portfolio, {asset_id: quotes[asset_id] for asset_id in asset_ids if asset_id in quotes})
+            except Exception as e:
+                raise Exception(f"Error saving portfolio: {str(e)}")
+        if fetch_error is not None:
+            raise Exception(f"Error fetching prices: {str(fetch_error)}")
+        return int(changed.sum())
+    
+    @timed
+    def portfolio_totals(self, portfolio: Dict) -> Dict:
+        """Number of holdings, total investment and total current value"""
+        # Every mutation goes through the backend (add/remove, record_prices, record_upsert),
+        # so a querying backend answers for the session's holdings without loading them
+        if self.storage.supports_queries:
+            return self.storage.totals()
+        holdings = portfolio["holdings"]
+        # Running sums kept by the table: O(1), however many holdings there are
+        aggregates = as_holdings_table(holdings).aggregates
+        return {
+            "holdings": aggregates.count,
+            "total_investment": aggregates.investment,
+            "total_value": aggregates.value,
+        }
+    
+    @timed
+    def allocation_by_type(self, portfolio: Dict) -> pd.Series:
+        """Current value per asset_type"""
+        if self.storage.supports_queries:
+            return self.storage.allocation_by_type()
+        return as_holdings_table(portfolio["holdings"]).allocation_by_type()
+    
+    @timed
+    def top_by_gain(self, portfolio: Dict, n: int = 5) -> pd.DataFrame:
+        """The n holdings with the largest gain/loss"""
+        if self.storage.supports_queries:
+            return self.storage.top_by_gain(n)
+        df = holdings_frame(portfolio["holdings"])
+        df = df.assign(gain_loss=_gain_loss(df["quantity"], df["purchase_price"], df["current_price"]))
+        return df.nlargest(n, "gain_loss")
+    
+    @timed
+    def query_holdings(self, portfolio: Dict, asset_type: Optional[str] = None, asset_id: Optional[str] = None,
+                       start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       limit: Optional[int] = None) -> pd.DataFrame:
+        """Holdings filtered by asset_type, asset_id and purchase date range"""
+        if self.storage.supports_queries:
+            return self.storage.query_holdings(asset_type, asset_id, start_date, end_date, limit)
+        df = holdings_frame(portfolio["holdings"])
+        mask = np.ones(len(df), dtype=bool)
+        if asset_type is not None:
+            mask &= (df["asset_type"] == asset_type).to_numpy()
+        if asset_id is not None:
+            mask &= (df["asset_id"] == asset_id).to_numpy()
+        if start_date is not None or end_date is not None:
+            dates = parse_dates(df["purchase_date"])
+            if start_date is not None:
+                mask &= (dates >= pd.Timestamp(start_date)).to_numpy()
+            if end_date is not None:
+                mask &= (dates <= pd.Timestamp(end_date)).to_numpy()
+        df = df[mask]
+        return df.head(limit) if limit is not None else df
+    
+    @timed
+    def import_csv(self, source, chunksize: int = DEFAULT_CHUNKSIZE, progress_callback=None) -> ImportResult:
+        """Stream a holdings CSV in chunks; invalid rows are collected in a reject report"""
+        return import_csv(source, chunksize=chunksize, progress_callback=progress_callback)
+    
+    @timed
+    def merge_csv(self, portfolio: Dict, source, chunksize: int = DEFAULT_CHUNKSIZE,
+                  progress_callback=None) -> ImportResult:
+        """Import a holdings CSV as an upsert keyed by asset_id and purchase date
         
-        return True, "Valid"
+        Rows that are new or differ from the holding with the same key are applied
+        to the portfolio and persisted; unchanged rows and holdings missing from the
+        file are left alone. Prices are only updated when the file has current_price.
+        """
+        result = import_csv(source, chunksize=chunksize, progress_callback=progress_callback)
+        if not result.ok or result.accepted == 0:
+            return result
+        holdings = as_holdings_table(portfolio["holdings"])
+        # Shares the current buffers; the upsert copies a column before changing it and appends past them
+        previous = holdings.snapshot()
+        portfolio["holdings"] = holdings
+        result.merge = holdings.upsert(result.holdings.to_frame(), update_prices=result.has_prices)
+        if result.merge.added or result.merge.updated:
+            try:
+                self.storage.record_upsert(portfolio, result.merge)
+            except Exception as e:
+                # Roll back, so retrying the import finds and persists the same diff
+                portfolio["holdings"] = previous
+                raise Exception(f"Error saving portfolio: {str(e)}")
+        return result
+    
+    @timed
+    def validate_csv_data(self, df: pd.DataFrame) -> tuple[bool, str]:
+        """Validate CSV data format and types; returns the first failure"""
+        result = HOLDINGS_SCHEMA.validate(df)
+        if result.valid:
+            return True, "Valid"
+        return False, result.first_error()
+    
+    @timed
+    def validate_holdings(self, df: pd.DataFrame) -> ValidationResult:
+        """Validate holdings against the schema, collecting every violation"""
+        return HOLDINGS_SCHEMA.validate(df)
     
+    @timed
+    def compute_metrics(self, df: pd.DataFrame, as_of: Optional[datetime] = None) -> pd.DataFrame:
+        """Compute value, gain/loss, gain %, holding period, CAGR and XIRR for every holding in one vectorized pass
+
+        Every holding period is measured against the single ``as_of`` date (today by default),
+        so a report for a given date is reproducible. Rows whose purchase date is missing,
+        unparseable or after ``as_of`` get NaN holding years, zero CAGR and a ``date_issue``.
+        """
+        as_of = pd.Timestamp(as_of if as_of is not None else datetime.now()).normalize()
+        metrics_df = df.copy()
+        missing_label = "Missing purchase date"
+
+        quantity = metrics_df["quantity"].to_numpy(dtype=np.float64)
+        purchase_price = metrics_df["purchase_price"].to_numpy(dtype=np.float64)
+        current_price = metrics_df["current_price"].to_numpy(dtype=np.float64)
+
+        investment = quantity * purchase_price
+        gain_loss = _gain_loss(quantity, purchase_price, current_price)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gain_pct = np.where(investment > 0, gain_loss / investment * 100, 0.0)
+
+        # Holding period in years from one array subtraction; tables already hold datetime64
+        # dates, so only plain frames are parsed here
+        if "purchase_date" in metrics_df.columns:
+            raw_dates = metrics_df["purchase_date"]
+            purchase_dates = parse_dates(raw_dates)
+            days = (as_of - purchase_dates.dt.normalize()).dt.days
+            holding_years = days.to_numpy(dtype=np.float64, na_value=np.nan) / DAYS_PER_YEAR
+            missing = (raw_dates.isna() | raw_dates.eq("")).to_numpy(dtype=bool)
+            unparseable = purchase_dates.isna().to_numpy() & ~missing
+            if pd.api.types.is_datetime64_any_dtype(raw_dates):
+                # Tables parse dates on the way in, so an unparseable one is already NaT
+                missing_label = "Missing or invalid purchase date"
+        else:
+            holding_years = np.full(len(metrics_df), np.nan)
+            missing = np.ones(len(metrics_df), dtype=bool)
+            unparseable = np.zeros(len(metrics_df), dtype=bool)
+        future = holding_years < 0
+        holding_years = np.where(future, np.nan, holding_years)
+
+        metrics_df["value"] = quantity * current_price
+        metrics_df["investment"] = investment
+        metrics_df["gain_loss"] = gain_loss
+        metrics_df["gain_pct"] = gain_pct
+        metrics_df["holding_years"] = holding_years
+        metrics_df["cagr"] = _cagr(purchase_price, current_price, np.nan_to_num(holding_years, nan=0.0))
+        # Every lot is its own cash-flow group: bought at cost, valued today
+        metrics_df["xirr"] = grouped_xirr(np.arange(len(metrics_df)), investment, holding_years,
+                                          metrics_df["value"].to_numpy()) * 100
+        metrics_df["date_issue"] = np.select(
+            [missing, unparseable, future],
+            [missing_label, "Invalid purchase date", "Purchased after the as-of date"],
+            default=""
+        )
+        return metrics_df
+
+    def date_issues(self, metrics_df: pd.DataFrame) -> pd.DataFrame:
+        """Rows of compute_metrics output whose holding period could not be measured"""
+        flagged = metrics_df[metrics_df["date_issue"] != ""]
+        return flagged[["asset_id", "asset_name", "purchase_date", "date_issue"]].reset_index(drop=True)
+
+    @timed
+    def xirr_by_asset(self, metrics_df: pd.DataFrame) -> pd.DataFrame:
+        """XIRR in percent per asset_id over all of its purchase lots, from compute_metrics output
+
+        Lots without a usable purchase date are left out, since their cash flow has no date.
+        """
+        dated = metrics_df[np.isfinite(metrics_df["holding_years"].to_numpy(dtype=np.float64))]
+        codes, asset_ids = pd.factorize(dated["asset_id"].astype(str))
+        by_asset = dated.groupby(codes).agg(
+            asset_name=("asset_name", "first"), asset_type=("asset_type", "first"), lots=("asset_id", "size"),
+            investment=("investment", "sum"), value=("value", "sum"),
+        )
+        by_asset.insert(0, "asset_id", asset_ids[by_asset.index])
+        by_asset["xirr"] = grouped_xirr(codes, dated["investment"].to_numpy(), dated["holding_years"].to_numpy(),
+                                        dated["value"].to_numpy()) * 100
+        return by_asset.reset_index(drop=True)
+
+    @timed
+    def portfolio_xirr(self, metrics_df: pd.DataFrame) -> float:
+        """XIRR in percent of the whole portfolio from compute_metrics output; NaN when it has no solution"""
+        holding_years = metrics_df["holding_years"].to_numpy(dtype=np.float64)
+        dated = np.isfinite(holding_years)
+        if not dated.any():
+            return float("nan")
+        return float(grouped_xirr(np.zeros(int(dated.sum())), metrics_df["investment"].to_numpy()[dated],
+                                  holding_years[dated], metrics_df["value"].to_numpy()[dated])[0] * 100)
+
     def calculate_gain_loss(self, holding: Dict) -> float:
         """Calculate gain/loss for a single holding"""
-        return (holding["current_price"] - holding["purchase_price"]) * holding["quantity"]
+        return _gain_loss(holding["quantity"], holding["purchase_price"], holding["current_price"])
     
-    def calculate_cagr(self, purchase_price: float, current_price: float, purchase_date: str) -> float:
-        """Calculate Compound Annual Growth Rate"""
-        try:
-            purchase_dt = datetime.fromisoformat(purchase_date.replace('/', '-'))
-            current_dt = datetime.now()
-            years = (current_dt - purchase_dt).days / 365.25
-            
-            if years <= 0:
-                return 0.0
-            
-            cagr = ((current_price / purchase_price) ** (1 / years)) - 1
-            return cagr * 100  # Return as percentage
-        except:
-            return 0.0
\ No newline at end of file
+    def calculate_cagr(self, purchase_price: float, current_price: float, purchase_date: str,
+                       as_of: Optional[datetime] = None) -> float:
+        """Calculate Compound Annual Growth Rate as of a date, today by default"""
+        purchase_dt = parse_dates(pd.Series([purchase_date]))[0]
+        if pd.isna(purchase_dt):
+            # 0.0 would read as a flat return
+            raise ValueError(f"Invalid purchase date: {purchase_date!r}")
+        as_of = pd.Timestamp(as_of if as_of is not None else datetime.now()).normalize()
+        years = (as_of - purchase_dt.normalize()).days / DAYS_PER_YEAR
+        return float(_cagr(purchase_price, current_price, years))
\ No newline at end of file
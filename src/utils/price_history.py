@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .holdings_table import DATE_COLUMN, HoldingsTable, as_holdings_table, parse_dates
+from .instrumentation import timed
+from .journal import write_atomic, write_atomic_binary
+
+PRICE_HISTORY_ENV_VAR = "INDEXCOPILOT_PRICE_HISTORY"
+MANIFEST_FILE = "manifest.json"
+HISTORY_DTYPE = np.dtype([("date", "datetime64[D]"), ("price", np.float64)])
+INGEST_CHUNKSIZE = 100_000
+
+
+class PriceHistoryStore:
+    """Daily price/NAV history per asset_id, one memory-mapped .npy file per asset
+
+    Each file is a date-sorted array of (date, price) records and manifest.json
+    maps asset_ids to files. Opening a series maps the file instead of reading
+    it, so only the pages a range slice touches are ever loaded; nothing is read
+    at startup beyond the manifest.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._manifest: Dict[str, Dict] = {}
+        self._manifest_mtime: Optional[int] = None
+        self._maps: Dict[str, np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def _refresh_manifest(self) -> Dict[str, Dict]:
+        """Re-read the manifest when another process or store instance changed it"""
+        with self._lock:
+            mtime = os.stat(self.manifest_path).st_mtime_ns if os.path.exists(self.manifest_path) else None
+            if mtime != self._manifest_mtime:
+                manifest = {}
+                if mtime is not None:
+                    with open(self.manifest_path, "r") as f:
+                        manifest = json.load(f)
+                self._manifest, self._manifest_mtime = manifest, mtime
+                self._maps.clear()
+            return self._manifest
+
+    @property
+    def version(self) -> Optional[int]:
+        """Changes whenever the stored history changes"""
+        self._refresh_manifest()
+        return self._manifest_mtime
+
+    def asset_ids(self) -> List[str]:
+        return sorted(self._refresh_manifest())
+
+    def __contains__(self, asset_id: str) -> bool:
+        return str(asset_id) in self._refresh_manifest()
+
+    # ------------------------------------------------------------------ reading
+
+    def _open(self, asset_id: str) -> Optional[np.ndarray]:
+        """Memory-mapped records of one asset, None when it has no history"""
+        with self._lock:
+            entry = self._refresh_manifest().get(asset_id)
+            if entry is None:
+                return None
+            records = self._maps.get(asset_id)
+            if records is None:
+                records = np.load(os.path.join(self.root, entry["file"]), mmap_mode="r")
+                self._maps[asset_id] = records
+            return records
+
+    def history(self, asset_id: str, start=None, end=None) -> np.ndarray:
+        """(date, price) records between start and end inclusive, as a view of the mapped file"""
+        records = self._open(str(asset_id))
+        if records is None:
+            return np.empty(0, dtype=HISTORY_DTYPE)
+        dates = records["date"]
+        lo = np.searchsorted(dates, np.datetime64(start, "D")) if start is not None else 0
+        hi = np.searchsorted(dates, np.datetime64(end, "D"), side="right") if end is not None else len(records)
+        return records[lo:hi]
+
+    def series(self, asset_id: str, start=None, end=None) -> pd.Series:
+        """Price series between start and end inclusive, indexed by date"""
+        records = self.history(asset_id, start, end)
+        return pd.Series(records["price"], index=pd.DatetimeIndex(records["date"], name="date"), name=str(asset_id))
+
+    def prices_asof(self, asset_id: str, dates: np.ndarray) -> np.ndarray:
+        """Last known price on or before each date; NaN before the first quote"""
+        records = self._open(str(asset_id))
+        prices = np.full(len(dates), np.nan)
+        if records is None or len(records) == 0:
+            return prices
+        positions = np.searchsorted(records["date"], dates.astype("datetime64[D]"), side="right") - 1
+        known = positions >= 0
+        prices[known] = records["price"][positions[known]]
+        return prices
+
+    # ------------------------------------------------------------------ ingest
+
+    @timed
+    def ingest_csv(self, source, chunksize: int = INGEST_CHUNKSIZE) -> int:
+        """Bulk load a long-format CSV with asset_id, date and price columns; returns the rows ingested
+
+        New quotes are merged into existing history, replacing prices on dates
+        that were already stored.
+        """
+        frames: Dict[str, List[np.ndarray]] = {}
+        rows = 0
+        for chunk in pd.read_csv(source, chunksize=chunksize, dtype={"asset_id": str}):
+            missing = [col for col in ("asset_id", "date", "price") if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"Missing required columns: {', '.join(missing)}")
+            dates = parse_dates(chunk["date"])
+            prices = pd.to_numeric(chunk["price"], errors="coerce")
+            valid = (dates.notna() & prices.notna() & chunk["asset_id"].notna()).to_numpy()
+            chunk_records = np.empty(int(valid.sum()), dtype=HISTORY_DTYPE)
+            chunk_records["date"] = dates[valid].to_numpy(dtype="datetime64[D]")
+            chunk_records["price"] = prices[valid].to_numpy(dtype=np.float64)
+            asset_ids = chunk["asset_id"][valid].str.strip().to_numpy(dtype=object)
+            # Split the chunk per asset with one stable sort instead of a mask per asset
+            order = np.argsort(asset_ids, kind="stable")
+            asset_ids, chunk_records = asset_ids[order], chunk_records[order]
+            uniques, starts = np.unique(asset_ids, return_index=True)
+            for asset_id, part in zip(uniques, np.split(chunk_records, starts[1:])):
+                frames.setdefault(asset_id, []).append(part)
+            rows += len(chunk_records)
+
+        with self._lock:
+            manifest = dict(self._refresh_manifest())
+            for asset_id, parts in frames.items():
+                existing = self._open(asset_id)
+                if existing is not None:
+                    parts = [np.asarray(existing)] + parts
+                merged = _merge_history(np.concatenate(parts))
+                entry = dict(manifest.get(asset_id) or {"file": _file_name(asset_id)})
+                # Temp file and rename; readers holding the old map keep a valid file
+                write_atomic_binary(os.path.join(self.root, entry["file"]), lambda f: np.save(f, merged))
+                entry.update(start=str(merged["date"][0]), end=str(merged["date"][-1]), rows=len(merged))
+                manifest[asset_id] = entry
+            write_atomic(self.manifest_path, json.dumps(manifest, indent=2))
+            self._maps.clear()
+            self._refresh_manifest()
+        return rows
+
+    # ------------------------------------------------------------------ valuation
+
+    @timed
+    def value_over_time(self, holdings: Union[HoldingsTable, List[Dict]], start=None, end=None) -> pd.DataFrame:
+        """Daily portfolio value and invested amount from purchase dates, quantities and price history
+
+        A holding counts from its purchase date (from the start when undated).
+        On days before an asset's first quote it is valued at cost, so assets
+        without history contribute their invested amount.
+        """
+        holdings = as_holdings_table(holdings)
+        if not len(holdings):
+            return pd.DataFrame(columns=["value", "investment"], index=pd.DatetimeIndex([], name="date"))
+        purchase_dates = holdings.column(DATE_COLUMN).astype("datetime64[D]")
+        dated = purchase_dates[~np.isnat(purchase_dates)]
+        if start is None:
+            start = dated.min() if len(dated) else np.datetime64("today", "D")
+        if end is None:
+            ends = [np.datetime64(entry["end"], "D") for asset_id, entry in self._refresh_manifest().items()]
+            end = max(ends + [np.datetime64("today", "D")])
+        start, end = np.datetime64(start, "D"), np.datetime64(end, "D")
+        grid = np.arange(start, end + 1, dtype="datetime64[D]")
+        # Undated holdings are treated as held since the start of the grid
+        purchase_dates = np.where(np.isnat(purchase_dates), start, purchase_dates)
+
+        quantity = holdings.column("quantity")
+        cost = quantity * holdings.column("purchase_price")
+        codes = holdings.codes("asset_id")
+        categories = holdings.categories("asset_id")
+
+        value = np.zeros(len(grid))
+        investment = np.zeros(len(grid))
+        # One pass per distinct asset: positions are cumulative sums over purchase dates,
+        # looked up for every grid day with a single searchsorted
+        order = np.lexsort((purchase_dates, codes))
+        sorted_codes = codes[order]
+        uniques, starts = np.unique(sorted_codes, return_index=True)
+        for code, rows in zip(uniques, np.split(order, starts[1:])):
+            held = np.searchsorted(purchase_dates[rows], grid, side="right")
+            position = np.concatenate(([0.0], np.cumsum(quantity[rows])))[held]
+            invested = np.concatenate(([0.0], np.cumsum(cost[rows])))[held]
+            prices = self.prices_asof(categories[code], grid)
+            value += np.where(np.isnan(prices), invested, position * prices)
+            investment += invested
+        return pd.DataFrame({"value": value, "investment": investment}, index=pd.DatetimeIndex(grid, name="date"))
+
+
+def _merge_history(records: np.ndarray) -> np.ndarray:
+    """Sort by date keeping the last price given for each date"""
+    order = np.argsort(records["date"], kind="stable")
+    records = records[order]
+    last = np.ones(len(records), dtype=bool)
+    last[:-1] = records["date"][1:] != records["date"][:-1]
+    return records[last]
+
+
+def _file_name(asset_id: str) -> str:
+    # Readable prefix plus a digest, so ids differing only in unsafe characters never collide
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", asset_id)[:40]
+    return f"{safe}-{hashlib.sha1(asset_id.encode('utf-8')).hexdigest()[:10]}.npy"
+
+
+_stores: Dict[str, PriceHistoryStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_price_history(root: Optional[str] = None) -> Optional[PriceHistoryStore]:
+    """Process-wide store for INDEXCOPILOT_PRICE_HISTORY, None when not configured"""
+    root = root or os.environ.get(PRICE_HISTORY_ENV_VAR)
+    if not root:
+        return None
+    key = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = PriceHistoryStore(root)
+            _stores[key] = store
+        return store
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from .instrumentation import count, timed
+
+PRICE_SOURCE_ENV_VAR = "INDEXCOPILOT_PRICE_SOURCE"
+DEFAULT_CONCURRENCY = 16
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_TTL = 60.0
+DEFAULT_STALE_TTL = 3600.0
+
+logger = logging.getLogger("indexcopilot.prices")
+
+
+class PriceFetchError(Exception):
+    """Some price requests failed; ``prices`` holds the quotes that did arrive"""
+
+    def __init__(self, message: str, prices: Dict[str, float]):
+        super().__init__(message)
+        self.prices = prices
+
+
+class PriceProvider:
+    """Source of current prices keyed by asset_id
+
+    Subclasses implement the async fetch_prices; get_prices is the blocking entry
+    point for the Streamlit script thread. Unknown asset_ids are left out of the
+    result rather than raising.
+    """
+
+    async def fetch_prices(self, asset_ids: Sequence[str]) -> Dict[str, float]:
+        raise NotImplementedError
+
+    @timed("PriceProvider.get_prices")
+    def get_prices(self, asset_ids: Iterable[str]) -> Dict[str, float]:
+        """Prices for a batch of asset_ids"""
+        asset_ids = list(dict.fromkeys(str(asset_id) for asset_id in asset_ids))
+        if not asset_ids:
+            return {}
+        return asyncio.run(self.fetch_prices(asset_ids))
+
+
+class FilePriceProvider(PriceProvider):
+    """Prices from a local JSON ({asset_id: price}) or CSV (asset_id, price) file
+
+    The file is re-read only when its modification time changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._prices: Dict[str, float] = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @timed
+    def _load(self) -> Dict[str, float]:
+        with self._lock:
+            mtime = os.path.getmtime(self.path)
+            if mtime != self._mtime:
+                if self.path.lower().endswith(".csv"):
+                    df = pd.read_csv(self.path, dtype={"asset_id": str})
+                    prices = dict(zip(df["asset_id"], df["price"].astype(float)))
+                else:
+                    with open(self.path, "r") as f:
+                        prices = {str(key): float(value) for key, value in json.load(f).items()}
+                self._prices, self._mtime = prices, mtime
+            return self._prices
+
+    async def fetch_prices(self, asset_ids: Sequence[str]) -> Dict[str, float]:
+        prices = self._load()
+        return {asset_id: prices[asset_id] for asset_id in asset_ids if asset_id in prices}
+
+
+class HttpPriceProvider(PriceProvider):
+    """Prices from an HTTP quote endpoint: GET <url>?symbols=A,B,C returns {"A": 1.0, ...}
+
+    asset_ids are split into batches that are all requested concurrently, at
+    most ``concurrency`` at a time, so a refresh of thousands of symbols takes
+    one round of requests instead of one request per symbol. Failed batches
+    are logged and counted, and raise a PriceFetchError carrying the prices of
+    the batches that succeeded.
+    """
+
+    def __init__(self, url: str, concurrency: int = DEFAULT_CONCURRENCY, batch_size: int = DEFAULT_BATCH_SIZE,
+                 timeout: float = 10.0):
+        self.url = url
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def _request(self, batch: Sequence[str]) -> Dict[str, float]:
+        separator = "&" if "?" in self.url else "?"
+        url = f"{self.url}{separator}{urllib.parse.urlencode({'symbols': ','.join(batch)})}"
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            payload = json.load(response)
+        return {str(key): float(value) for key, value in payload.items() if value is not None}
+
+    async def fetch_prices(self, asset_ids: Sequence[str]) -> Dict[str, float]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_batch(batch):
+            async with semaphore:
+                try:
+                    # urllib blocks, so each request runs on the default thread pool
+                    return await asyncio.to_thread(self._request, batch)
+                except Exception as e:
+                    logger.warning("Price request for %d symbols from %s failed: %s", len(batch), self.url, e)
+                    count("price_provider.failed_requests")
+                    return e
+
+        batches = [asset_ids[i:i + self.batch_size] for i in range(0, len(asset_ids), self.batch_size)]
+        prices: Dict[str, float] = {}
+        errors: List[Exception] = []
+        for result in await asyncio.gather(*(fetch_batch(batch) for batch in batches)):
+            if isinstance(result, Exception):
+                errors.append(result)
+            else:
+                prices.update(result)
+        if errors:
+            raise PriceFetchError(f"{len(errors)} of {len(batches)} price requests failed: {errors[0]}", prices)
+        return prices
+
+
+class CachedPriceProvider(PriceProvider):
+    """TTL cache with stale-while-revalidate in front of another provider
+
+    Quotes younger than ``ttl`` seconds are served from the cache. Quotes up to
+    ``stale_ttl`` old are still served immediately while one background refresh
+    fetches them again; anything older or missing is fetched before returning.
+    """
+
+    def __init__(self, provider: PriceProvider, ttl: float = DEFAULT_TTL, stale_ttl: float = DEFAULT_STALE_TTL):
+        self.provider = provider
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._quotes: Dict[str, Tuple[float, float]] = {}  # asset_id -> (price, fetched_at)
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._refresh_threads: List[threading.Thread] = []
+
+    def _store(self, prices: Dict[str, float]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for asset_id, price in prices.items():
+                self._quotes[asset_id] = (price, now)
+
+    def _revalidate(self, asset_ids: List[str]) -> None:
+        try:
+            self._store(asyncio.run(self.provider.fetch_prices(asset_ids)))
+        except PriceFetchError as e:
+            # Already logged by the provider; the rest stay stale until the next try
+            self._store(e.prices)
+        except Exception:
+            logger.exception("Background price refresh failed")
+            count("price_provider.failed_requests")
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(asset_ids)
+
+    async def fetch_prices(self, asset_ids: Sequence[str]) -> Dict[str, float]:
+        now = time.monotonic()
+        prices: Dict[str, float] = {}
+        missing: List[str] = []
+        stale: List[str] = []
+        with self._lock:
+            for asset_id in asset_ids:
+                quote = self._quotes.get(asset_id)
+                age = now - quote[1] if quote is not None else None
+                if age is None or age > self.stale_ttl:
+                    missing.append(asset_id)
+                    continue
+                prices[asset_id] = quote[0]
+                if age > self.ttl and asset_id not in self._refreshing:
+                    stale.append(asset_id)
+            self._refreshing.update(stale)
+
+        if stale:
+            thread = threading.Thread(target=self._revalidate, args=(stale,), daemon=True)
+            self._refresh_threads = [t for t in self._refresh_threads if t.is_alive()] + [thread]
+            thread.start()
+        if missing:
+            try:
+                fetched = await self.provider.fetch_prices(missing)
+            except PriceFetchError as e:
+                self._store(e.prices)
+                prices.update(e.prices)
+                raise PriceFetchError(str(e), prices) from e
+            self._store(fetched)
+            prices.update(fetched)
+        return prices
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait for background revalidations to finish"""
+        for thread in list(self._refresh_threads):
+            thread.join(timeout)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._quotes.clear()
+
+
+def price_provider_for(source: str) -> PriceProvider:
+    """Cached provider for an http(s) quote URL or a local JSON/CSV price file"""
+    if urllib.parse.urlparse(source).scheme in ("http", "https"):
+        return CachedPriceProvider(HttpPriceProvider(source))
+    return CachedPriceProvider(FilePriceProvider(source))
+
+
+_providers: Dict[str, PriceProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_price_provider(source: Optional[str] = None) -> Optional[PriceProvider]:
+    """Process-wide provider for INDEXCOPILOT_PRICE_SOURCE, so every session shares one quote cache
+
+    Returns None when no price source is configured.
+    """
+    source = source or os.environ.get(PRICE_SOURCE_ENV_VAR)
+    if not source:
+        return None
+    with _providers_lock:
+        provider = _providers.get(source)
+        if provider is None:
+            provider = price_provider_for(source)
+            _providers[source] = provider
+        return provider
@@ -0,0 +1,214 @@
+import hashlib
+import multiprocessing
+import sys
+import threading
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, List, NamedTuple, Optional
+
+from .holdings_table import HoldingsTable, as_holdings_table
+
+DEFAULT_WORKERS = 2
+FINISHED_CACHE_SIZE = 16
+# Shared progress cells; jobs submitted while all are taken report no progress
+PROGRESS_SLOTS = 64
+
+# Held while __main__ is swapped out, see _detached_main
+_spawn_lock = threading.Lock()
+
+# Worker process state, set by _init_worker and on the first report
+_worker_progress = None
+_worker_export_manager = None
+
+
+def _init_worker(progress) -> None:
+    global _worker_progress
+    _worker_progress = progress
+
+
+def _noop() -> None:
+    pass
+
+
+def _build_report(slot: Optional[int], name: str, holdings: HoldingsTable, include_chart: bool) -> bytes:
+    """Render one PDF inside a worker process"""
+    global _worker_export_manager
+    if _worker_export_manager is None:
+        from .export_manager import ExportManager
+        _worker_export_manager = ExportManager()
+
+    def report_progress(fraction: float) -> None:
+        if slot is not None:
+            _worker_progress[slot] = fraction
+
+    buffer = BytesIO()
+    _worker_export_manager.write_pdf_report({"name": name, "holdings": holdings}, buffer,
+                                            include_chart=include_chart, progress_callback=report_progress)
+    return buffer.getvalue()
+
+
+@contextmanager
+def _detached_main():
+    """Hide the running script from worker processes started inside this block
+
+    spawn re-imports __main__ in every child; under Streamlit that is the app
+    script, which would then run once in each worker. The swap is process-wide,
+    so it is only done while a pool starts its workers, never per job.
+    """
+    with _spawn_lock:
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+
+class JobStatus(NamedTuple):
+    job_id: str
+    state: str  # queued, running, done or failed
+    progress: Optional[float]
+    error: Optional[str] = None
+
+
+class _Job:
+    def __init__(self, future, slot: Optional[int]):
+        self.future = future
+        self.slot = slot
+        self.error: Optional[str] = None
+
+
+class ReportJobQueue:
+    """PDF reports rendered by a process pool, off the Streamlit script thread
+
+    A job id is the hash of the portfolio contents and report options, so
+    identical requests from any session share one job and one finished PDF.
+    The last ``max_finished`` PDFs are kept, least recently used first out.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, max_finished: int = FINISHED_CACHE_SIZE):
+        # spawn, not fork: the Streamlit server process is multi-threaded
+        context = multiprocessing.get_context("spawn")
+        self.max_finished = max_finished
+        self._progress = context.Array("d", PROGRESS_SLOTS, lock=False)
+        self._free_slots: List[int] = list(range(PROGRESS_SLOTS))
+        self._context = context
+        self._max_workers = max_workers
+        self._executor = self._start_executor()
+        self._jobs: Dict[str, _Job] = {}
+        self._finished: "OrderedDict[str, bytes]" = OrderedDict()
+        # Ids of failed jobs, evicted like finished ones
+        self._failed: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _start_executor(self) -> ProcessPoolExecutor:
+        """New pool with all of its workers already running"""
+        executor = ProcessPoolExecutor(self._max_workers, mp_context=self._context,
+                                       initializer=_init_worker, initargs=(self._progress,))
+        # The pool starts a worker per submit() until it is full, so fill it now;
+        # later submits then never spawn and need no __main__ swap
+        with _detached_main():
+            for _ in range(self._max_workers):
+                executor.submit(_noop)
+        return executor
+
+    @staticmethod
+    def job_id(portfolio: Dict, include_chart: bool = True) -> str:
+        """Content hash identifying a report request"""
+        holdings = as_holdings_table(portfolio["holdings"])
+        digest = hashlib.sha256(holdings.content_hash().encode("ascii"))
+        digest.update(f"\x1f{portfolio['name']}\x1f{include_chart}".encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def submit(self, portfolio: Dict, include_chart: bool = True) -> str:
+        """Queue a report unless an identical one is finished or in flight; returns the job id"""
+        holdings = as_holdings_table(portfolio["holdings"])
+        job_id = self.job_id({"name": portfolio["name"], "holdings": holdings}, include_chart)
+        with self._lock:
+            if job_id in self._finished:
+                self._finished.move_to_end(job_id)
+                return job_id
+            job = self._jobs.get(job_id)
+            if job is not None and job.error is None:
+                return job_id
+            slot = self._free_slots.pop() if self._free_slots else None
+            if slot is not None:
+                self._progress[slot] = 0.0
+            args = (_build_report, slot, portfolio["name"], holdings, include_chart)
+            try:
+                future = self._executor.submit(*args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory) and took the pool with it
+                self._executor.shutdown(wait=False)
+                self._executor = self._start_executor()
+                future = self._executor.submit(*args)
+            self._failed.pop(job_id, None)
+            self._jobs[job_id] = _Job(future, slot)
+        future.add_done_callback(lambda done, job_id=job_id: self._on_done(job_id, done))
+        return job_id
+
+    def _on_done(self, job_id: str, future) -> None:
+        """Release the progress slot and file the result; safe to call more than once"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.future is not future:
+                return
+            if job.slot is not None:
+                self._free_slots.append(job.slot)
+                job.slot = None
+            error = future.exception() if not future.cancelled() else None
+            if future.cancelled():
+                job.error = "Report job was cancelled"
+            elif error is not None:
+                job.error = str(error)
+            if job.error is not None:
+                # Failed jobs stay visible until resubmitted or evicted
+                self._failed[job_id] = None
+                while len(self._failed) > self.max_finished:
+                    self._jobs.pop(self._failed.popitem(last=False)[0], None)
+            else:
+                del self._jobs[job_id]
+                self._finished[job_id] = future.result()
+                while len(self._finished) > self.max_finished:
+                    self._finished.popitem(last=False)
+
+    def status(self, job_id: str) -> Optional[JobStatus]:
+        """Current state of a job, None for unknown or evicted ids"""
+        with self._lock:
+            if job_id in self._finished:
+                return JobStatus(job_id, "done", 1.0)
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.error is not None:
+                return JobStatus(job_id, "failed", None, job.error)
+            progress = self._progress[job.slot] if job.slot is not None else None
+            state = "queued" if not (job.future.running() or job.future.done()) else "running"
+            return JobStatus(job_id, state, progress)
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        """Finished PDF bytes, None while the job is pending"""
+        with self._lock:
+            pdf_data = self._finished.get(job_id)
+            if pdf_data is not None:
+                self._finished.move_to_end(job_id)
+            return pdf_data
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[bytes]:
+        """Block until a job finishes; returns its PDF, or None if it failed"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            futures.wait([job.future], timeout)
+            if job.future.done():
+                # The done callback may not have run yet in the pool's management thread
+                self._on_done(job_id, job.future)
+        return self.result(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .holdings_table import parse_dates
+
+
+class Constraint:
+    """A named check on a coerced column; ``check`` returns True where a value violates it"""
+
+    def __init__(self, name: str, check: Callable[[pd.Series], pd.Series], message: str):
+        self.name = name
+        self.check = check
+        self.message = message
+
+
+def positive(label: str) -> Constraint:
+    return Constraint("positive", lambda values: values <= 0, f"{label} must be positive")
+
+
+def one_of(label: str, choices: Sequence[str]) -> Constraint:
+    allowed = {choice.lower() for choice in choices}
+    return Constraint("choice", lambda values: ~values.str.lower().isin(allowed),
+                      f"{label} must be one of: {', '.join(choices)}")
+
+
+class Field:
+    """One column of a schema: dtype, coercion and constraints"""
+
+    def __init__(self, name: str, dtype: str, label: Optional[str] = None, required: bool = True,
+                 nullable: bool = False, constraints: Sequence[Constraint] = ()):
+        if dtype not in _COERCERS:
+            raise ValueError(f"Unknown field dtype: {dtype}")
+        self.name = name
+        self.dtype = dtype
+        self.label = label or name
+        # required: the column must be present; nullable: individual values may be blank
+        self.required = required
+        self.nullable = nullable
+        self.constraints = list(constraints)
+
+
+def _coerce_string(values: pd.Series):
+    coerced = values.astype("string").str.strip()
+    missing = coerced.isna() | (coerced == "")
+    return coerced, missing, pd.Series(False, index=values.index)
+
+
+def _coerce_float(values: pd.Series):
+    if pd.api.types.is_numeric_dtype(values):
+        coerced = values.astype(np.float64)
+        return coerced, coerced.isna(), pd.Series(False, index=values.index)
+    text = values.astype("string").str.strip()
+    missing = text.isna() | (text == "")
+    coerced = pd.to_numeric(text.mask(missing), errors="coerce").astype(np.float64)
+    return coerced, missing, coerced.isna() & ~missing
+
+
+def _coerce_date(values: pd.Series):
+    coerced = parse_dates(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return coerced, coerced.isna(), pd.Series(False, index=values.index)
+    text = values.astype("string").str.strip()
+    missing = text.isna() | (text == "")
+    return coerced, missing, coerced.isna() & ~missing
+
+
+_COERCERS = {"string": _coerce_string, "float": _coerce_float, "date": _coerce_date}
+
+_TYPE_MESSAGES = {
+    "float": "Invalid numeric data in {name}",
+    "date": "Invalid date format in {name}. Use YYYY-MM-DD",
+}
+
+
+class ValidationResult:
+    """Outcome of validating a frame: coerced data, a violation mask per rule and messages"""
+
+    def __init__(self, data: pd.DataFrame, missing_columns: List[str], masks: Dict[str, np.ndarray],
+                 messages: Dict[str, str], columns: Dict[str, str]):
+        self.data = data
+        self.missing_columns = missing_columns
+        self.masks = masks
+        self.messages = messages
+        self._columns = columns
+        self.invalid_rows = np.zeros(len(data), dtype=bool)
+        for mask in masks.values():
+            self.invalid_rows |= mask
+
+    @property
+    def valid(self) -> bool:
+        return not self.missing_columns and not self.invalid_rows.any()
+
+    def errors(self) -> List[str]:
+        """Every failure: missing columns first, then one message per violated rule"""
+        errors = []
+        if self.missing_columns:
+            errors.append(f"Missing required columns: {', '.join(self.missing_columns)}")
+        for rule, mask in self.masks.items():
+            count = int(mask.sum())
+            if count:
+                rows = ", ".join(str(row) for row in (self.data.index[mask][:5] + 1))
+                more = f" and {count - 5} more" if count > 5 else ""
+                errors.append(f"{self.messages[rule]} (rows {rows}{more})")
+        return errors
+
+    def first_error(self) -> Optional[str]:
+        if self.missing_columns:
+            return f"Missing required columns: {', '.join(self.missing_columns)}"
+        for rule, mask in self.masks.items():
+            if mask.any():
+                return self.messages[rule]
+        return None
+
+    def violations(self) -> pd.DataFrame:
+        """One row per (row, rule) violation; row numbers are 1-based index labels"""
+        frames = []
+        for rule, mask in self.masks.items():
+            if mask.any():
+                frames.append(pd.DataFrame({
+                    "row": self.data.index[mask] + 1,
+                    "column": self._columns[rule],
+                    "rule": rule,
+                    "message": self.messages[rule],
+                }))
+        if not frames:
+            return pd.DataFrame(columns=["row", "column", "rule", "message"])
+        return pd.concat(frames, ignore_index=True).sort_values(["row"], kind="stable", ignore_index=True)
+
+    def reasons(self) -> pd.Series:
+        """Per-row '; '-joined messages, empty for valid rows"""
+        reasons = pd.Series("", index=self.data.index, dtype=object)
+        for rule, mask in self.masks.items():
+            if mask.any():
+                reasons[mask] = reasons[mask] + "; " + self.messages[rule]
+        return reasons.str.lstrip("; ")
+
+
+class CompiledSchema:
+    """A schema reduced to a flat plan of coercions and rule checks, run in one pass per column"""
+
+    def __init__(self, fields: Sequence[Field]):
+        self._plan = []
+        for field in fields:
+            rules = []
+            if not field.nullable:
+                rules.append((f"{field.name}.required", f"{field.label} is required", None))
+            if field.dtype in _TYPE_MESSAGES:
+                rules.append((f"{field.name}.type", _TYPE_MESSAGES[field.dtype].format(name=field.name), None))
+            for constraint in field.constraints:
+                rules.append((f"{field.name}.{constraint.name}", constraint.message, constraint.check))
+            self._plan.append((field, _COERCERS[field.dtype], rules))
+        self.required_columns = [field.name for field in fields if field.required]
+
+    def validate(self, df: pd.DataFrame) -> ValidationResult:
+        """Validate and coerce a frame without modifying it"""
+        missing_columns = [col for col in self.required_columns if col not in df.columns]
+        data = pd.DataFrame(index=df.index)
+        masks, messages, columns = {}, {}, {}
+        for field, coerce, rules in self._plan:
+            if field.name not in df.columns:
+                continue
+            coerced, missing, invalid = coerce(df[field.name])
+            data[field.name] = coerced
+            for rule, message, check in rules:
+                if rule.endswith(".required"):
+                    mask = missing
+                elif rule.endswith(".type"):
+                    mask = invalid
+                else:
+                    mask = check(coerced)
+                masks[rule] = pd.Series(mask).fillna(False).to_numpy(dtype=bool)
+                messages[rule] = message
+                columns[rule] = field.name
+        return ValidationResult(data, missing_columns, masks, messages, columns)
+
+
+class Schema:
+    """Declarative column schema; compile() once and reuse the result"""
+
+    def __init__(self, fields: Sequence[Field]):
+        self.fields = list(fields)
+
+    def compile(self) -> CompiledSchema:
+        return CompiledSchema(self.fields)
+
+
+HOLDINGS_SCHEMA = Schema([
+    Field("asset_type", "string", label="Asset type"),
+    Field("asset_id", "string", label="Asset ID"),
+    Field("asset_name", "string", label="Asset name"),
+    Field("quantity", "float", label="Quantity", constraints=[positive("Quantity")]),
+    Field("purchase_price", "float", label="Purchase price", constraints=[positive("Purchase price")]),
+    Field("current_price", "float", label="Current price", required=False, nullable=True,
+          constraints=[positive("Current price")]),
+    Field("purchase_date", "date", label="Purchase date", required=False, nullable=True),
+]).compile()
+
+
+TRADES_SCHEMA = Schema([
+    Field("date", "date", label="Trade date"),
+    Field("action", "string", label="Action", constraints=[one_of("Action", ["buy", "sell"])]),
+    Field("asset_id", "string", label="Asset ID"),
+    Field("quantity", "float", label="Quantity", constraints=[positive("Quantity")]),
+    Field("price", "float", label="Price", constraints=[positive("Price")]),
+    Field("lot_id", "string", label="Lot ID", required=False, nullable=True),
+]).compile()
@@ -0,0 +1,425 @@
+import json
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from contextlib import closing
+from typing import Dict, Optional
+
+from .holdings_table import (HoldingsTable, COLUMNS, DATE_COLUMN, FLOAT_COLUMNS, STRING_COLUMNS, UpsertResult,
+                             as_holdings_table, holdings_frame, parse_dates)
+from .instrumentation import timed
+from .journal import SEQ_KEY, get_journal, write_atomic, write_atomic_binary
+
+DEFAULT_NAME = "My Portfolio"
+
+
+class StorageBackend:
+    """Interface for portfolio persistence
+
+    Mutation hooks receive the already-updated portfolio so simple backends can
+    fall back to a full save. Backends with supports_queries = True can also
+    answer filters and aggregates without loading every holding.
+    """
+
+    supports_queries = False
+
+    def load(self) -> Dict:
+        """Load the portfolio; holdings are returned as a HoldingsTable"""
+        raise NotImplementedError
+
+    def save(self, portfolio: Dict) -> None:
+        """Persist the whole portfolio"""
+        raise NotImplementedError
+
+    def record_add(self, portfolio: Dict, holding: Dict) -> None:
+        """Persist a holding that was just appended to the portfolio"""
+        self.save(portfolio)
+
+    def record_remove(self, portfolio: Dict, asset_id: str, purchase_date: Optional[str]) -> None:
+        """Persist the removal of holdings by asset_id (and optionally purchase_date)"""
+        self.save(portfolio)
+
+    def record_upsert(self, portfolio: Dict, merge: UpsertResult) -> None:
+        """Persist the rows a merge import updated or added"""
+        self.save(portfolio)
+
+    def record_prices(self, portfolio: Dict, prices: Dict[str, float]) -> None:
+        """Persist refreshed current prices by asset_id
+
+        Quotes are market data, so file backends keep them in memory until the next
+        save; backends answering queries must apply them for aggregates to match.
+        """
+
+    # Query pushdown, only called when supports_queries is True
+
+    def query_holdings(self, asset_type: Optional[str] = None, asset_id: Optional[str] = None,
+                       start_date: Optional[str] = None, end_date: Optional[str] = None,
+                       limit: Optional[int] = None) -> pd.DataFrame:
+        """Holdings matching the given filters"""
+        raise NotImplementedError
+
+    def allocation_by_type(self) -> pd.Series:
+        """Current value per asset_type"""
+        raise NotImplementedError
+
+    def totals(self) -> Dict:
+        """Number of holdings, total investment and total current value"""
+        raise NotImplementedError
+
+    def top_by_gain(self, n: int = 5) -> pd.DataFrame:
+        """The n holdings with the largest gain/loss"""
+        raise NotImplementedError
+
+
+class JsonFileStorage(StorageBackend):
+    """Portfolio stored as one JSON file, optionally with an append-only journal"""
+
+    def __init__(self, file_path: str, journal: bool = False, compact_threshold: int = 500):
+        self.file_path = file_path
+        # In journal mode single-holding mutations are appended to <file_path>.log
+        # instead of rewriting the whole snapshot
+        self.journal = get_journal(file_path, compact_threshold) if journal else None
+
+    @timed
+    def load(self) -> Dict:
+        if self.journal is not None:
+            return self.journal.load()
+        if os.path.exists(self.file_path + ".log"):
+            # Mutations journaled by another writer since its last compaction live in the log
+            return get_journal(self.file_path).load()
+        if os.path.exists(self.file_path):
+            with open(self.file_path, "r") as f:
+                portfolio = json.load(f)
+            portfolio["holdings"] = HoldingsTable.from_records(portfolio.get("holdings", []))
+            portfolio.pop(SEQ_KEY, None)
+            return portfolio
+        return {"name": DEFAULT_NAME, "holdings": HoldingsTable()}
+
+    @timed
+    def save(self, portfolio: Dict) -> None:
+        if self.journal is not None:
+            self.journal.write_snapshot(portfolio)
+            return
+        if os.path.exists(self.file_path + ".log"):
+            # A journaling writer shares this file: save through the journal so the
+            # snapshot records its sequence number and the superseded log is dropped
+            get_journal(self.file_path).write_snapshot(portfolio)
+            return
+        holdings = portfolio["holdings"]
+        if isinstance(holdings, HoldingsTable):
+            portfolio = dict(portfolio, holdings=holdings.to_records())
+        # Temp file + rename so a crash mid-write never leaves a truncated file
+        write_atomic(self.file_path, json.dumps(portfolio, indent=2))
+
+    def record_add(self, portfolio: Dict, holding: Dict) -> None:
+        if self.journal is None:
+            self.save(portfolio)
+        else:
+            self.journal.append("add", holding=holding)
+
+    def record_remove(self, portfolio: Dict, asset_id: str, purchase_date: Optional[str]) -> None:
+        if self.journal is None:
+            self.save(portfolio)
+        else:
+            self.journal.append("remove", asset_id=asset_id, purchase_date=purchase_date)
+
+    def record_upsert(self, portfolio: Dict, merge: UpsertResult) -> None:
+        if self.journal is None:
+            self.save(portfolio)
+        else:
+            # One record for the whole diff, replayed as a merge over the snapshot
+            holdings = [dict(record, occurrence=int(occurrence))
+                        for record, occurrence in zip(merge.changes.to_records(), merge.occurrence)]
+            self.journal.append("upsert", holdings=holdings)
+
+
+class SQLiteStorage(StorageBackend):
+    """Portfolio stored in SQLite with indexes for filter and aggregate pushdown"""
+
+    supports_queries = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS portfolio (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS holdings (
+            id INTEGER PRIMARY KEY,
+            asset_type TEXT NOT NULL,
+            asset_id TEXT NOT NULL,
+            asset_name TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            purchase_price REAL NOT NULL,
+            current_price REAL NOT NULL,
+            purchase_date TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_holdings_asset_id ON holdings (asset_id);
+        CREATE INDEX IF NOT EXISTS idx_holdings_asset_type ON holdings (asset_type);
+        CREATE INDEX IF NOT EXISTS idx_holdings_purchase_date ON holdings (purchase_date);
+        CREATE INDEX IF NOT EXISTS idx_holdings_gain_loss
+            ON holdings ((current_price - purchase_price) * quantity);
+    """
+
+    SELECT_COLUMNS = ", ".join(COLUMNS)
+    GAIN_LOSS = "(current_price - purchase_price) * quantity"
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps the backend safe across Streamlit threads
+        return sqlite3.connect(self.db_path)
+
+    def _read(self, sql: str, params=()) -> pd.DataFrame:
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    @timed
+    def load(self) -> Dict:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM portfolio WHERE key = 'name'").fetchone()
+            df = pd.read_sql_query(f"SELECT {self.SELECT_COLUMNS} FROM holdings ORDER BY id", conn)
+        return {"name": row[0] if row else DEFAULT_NAME, "holdings": HoldingsTable.from_frame(df)}
+
+    @timed
+    def save(self, portfolio: Dict) -> None:
+        records = _rows(holdings_frame(portfolio["holdings"]))
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO portfolio (key, value) VALUES ('name', ?)", (portfolio["name"],))
+            conn.execute("DELETE FROM holdings")
+            conn.executemany(
+                f"INSERT INTO holdings ({self.SELECT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", records
+            )
+
+    @timed
+    def record_add(self, portfolio: Dict, holding: Dict) -> None:
+        row = _rows(pd.DataFrame([holding]))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(f"INSERT INTO holdings ({self.SELECT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+
+    @timed
+    def record_remove(self, portfolio: Dict, asset_id: str, purchase_date: Optional[str]) -> None:
+        sql, params = "DELETE FROM holdings WHERE asset_id = ?", [asset_id]
+        if purchase_date is not None:
+            sql += " AND purchase_date = ?"
+            params.append(_iso_date(purchase_date))
+        with closing(self._connect()) as conn, conn:
+            conn.execute(sql, params)
+
+    @timed
+    def record_upsert(self, portfolio: Dict, merge: UpsertResult) -> None:
+        rows = _rows(merge.changes.to_frame())
+        with closing(self._connect()) as conn, conn:
+            # Updated rows are found as the n-th row with their key in id order, which is table order
+            conn.executemany(
+                "UPDATE holdings SET asset_type = ?, asset_name = ?, quantity = ?, purchase_price = ?, "
+                "current_price = ? WHERE id = (SELECT id FROM holdings WHERE asset_id = ? AND purchase_date IS ? "
+                "ORDER BY id LIMIT 1 OFFSET ?)",
+                [(asset_type, asset_name, quantity, purchase_price, current_price, asset_id, date, int(occurrence))
+                 for (asset_type, asset_id, asset_name, quantity, purchase_price, current_price, date), occurrence
+                 in zip(rows[:merge.updated], merge.occurrence)]
+            )
+            conn.executemany(
+                f"INSERT INTO holdings ({self.SELECT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows[merge.updated:]
+            )
+
+    @timed
+    def record_prices(self, portfolio: Dict, prices: Dict[str, float]) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE holdings SET current_price = ? WHERE asset_id = ?",
+                             [(price, asset_id) for asset_id, price in prices.items()])
+
+    def query_holdings(self, asset_type=None, asset_id=None, start_date=None, end_date=None, limit=None) -> pd.DataFrame:
+        clauses, params = [], []
+        if asset_type is not None:
+            clauses.append("asset_type = ?")
+            params.append(asset_type)
+        if asset_id is not None:
+            clauses.append("asset_id = ?")
+            params.append(asset_id)
+        if start_date is not None:
+            clauses.append("purchase_date >= ?")
+            params.append(_iso_date(start_date))
+        if end_date is not None:
+            clauses.append("purchase_date <= ?")
+            params.append(_iso_date(end_date))
+        sql = f"SELECT {self.SELECT_COLUMNS} FROM holdings"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self._read(sql, params)
+
+    def allocation_by_type(self) -> pd.Series:
+        df = self._read(
+            "SELECT asset_type, SUM(quantity * current_price) AS value FROM holdings "
+            "GROUP BY asset_type ORDER BY asset_type"
+        )
+        return df.set_index("asset_type")["value"]
+
+    def totals(self) -> Dict:
+        with closing(self._connect()) as conn:
+            count, investment, value = conn.execute(
+                "SELECT COUNT(*), TOTAL(quantity * purchase_price), TOTAL(quantity * current_price) FROM holdings"
+            ).fetchone()
+        return {"holdings": count, "total_investment": investment, "total_value": value}
+
+    def top_by_gain(self, n: int = 5) -> pd.DataFrame:
+        return self._read(
+            f"SELECT {self.SELECT_COLUMNS}, {self.GAIN_LOSS} AS gain_loss FROM holdings "
+            f"ORDER BY {self.GAIN_LOSS} DESC LIMIT ?",
+            (int(n),)
+        )
+
+
+def _iso_date(value) -> str:
+    return str(pd.Timestamp(str(value).replace("/", "-")).date())
+
+
+def _rows(df: pd.DataFrame):
+    """Holdings frame as SQLite parameter tuples with ISO date strings"""
+    if "current_price" not in df.columns:
+        df = df.assign(current_price=df["purchase_price"])
+    if "purchase_date" in df.columns:
+        dates = parse_dates(df["purchase_date"])
+        dates = dates.dt.strftime("%Y-%m-%d").astype(object).where(dates.notna(), None)
+    else:
+        dates = pd.Series([None] * len(df), index=df.index, dtype=object)
+    return list(zip(
+        df["asset_type"].astype(str), df["asset_id"].astype(str), df["asset_name"].astype(str),
+        df["quantity"].astype(float), df["purchase_price"].astype(float), df["current_price"].astype(float),
+        dates
+    ))
+
+
+class NpzSnapshotStorage(StorageBackend):
+    """Portfolio stored as a columnar NumPy .npz snapshot
+
+    Every HoldingsTable buffer is one array in the archive: float64 columns,
+    int32 codes plus their category strings, and datetime64 dates. Loading
+    reads each array once and adopts it as a table buffer, with no parsing and
+    no re-interning, so the frame the tabs use is a view of what was read.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, file_path: str, compress: bool = False):
+        self.file_path = file_path
+        self.compress = compress
+
+    @timed
+    def load(self) -> Dict:
+        if not os.path.exists(self.file_path):
+            return {"name": DEFAULT_NAME, "holdings": HoldingsTable()}
+        with np.load(self.file_path, allow_pickle=False) as archive:
+            version = int(archive["format"])
+            if version > self.FORMAT_VERSION:
+                raise ValueError(f"Unsupported snapshot format {version}")
+            holdings = HoldingsTable.from_columns(
+                floats={col: archive[col] for col in FLOAT_COLUMNS},
+                codes={col: archive[f"{col}.codes"] for col in STRING_COLUMNS},
+                categories={col: archive[f"{col}.categories"].tolist() for col in STRING_COLUMNS},
+                dates=archive[DATE_COLUMN],
+            )
+            return {"name": str(archive["name"]), "holdings": holdings}
+
+    @timed
+    def save(self, portfolio: Dict) -> None:
+        floats, codes, categories, dates = as_holdings_table(portfolio["holdings"]).to_columns()
+        arrays = {"format": np.array(self.FORMAT_VERSION), "name": np.array(str(portfolio.get("name", DEFAULT_NAME)))}
+        arrays.update(floats)
+        for col in STRING_COLUMNS:
+            arrays[f"{col}.codes"] = codes[col]
+            # Fixed-width unicode, so the archive loads without pickle
+            arrays[f"{col}.categories"] = np.array(categories[col], dtype=str)
+        arrays[DATE_COLUMN] = dates
+        savez = np.savez_compressed if self.compress else np.savez
+        write_atomic_binary(self.file_path, lambda f: savez(f, **arrays))
+
+
+class ParquetSnapshotStorage(StorageBackend):
+    """Portfolio stored as a Parquet file; needs the optional pyarrow package
+
+    String columns are written dictionary-encoded, so loading takes the codes
+    and dictionaries straight into the table instead of re-interning strings.
+    """
+
+    NAME_KEY = b"indexcopilot.name"
+
+    def __init__(self, file_path: str, compress: bool = False):
+        self.file_path = file_path
+        self.compression = "zstd" if compress else "snappy"
+
+    @staticmethod
+    def _pyarrow():
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet portfolios need pyarrow: pip install pyarrow")
+        return pyarrow
+
+    @timed
+    def load(self) -> Dict:
+        if not os.path.exists(self.file_path):
+            return {"name": DEFAULT_NAME, "holdings": HoldingsTable()}
+        pa = self._pyarrow()
+        table = pa.parquet.read_table(self.file_path)
+        df = table.to_pandas()
+        codes, categories = {}, {}
+        for col in STRING_COLUMNS:
+            values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype("category")
+            codes[col] = values.cat.codes.to_numpy()
+            categories[col] = values.cat.categories.tolist()
+        holdings = HoldingsTable.from_columns(
+            floats={col: df[col].to_numpy(dtype=np.float64) for col in FLOAT_COLUMNS},
+            codes=codes,
+            categories=categories,
+            dates=df[DATE_COLUMN].to_numpy(),
+        )
+        metadata = table.schema.metadata or {}
+        return {"name": metadata.get(self.NAME_KEY, DEFAULT_NAME.encode()).decode("utf-8"), "holdings": holdings}
+
+    @timed
+    def save(self, portfolio: Dict) -> None:
+        pa = self._pyarrow()
+        table = pa.Table.from_pandas(as_holdings_table(portfolio["holdings"]).to_frame(), preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[self.NAME_KEY] = str(portfolio.get("name", DEFAULT_NAME)).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+        write_atomic_binary(self.file_path,
+                            lambda f: pa.parquet.write_table(table, f, compression=self.compression))
+
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+NPZ_EXTENSIONS = (".npz",)
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+
+def storage_for_path(file_path: str, journal: bool = False, compact_threshold: int = 500,
+                     compress: bool = False) -> StorageBackend:
+    """Pick a storage backend from the file extension
+
+    ``compress`` applies to the binary snapshot formats (.npz, .parquet).
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in SQLITE_EXTENSIONS:
+        return SQLiteStorage(file_path)
+    if extension in NPZ_EXTENSIONS:
+        return NpzSnapshotStorage(file_path, compress=compress)
+    if extension in PARQUET_EXTENSIONS:
+        return ParquetSnapshotStorage(file_path, compress=compress)
+    return JsonFileStorage(file_path, journal=journal, compact_threshold=compact_threshold)
+
+
+def convert_portfolio(source_path: str, target_path: str, compress: bool = False) -> int:
+    """Copy a portfolio between any two storage formats; returns the number of holdings"""
+    portfolio = storage_for_path(source_path).load()
+    storage_for_path(target_path, compress=compress).save(portfolio)
+    return len(portfolio["holdings"])
@@ -0,0 +1,414 @@
+import heapq
+import re
+from datetime import date
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .holdings_table import HoldingsTable, _to_datetime64, as_holdings_table
+from .instrumentation import timed
+from .schema import TRADES_SCHEMA
+
+# Lots held longer than this are long-term when realized
+LONG_TERM_DAYS = 365
+# Lots without a purchase date sort before every dated lot, so FIFO sells them first
+UNDATED = np.iinfo(np.int64).min
+_EPSILON = 1e-9
+# Lots bought without an id are called L<index>; explicit ids of that form are refused
+GENERATED_LOT_ID = re.compile(r"L(0|[1-9]\d*)")
+_EPOCH = date(1970, 1, 1).toordinal()
+
+REALIZED_COLUMNS = ["asset_id", "asset_name", "asset_type", "lot_id", "purchase_date", "sale_date", "quantity",
+                    "cost_basis", "proceeds", "gain", "holding_days", "term"]
+
+
+def _to_day(value) -> int:
+    """Days since the epoch for a date, string or datetime64; UNDATED when missing or invalid"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            value = date.fromisoformat(value.strip().replace("/", "-"))
+        except ValueError:
+            pass
+    if type(value) is date:
+        return value.toordinal() - _EPOCH
+    days = _to_datetime64(value).astype("datetime64[D]")
+    return UNDATED if np.isnat(days) else int(days.astype(np.int64))
+
+
+def _day_label(day: int) -> str:
+    return "an unknown date" if day == UNDATED else str(np.datetime64(day, "D"))
+
+
+def _days_to_dates(days: np.ndarray) -> np.ndarray:
+    days = np.asarray(days, dtype=np.int64)
+    return np.where(days == UNDATED, np.datetime64("NaT"), days.astype("datetime64[D]")).astype("datetime64[s]")
+
+
+def _term(holding_days: np.ndarray, undated: np.ndarray) -> np.ndarray:
+    return np.where(undated, "unknown", np.where(holding_days > LONG_TERM_DAYS, "long", "short"))
+
+
+class TaxLotLedger:
+    """Open lots per asset_id in purchase-date order, matched against sells FIFO or by lot id
+
+    Each asset keeps a binary heap of (purchase day, lot index), so a FIFO match costs
+    O(log n) in that asset's lots; heaps of lots loaded from holdings are built only for
+    the assets that trade. Lots emptied by a specific-lot sell stay in the heap
+    and are discarded when they reach the top. Lot fields live in plain lists, which
+    the replay loop indexes much faster than NumPy arrays; reports convert them once.
+    """
+
+    def __init__(self):
+        self._asset_ids: List[str] = []
+        # None for lots with a generated id; _lot_index maps explicit ids only
+        self._lot_ids: List[Optional[str]] = []
+        self._days: List[int] = []
+        self._remaining: List[float] = []
+        self._unit_cost: List[float] = []
+        self._lot_index: Dict[str, int] = {}
+        self._heaps: Dict[str, List[Tuple[int, int]]] = {}
+        # Lots loaded in bulk, ordered by (asset, day); an asset's heap is built from its slice when first needed
+        self._bulk_order = np.empty(0, dtype=np.int64)
+        self._bulk_slices: Dict[str, Tuple[int, int]] = {}
+        self._open_quantity: Dict[str, float] = {}
+        # Market prices (holdings, set_prices) take precedence over the last trade price
+        self._market_price: Dict[str, float] = {}
+        self._last_price: Dict[str, float] = {}
+        self._names: Dict[str, Tuple[str, str]] = {}
+        self._realized: List[Tuple] = []
+
+    @classmethod
+    @timed
+    def from_holdings(cls, holdings: Union[HoldingsTable, List[Dict]]) -> "TaxLotLedger":
+        """Ledger whose open lots are the holdings, one lot per row, priced at current_price"""
+        table = as_holdings_table(holdings)
+        ledger = cls()
+        n = len(table)
+        if not n:
+            return ledger
+        codes = table.codes("asset_id")
+        id_categories = np.asarray(table.categories("asset_id").astype(str), dtype=object)
+        asset_ids = id_categories[codes]
+        dates = table.column("purchase_date")
+        days = np.where(np.isnat(dates), UNDATED, dates.astype("datetime64[D]").astype(np.int64))
+        ledger._asset_ids = asset_ids.tolist()
+        ledger._lot_ids = [None] * n
+        ledger._days = days.tolist()
+        ledger._remaining = table.column("quantity").tolist()
+        ledger._unit_cost = table.column("purchase_price").tolist()
+
+        # One lexsort orders every asset's lots by day; heaps are cut from it lazily
+        order = np.lexsort((days, codes))
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        stops = np.r_[starts[1:], n]
+        ledger._bulk_order = order
+        ledger._bulk_slices = dict(zip(id_categories[sorted_codes[starts]].tolist(),
+                                       zip(starts.tolist(), stops.tolist())))
+        quantity_by_code = np.bincount(codes, weights=table.column("quantity"), minlength=len(id_categories))
+        present = np.unique(codes)
+        ledger._open_quantity = dict(zip(id_categories[present].tolist(), quantity_by_code[present].tolist()))
+
+        # Name, type and price of each asset from its last row
+        last = n - 1 - np.unique(codes[::-1], return_index=True)[1]
+        names = np.asarray(table.categories("asset_name").astype(str), dtype=object)[table.codes("asset_name")[last]]
+        types = np.asarray(table.categories("asset_type").astype(str), dtype=object)[table.codes("asset_type")[last]]
+        ids = asset_ids[last].tolist()
+        ledger._market_price = dict(zip(ids, table.column("current_price")[last].tolist()))
+        ledger._names = dict(zip(ids, zip(names.tolist(), types.tolist())))
+        return ledger
+
+    def __len__(self) -> int:
+        return len(self._lot_ids)
+
+    def _find_lot(self, lot_id: str) -> Optional[int]:
+        """Index of a lot by its explicit or generated id"""
+        index = self._lot_index.get(lot_id)
+        if index is None and GENERATED_LOT_ID.fullmatch(lot_id):
+            candidate = int(lot_id[1:])
+            if candidate < len(self._lot_ids) and self._lot_ids[candidate] is None:
+                index = candidate
+        return index
+
+    def _check_new_lot_ids(self, lot_ids) -> None:
+        """Refuse explicit lot ids that are repeated, already used or shaped like a generated id"""
+        lot_ids = pd.Index(lot_ids, dtype=object)
+        reserved = lot_ids[lot_ids.str.fullmatch(GENERATED_LOT_ID.pattern)]
+        if len(reserved):
+            raise ValueError(f"Lot id {reserved[0]} is reserved for generated lot ids")
+        duplicated = lot_ids[lot_ids.duplicated() | lot_ids.isin(self._lot_index)]
+        if len(duplicated):
+            raise ValueError(f"Duplicate lot id: {duplicated[0]}")
+
+    def _lot_labels(self, index: np.ndarray) -> np.ndarray:
+        """Lot ids for lot indices, generating L<index> where no id was given"""
+        labels = np.asarray(self._lot_ids, dtype=object)[index]
+        generated = pd.isna(labels)
+        labels[generated] = np.char.add("L", index[generated].astype(str)).astype(object)
+        return labels
+
+    def _heap(self, asset_id: str) -> List[Tuple[int, int]]:
+        """The asset's heap of (day, lot index), created on first use"""
+        heap = self._heaps.get(asset_id)
+        if heap is None:
+            start, stop = self._bulk_slices.pop(asset_id, (0, 0))
+            lots = self._bulk_order[start:stop].tolist()
+            # Bulk lots are already in day order, and a sorted list is a valid heap
+            heap = self._heaps[asset_id] = [(self._days[index], index) for index in lots]
+        return heap
+
+    # ------------------------------------------------------------------ transactions
+
+    def buy(self, asset_id: str, quantity: float, price: float, purchase_date=None,
+            lot_id: Optional[str] = None) -> str:
+        """Open a lot and return its id"""
+        return self._buy(str(asset_id), float(quantity), float(price), _to_day(purchase_date), lot_id)
+
+    def sell(self, asset_id: str, quantity: float, price: float, sale_date=None,
+             lot_id: Optional[str] = None) -> float:
+        """Close quantity FIFO, or from one lot when ``lot_id`` is given; returns the realized gain"""
+        gain = self._sell(str(asset_id), float(quantity), float(price), _to_day(sale_date), lot_id)
+        self._last_price[str(asset_id)] = float(price)
+        return gain
+
+    def _buy(self, asset_id: str, quantity: float, price: float, day: int, lot_id: Optional[str]) -> str:
+        if quantity <= 0:
+            raise ValueError(f"Buy quantity for {asset_id} must be positive")
+        index = len(self._lot_ids)
+        if lot_id:
+            self._check_new_lot_ids([lot_id])
+            self._lot_index[lot_id] = index
+        self._asset_ids.append(asset_id)
+        self._lot_ids.append(lot_id or None)
+        self._days.append(day)
+        self._remaining.append(quantity)
+        self._unit_cost.append(price)
+        heapq.heappush(self._heap(asset_id), (day, index))
+        self._open_quantity[asset_id] = self._open_quantity.get(asset_id, 0.0) + quantity
+        self._last_price[asset_id] = price
+        return lot_id or f"L{index}"
+
+    def _sell(self, asset_id: str, quantity: float, price: float, day: int, lot_id: Optional[str]) -> float:
+        if quantity <= 0:
+            raise ValueError(f"Sell quantity for {asset_id} must be positive")
+        if quantity > self._open_quantity.get(asset_id, 0.0) + _EPSILON:
+            raise ValueError(f"Cannot sell {quantity:g} {asset_id}: only "
+                             f"{self._open_quantity.get(asset_id, 0.0):g} held")
+        remaining = self._remaining
+        gain = 0.0
+        if lot_id is not None:
+            index = self._find_lot(lot_id)
+            if index is None or self._asset_ids[index] != asset_id:
+                raise ValueError(f"Unknown lot {lot_id} for {asset_id}")
+            if quantity > remaining[index] + _EPSILON:
+                raise ValueError(f"Cannot sell {quantity:g} from lot {lot_id}: only {remaining[index]:g} left")
+            if self._days[index] > day:
+                raise ValueError(f"Cannot sell from lot {lot_id} on {_day_label(day)}: "
+                                 f"it was bought on {_day_label(self._days[index])}")
+            gain = self._close(index, min(quantity, remaining[index]), price, day)
+        else:
+            # Pop lots bought up to the sale date, oldest first; lots bought later are not
+            # available, and nothing is closed until the whole quantity is matched
+            heap = self._heap(asset_id)
+            left = quantity
+            taken = []
+            while left > _EPSILON and heap and heap[0][0] <= day:
+                entry = heapq.heappop(heap)
+                if remaining[entry[1]] <= _EPSILON:
+                    continue
+                taken.append(entry)
+                left -= remaining[entry[1]]
+            if left > _EPSILON:
+                for entry in taken:
+                    heapq.heappush(heap, entry)
+                raise ValueError(f"Cannot sell {quantity:g} {asset_id} on {_day_label(day)}: only "
+                                 f"{quantity - left:g} bought by then")
+            left = quantity
+            for entry in taken:
+                matched = min(left, remaining[entry[1]])
+                gain += self._close(entry[1], matched, price, day)
+                left -= matched
+            if remaining[taken[-1][1]] > _EPSILON:
+                heapq.heappush(heap, taken[-1])
+        self._open_quantity[asset_id] -= quantity
+        return gain
+
+    def _close(self, index: int, quantity: float, price: float, day: int) -> float:
+        cost_basis = quantity * self._unit_cost[index]
+        proceeds = quantity * price
+        self._remaining[index] -= quantity
+        self._realized.append((index, day, quantity, cost_basis, proceeds))
+        return proceeds - cost_basis
+
+    @timed
+    def replay(self, trades: pd.DataFrame) -> int:
+        """Apply buy/sell trades (date, action, asset_id, quantity, price, optional lot_id) in date order
+
+        Trades are validated against TRADES_SCHEMA and lot ids checked before anything is applied.
+        A sell beyond the open quantity raises part way through, so discard the ledger on error.
+        """
+        result = TRADES_SCHEMA.validate(trades)
+        if not result.valid:
+            raise ValueError("; ".join(result.errors()))
+        data = result.data
+        dates = data["date"].to_numpy(dtype="datetime64[D]")
+        order = np.argsort(dates, kind="stable")
+        n = len(order)
+        is_buy = (data["action"].str.lower() == "buy").to_numpy(dtype=bool)[order]
+        asset_ids = data["asset_id"].to_numpy(dtype=object)[order]
+        quantities = data["quantity"].to_numpy(dtype=np.float64)[order]
+        prices = data["price"].to_numpy(dtype=np.float64)[order]
+        days = dates.astype(np.int64)[order]
+        if "lot_id" in data.columns:
+            named = data["lot_id"].notna() & (data["lot_id"] != "")
+            lot_ids = data["lot_id"].astype(object).where(named, None).to_numpy()[order]
+        else:
+            lot_ids = np.full(n, None, dtype=object)
+
+        # Every buy's lot is created up front, empty until the replay reaches it
+        base = len(self._lot_ids)
+        lot_positions = np.full(n, -1, dtype=np.int64)
+        lot_positions[is_buy] = base + np.arange(int(is_buy.sum()))
+        buy_ids = lot_ids[is_buy]
+        named = ~pd.isna(buy_ids)
+        self._check_new_lot_ids(buy_ids[named])
+        self._asset_ids.extend(asset_ids[is_buy].tolist())
+        self._lot_ids.extend(buy_ids.tolist())
+        self._days.extend(days[is_buy].tolist())
+        self._remaining.extend([0.0] * len(buy_ids))
+        self._unit_cost.extend(prices[is_buy].tolist())
+        self._lot_index.update(zip(buy_ids[named].tolist(), lot_positions[is_buy][named].tolist()))
+
+        heaps, open_quantity, remaining, sell = self._heaps, self._open_quantity, self._remaining, self._sell
+        heap_for = self._heap
+        for buy, asset_id, quantity, price, day, lot_id, index in zip(
+                is_buy.tolist(), asset_ids.tolist(), quantities.tolist(), prices.tolist(), days.tolist(),
+                lot_ids.tolist(), lot_positions.tolist()):
+            if buy:
+                remaining[index] = quantity
+                heap = heaps.get(asset_id)
+                if heap is None:
+                    heap = heap_for(asset_id)
+                heapq.heappush(heap, (day, index))
+                open_quantity[asset_id] = open_quantity.get(asset_id, 0.0) + quantity
+            else:
+                sell(asset_id, quantity, price, day, lot_id)
+        # The last trade of each asset sets its price
+        last = pd.Series(prices).groupby(asset_ids).last()
+        self._last_price.update(zip(last.index.tolist(), last.tolist()))
+        return n
+
+    # ------------------------------------------------------------------ reports
+
+    def set_prices(self, prices: Dict[str, float]) -> None:
+        """Market prices for unrealized gains; assets without one are valued at their last trade"""
+        self._market_price.update(prices)
+
+    def price(self, asset_id: str) -> float:
+        """Market price of an asset, else its last trade price, else NaN"""
+        return self._market_price.get(asset_id, self._last_price.get(asset_id, np.nan))
+
+    def _details(self, asset_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Name, type and price per row, looked up once per distinct asset; unknown assets are named by id"""
+        codes, assets = pd.factorize(asset_ids)
+        details = [self._names.get(asset, (asset, None)) for asset in assets]
+        names = np.array([name for name, _ in details] + [None], dtype=object)[codes]
+        types = np.array([asset_type for _, asset_type in details] + [None], dtype=object)[codes]
+        prices = np.array([self.price(asset) for asset in assets] + [np.nan], dtype=np.float64)[codes]
+        return names, types, prices
+
+    def open_lots(self) -> pd.DataFrame:
+        """Lots with a remaining quantity, in lot order"""
+        remaining = np.asarray(self._remaining, dtype=np.float64)
+        open_mask = remaining > _EPSILON
+        unit_cost = np.asarray(self._unit_cost, dtype=np.float64)[open_mask]
+        asset_ids = np.asarray(self._asset_ids, dtype=object)[open_mask]
+        names, types, _ = self._details(asset_ids)
+        return pd.DataFrame({
+            "asset_id": asset_ids,
+            "asset_name": names,
+            "asset_type": types,
+            "lot_id": self._lot_labels(np.flatnonzero(open_mask)),
+            "purchase_date": _days_to_dates(np.asarray(self._days, dtype=np.int64)[open_mask]),
+            "quantity": remaining[open_mask],
+            "unit_cost": unit_cost,
+            "cost_basis": remaining[open_mask] * unit_cost,
+        })
+
+    @timed
+    def unrealized_gains(self, as_of: Optional[date] = None) -> pd.DataFrame:
+        """Open lots valued at current prices, with holding period and short/long term as of a date"""
+        lots = self.open_lots()
+        as_of_day = _to_day(as_of or date.today())
+        days = np.asarray(self._days, dtype=np.int64)[np.asarray(self._remaining) > _EPSILON]
+        _, _, prices = self._details(lots["asset_id"].to_numpy(dtype=object))
+        lots["current_price"] = prices
+        lots["value"] = lots["quantity"] * prices
+        lots["gain"] = lots["value"] - lots["cost_basis"]
+        undated = days == UNDATED
+        lots["holding_days"] = np.where(undated, np.nan, as_of_day - np.where(undated, 0, days))
+        lots["term"] = _term(lots["holding_days"].to_numpy(), undated)
+        return lots
+
+    def realized_gains(self) -> pd.DataFrame:
+        """One row per matched (lot, sell) pair in match order"""
+        if not self._realized:
+            return pd.DataFrame({column: [] for column in REALIZED_COLUMNS})
+        index, sale_days, quantity, cost_basis, proceeds = (np.asarray(column) for column in zip(*self._realized))
+        purchase_days = np.asarray(self._days, dtype=np.int64)[index]
+        undated = purchase_days == UNDATED
+        holding_days = np.where(undated, np.nan, sale_days - np.where(undated, 0, purchase_days))
+        asset_ids = np.asarray(self._asset_ids, dtype=object)[index]
+        names, types, _ = self._details(asset_ids)
+        return pd.DataFrame({
+            "asset_id": asset_ids,
+            "asset_name": names,
+            "asset_type": types,
+            "lot_id": self._lot_labels(index),
+            "purchase_date": _days_to_dates(purchase_days),
+            "sale_date": _days_to_dates(sale_days),
+            "quantity": quantity.astype(np.float64),
+            "cost_basis": cost_basis.astype(np.float64),
+            "proceeds": proceeds.astype(np.float64),
+            "gain": (proceeds - cost_basis).astype(np.float64),
+            "holding_days": holding_days,
+            "term": _term(holding_days, undated),
+        })
+
+    @timed
+    def positions(self) -> pd.DataFrame:
+        """Open quantity, cost basis, value and realized/unrealized gain per asset_id, by value"""
+        remaining = np.asarray(self._remaining, dtype=np.float64)
+        open_mask = remaining > _EPSILON
+        lot_assets = np.asarray(self._asset_ids, dtype=object)
+        codes, assets = pd.factorize(lot_assets[open_mask])
+        assets = list(assets)
+        quantity = remaining[open_mask]
+        # Per-asset sums in one pass each over the open lots
+        totals = {
+            "lots": np.bincount(codes, minlength=len(assets)),
+            "quantity": np.bincount(codes, weights=quantity, minlength=len(assets)),
+            "cost_basis": np.bincount(codes, weights=quantity * np.asarray(self._unit_cost)[open_mask],
+                                      minlength=len(assets)),
+        }
+        names, types, prices = self._details(np.asarray(assets, dtype=object))
+        realized = pd.Series(0.0, index=assets, dtype=np.float64)
+        if self._realized:
+            index, _, _, cost_basis, proceeds = (np.asarray(column) for column in zip(*self._realized))
+            by_asset = pd.Series(proceeds - cost_basis).groupby(lot_assets[index]).sum()
+            realized = by_asset.reindex(assets, fill_value=0.0)
+        positions = pd.DataFrame({
+            "asset_id": assets,
+            "asset_name": names,
+            "asset_type": types,
+            **totals,
+            "avg_cost": totals["cost_basis"] / totals["quantity"],
+            "current_price": prices,
+            "value": totals["quantity"] * prices,
+            "unrealized_gain": totals["quantity"] * prices - totals["cost_basis"],
+            "realized_gain": realized.to_numpy(dtype=np.float64),
+        })
+        return positions.sort_values("value", ascending=False, ignore_index=True)
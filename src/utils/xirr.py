@@ -0,0 +1,126 @@
+import numpy as np
+
+# Search ln(1 + rate) within these bounds, i.e. rates from -99.9% to +99,900% a year
+LOG_RATE_MIN = np.log1p(-0.999)
+LOG_RATE_MAX = np.log1p(999.0)
+DEFAULT_TOLERANCE = 1e-10
+DEFAULT_MAX_ITER = 100
+
+
+def _npv(amounts: np.ndarray, years: np.ndarray, log_rate: np.ndarray, starts: np.ndarray, lengths: np.ndarray):
+    """NPV at time 0 of each segment of flows and its derivative with respect to ln(1 + rate)
+
+    Segment i is ``lengths[i]`` flows from ``starts[i]``; ``log_rate`` holds one rate per segment.
+    """
+    with np.errstate(over="ignore", invalid="ignore"):
+        discounted = amounts * np.exp(-years * np.repeat(log_rate, lengths))
+        npv = np.add.reduceat(discounted, starts)
+        derivative = -np.add.reduceat(years * discounted, starts)
+    return npv, derivative
+
+
+def _starts(lengths: np.ndarray) -> np.ndarray:
+    return np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.intp)
+
+
+def solve_xirr(amounts: np.ndarray, years: np.ndarray, tol: float = DEFAULT_TOLERANCE,
+               max_iter: int = DEFAULT_MAX_ITER) -> np.ndarray:
+    """Annual rate r solving sum(amounts * (1 + r) ** -years) = 0 for every row at once
+
+    ``amounts`` and ``years`` are (rows, flows) arrays; rows with fewer cash
+    flows are padded with zero amounts. See solve_segments for the method.
+    """
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=np.float64))
+    years = np.broadcast_to(np.asarray(years, dtype=np.float64), amounts.shape)
+    rows, width = amounts.shape
+    if width == 0:
+        return np.full(rows, np.nan)
+    return solve_segments(amounts.ravel(), years.ravel(), np.full(rows, width), tol, max_iter)
+
+
+def solve_segments(amounts: np.ndarray, years: np.ndarray, lengths: np.ndarray, tol: float = DEFAULT_TOLERANCE,
+                   max_iter: int = DEFAULT_MAX_ITER) -> np.ndarray:
+    """XIRR of every segment of a flat cash-flow array; segment i is the next ``lengths[i]`` flows
+
+    Flows are not padded, so memory follows the number of cash flows however
+    unevenly they are spread over segments. Each segment keeps a bracket
+    around the root in ln(1 + r): a Newton step is taken when it lands inside
+    the bracket, otherwise the bracket is bisected, so every segment
+    converges. Segments whose NPV does not change sign within the search
+    bounds (no root, e.g. all flows on one date) get NaN.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    years = np.asarray(years, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.intp)
+    rows = len(lengths)
+    result = np.full(rows, np.nan)
+    if rows == 0:
+        return result
+    starts = _starts(lengths)
+
+    lo = np.full(rows, LOG_RATE_MIN)
+    hi = np.full(rows, LOG_RATE_MAX)
+    f_lo, _ = _npv(amounts, years, lo, starts, lengths)
+    f_hi, _ = _npv(amounts, years, hi, starts, lengths)
+    valid = np.logical_and.reduceat(np.isfinite(amounts) & np.isfinite(years), starts)
+    solvable = valid & np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) != np.sign(f_hi))
+    active = np.flatnonzero(solvable)
+
+    flows = np.repeat(solvable, lengths)
+    amounts, years, lengths = amounts[flows], years[flows], lengths[active]
+    starts = _starts(lengths)
+    lo, hi, f_lo = lo[active], hi[active], f_lo[active]
+    x = np.clip(np.full(len(active), np.log1p(0.1)), lo, hi)
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        f, df = _npv(amounts, years, x, starts, lengths)
+        # Narrow the bracket to the side that still contains the sign change
+        same_side = np.sign(f) == np.sign(f_lo)
+        lo, f_lo = np.where(same_side, x, lo), np.where(same_side, f, f_lo)
+        hi = np.where(same_side, hi, x)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = x - f / df
+        inside = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        x_next = np.where(inside, newton, 0.5 * (lo + hi))
+
+        done = (np.abs(x_next - x) <= tol * np.maximum(1.0, np.abs(x_next))) | (f == 0)
+        result[active[done]] = np.expm1(np.where(f[done] == 0, x[done], x_next[done]))
+        keep = ~done
+        if not keep.all():
+            flows = np.repeat(keep, lengths)
+            amounts, years, lengths = amounts[flows], years[flows], lengths[keep]
+            starts = _starts(lengths)
+        active, lo, hi, f_lo, x = active[keep], lo[keep], hi[keep], f_lo[keep], x_next[keep]
+    # Segments still open after max_iter are within the final bracket; take its midpoint
+    result[active] = np.expm1(0.5 * (lo + hi))
+    return result
+
+
+def grouped_xirr(groups: np.ndarray, costs: np.ndarray, holding_years: np.ndarray,
+                 values: np.ndarray) -> np.ndarray:
+    """XIRR per group of lots, each lot bought for ``costs`` ``holding_years`` ago and worth ``values`` now
+
+    Cash flows are measured in years before today: every lot contributes
+    -cost at -holding_years and each group receives its total value at 0.
+    Groups are numbered 0..n-1; the result holds one rate per group.
+    """
+    groups = np.asarray(groups, dtype=np.intp)
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    if n_groups == 0:
+        return np.empty(0)
+    order = np.argsort(groups, kind="stable")
+    sorted_groups = groups[order]
+    counts = np.bincount(sorted_groups, minlength=n_groups)
+    # One segment per group: its lots sorted by group, then the terminal value
+    lengths = counts + 1
+    ends = np.cumsum(lengths) - 1
+    lot_slots = np.arange(len(groups)) + sorted_groups
+
+    amounts = np.zeros(len(groups) + n_groups)
+    years = np.zeros(len(groups) + n_groups)
+    amounts[lot_slots] = -np.asarray(costs, dtype=np.float64)[order]
+    years[lot_slots] = -np.asarray(holding_years, dtype=np.float64)[order]
+    amounts[ends] = np.bincount(groups, weights=np.asarray(values, dtype=np.float64), minlength=n_groups)
+    return solve_segments(amounts, years, lengths)
@@ -0,0 +1,131 @@
+import pytest
+import json
+import shutil
+import subprocess
+import tempfile
+from datetime import date
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.batch_runner import find_portfolios, run_batch
+from utils.holdings_table import HoldingsTable
+from utils.portfolio_manager import PortfolioManager
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def make_portfolio(name, quantity=10.0):
+    return {
+        "name": name,
+        "holdings": HoldingsTable.from_records([
+            {"asset_type": "equity", "asset_id": "RELIANCE", "asset_name": "Reliance Industries Ltd",
+             "quantity": quantity, "purchase_price": 100.0, "current_price": 121.0, "purchase_date": "2023-01-15"},
+            {"asset_type": "mutual_fund", "asset_id": "HDFC123", "asset_name": "HDFC Nifty 50 Index Fund",
+             "quantity": 100.0, "purchase_price": 150.0, "current_price": 180.0, "purchase_date": "2024-01-15"}
+        ])
+    }
+
+
+class TestBatchRunner:
+
+    def setup_method(self):
+        """Setup a directory of portfolios"""
+        self.input_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.input_dir, "out")
+        PortfolioManager(os.path.join(self.input_dir, "alpha.json")).save_portfolio(make_portfolio("Alpha"))
+        PortfolioManager(os.path.join(self.input_dir, "beta.db")).save_portfolio(make_portfolio("Beta", 20.0))
+        with open(os.path.join(self.input_dir, "notes.txt"), "w") as f:
+            f.write("not a portfolio")
+
+    def teardown_method(self):
+        """Clean up test files"""
+        shutil.rmtree(self.input_dir, ignore_errors=True)
+
+    def test_find_portfolios(self):
+        """Test only JSON and SQLite files are picked up"""
+        paths = find_portfolios(self.input_dir)
+        assert [os.path.basename(path) for path in paths] == ["alpha.json", "beta.db"]
+
+    def test_journaled_holdings_are_included(self):
+        """Test holdings still in a JSON portfolio's journal log are part of its report"""
+        path = os.path.join(self.input_dir, "alpha.json")
+        manager = PortfolioManager(path, journal=True)
+        portfolio = manager.load_portfolio()
+        manager.add_holding(portfolio, dict(portfolio["holdings"].to_records()[0], asset_id="INFY"))
+
+        assert [os.path.basename(p) for p in find_portfolios(self.input_dir)] == ["alpha.json", "beta.db"]
+        report = run_batch([path], self.output_dir, formats=["json"], workers=1, as_of=date(2025, 1, 15))
+
+        assert report.holdings == 3
+
+    def test_run_batch_in_process(self):
+        """Test every portfolio gets CSV, JSON and PDF outputs"""
+        report = run_batch(find_portfolios(self.input_dir), self.output_dir, workers=1, as_of=date(2025, 1, 15))
+
+        assert len(report.succeeded) == 2
+        assert report.holdings == 4
+        assert sorted(os.listdir(self.output_dir)) == [
+            "alpha.json.csv", "alpha.json.json", "alpha.json.pdf", "beta.db.csv", "beta.db.json", "beta.db.pdf"
+        ]
+        with open(os.path.join(self.output_dir, "beta.db.json")) as f:
+            summary = json.load(f)
+        assert summary["name"] == "Beta"
+        assert summary["as_of"] == "2025-01-15"
+        assert summary["total_value"] == pytest.approx(20 * 121.0 + 100 * 180.0)
+        assert summary["allocation"]["mutual_fund"] == pytest.approx(18000.0)
+        assert summary["xirr"] is not None
+        with open(os.path.join(self.output_dir, "alpha.json.pdf"), "rb") as f:
+            assert f.read(4) == b"%PDF"
+
+    def test_same_stem_outputs_do_not_clash(self):
+        """Test a.json and a.db in one directory get separate outputs"""
+        PortfolioManager(os.path.join(self.input_dir, "beta.json")).save_portfolio(make_portfolio("Beta JSON"))
+
+        run_batch(find_portfolios(self.input_dir), self.output_dir, formats=["json"], workers=1)
+
+        with open(os.path.join(self.output_dir, "beta.db.json")) as f:
+            assert json.load(f)["name"] == "Beta"
+        with open(os.path.join(self.output_dir, "beta.json.json")) as f:
+            assert json.load(f)["name"] == "Beta JSON"
+
+    def test_rerun_into_the_input_directory(self):
+        """Test summaries written next to the portfolios are not read back as portfolios"""
+        paths = find_portfolios(self.input_dir, output_dir=self.input_dir)
+        run_batch(paths, self.input_dir, formats=["json", "csv"], workers=1)
+
+        assert find_portfolios(self.input_dir, output_dir=self.input_dir) == paths
+        assert os.path.exists(os.path.join(self.input_dir, "alpha.json.json"))
+
+    def test_run_batch_process_pool(self):
+        """Test the pool run reports failures per portfolio without stopping the batch"""
+        broken = os.path.join(self.input_dir, "broken.json")
+        with open(broken, "w") as f:
+            f.write("{not json")
+        paths = find_portfolios(self.input_dir)
+
+        report = run_batch(paths, self.output_dir, formats=["json"], workers=2)
+
+        assert [result.path for result in report.results] == paths
+        assert len(report.succeeded) == 2
+        assert [result.path for result in report.failed] == [broken]
+        assert report.portfolios_per_second > 0
+        assert "portfolios/sec" in report.format()
+
+    def test_cli_does_not_import_streamlit(self):
+        """Test the batch CLI runs end to end without loading Streamlit"""
+        script = (
+            "import runpy, sys; sys.argv = ['batch.py', %r, '-o', %r, '-f', 'csv', '-w', '1', '-q'];"
+            "code = 0\n"
+            "try:\n    runpy.run_path(%r, run_name='__main__')\n"
+            "except SystemExit as e:\n    code = e.code\n"
+            "assert 'streamlit' not in sys.modules\n"
+            "sys.exit(code)"
+        ) % (self.input_dir, self.output_dir, os.path.join(ROOT, "batch.py"))
+        completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=120)
+
+        assert completed.returncode == 0, completed.stderr
+        assert "Portfolios: 2 processed, 0 failed" in completed.stdout
+        assert os.path.exists(os.path.join(self.output_dir, "alpha.json.csv"))
@@ -0,0 +1,68 @@
+import pytest
+import json
+import tempfile
+import sys
+import os
+
+# Add src and benchmarks to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from run_benchmarks import compare, load_baseline, run_benchmarks, save_baseline, synthetic_frame
+from utils.portfolio_manager import PortfolioManager
+
+
+class TestBenchmarks:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.baseline_path = os.path.join(tempfile.mkdtemp(), "baseline.json")
+
+    def teardown_method(self):
+        """Clean up test files"""
+        if os.path.exists(self.baseline_path):
+            os.remove(self.baseline_path)
+
+    def test_synthetic_frame_is_valid(self):
+        """Test synthetic holdings pass CSV validation"""
+        df = synthetic_frame(500)
+        valid, message = PortfolioManager("test_portfolio.json").validate_csv_data(df)
+        assert len(df) == 500
+        assert valid, message
+
+    def test_run_benchmarks_records_time_and_memory(self):
+        """Test every benchmark reports time and peak memory at a small size"""
+        results = run_benchmarks([10], repeat=1)
+        assert "compute_metrics@10" in results
+        assert "generate_pdf_report@10" in results
+        for result in results.values():
+            assert result["seconds"] > 0
+            assert result["peak_mb"] >= 0
+
+    def test_pdf_row_limit(self):
+        """Test the PDF benchmark is skipped above its row limit"""
+        results = run_benchmarks([10], names=["generate_pdf_report"], repeat=1, pdf_max_rows=5)
+        assert results == {}
+
+    def test_compare_flags_regressions(self):
+        """Test slower or hungrier results are flagged and noise is not"""
+        baseline = {
+            "a@10": {"seconds": 1.0, "peak_mb": 100.0},
+            "b@10": {"seconds": 0.001, "peak_mb": 0.1},
+        }
+        results = {
+            "a@10": {"seconds": 1.5, "peak_mb": 200.0},
+            "b@10": {"seconds": 0.002, "peak_mb": 0.5},
+            "c@10": {"seconds": 9.0, "peak_mb": 900.0},
+        }
+        regressions = compare(results, baseline)
+        assert len(regressions) == 2
+        assert all(message.startswith("a@10") for message in regressions)
+
+    def test_save_baseline_merges(self):
+        """Test saving keeps baseline entries that were not re-run"""
+        save_baseline(self.baseline_path, {"a@10": {"seconds": 1.0, "peak_mb": 1.0}})
+        save_baseline(self.baseline_path, {"b@10": {"seconds": 2.0, "peak_mb": 2.0}})
+        assert set(load_baseline(self.baseline_path)) == {"a@10", "b@10"}
+        with open(self.baseline_path) as f:
+            assert "python" in json.load(f)
@@ -0,0 +1,50 @@
+import pytest
+import sys
+import os
+import pandas as pd
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import matplotlib.pyplot as plt
+
+from utils.chart_service import render_allocation_chart, clear_chart_cache, chart_cache_info
+
+
+class TestChartService:
+
+    def setup_method(self):
+        """Setup test data"""
+        clear_chart_cache()
+        self.allocation = pd.Series({"equity": 7500.0, "mutual_fund": 2500.0})
+
+    def test_render_returns_png(self):
+        """Test the chart is rendered as PNG bytes"""
+        chart = render_allocation_chart(self.allocation, 10000.0)
+        assert chart.format == "png"
+        assert chart.image.startswith(b"\x89PNG")
+
+    def test_legend_entries(self):
+        """Test legend carries values, percentages and hex wedge colours"""
+        chart = render_allocation_chart(self.allocation)
+        assert [entry.asset_type for entry in chart.legend] == ["equity", "mutual_fund"]
+        assert chart.legend[0].percentage == pytest.approx(75.0)
+        assert all(entry.color.startswith("#") and len(entry.color) == 7 for entry in chart.legend)
+
+    def test_same_allocation_is_cached(self):
+        """Test an identical allocation vector reuses the rendered image"""
+        first = render_allocation_chart(self.allocation, 10000.0)
+        second = render_allocation_chart(self.allocation.copy(), 10000.0)
+        assert second is first
+        assert chart_cache_info().hits == 1
+
+        changed = render_allocation_chart(pd.Series({"equity": 8000.0, "mutual_fund": 2500.0}))
+        assert changed is not first
+        assert chart_cache_info().misses == 2
+
+    def test_no_pyplot_figures_leak(self):
+        """Test rendering does not register figures with pyplot"""
+        before = len(plt.get_fignums())
+        for i in range(5):
+            render_allocation_chart(pd.Series({"equity": 1000.0 + i}))
+        assert len(plt.get_fignums()) == before
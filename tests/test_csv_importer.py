@@ -0,0 +1,92 @@
+import pytest
+import pandas as pd
+from io import StringIO, BytesIO
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils import csv_importer
+from utils.csv_importer import import_csv
+
+HEADER = "asset_type,asset_id,asset_name,quantity,purchase_price,purchase_date\n"
+
+
+class TestCsvImporter:
+
+    def test_import_valid_rows(self):
+        """Test a clean file is imported completely"""
+        csv_text = HEADER + (
+            "equity,RELIANCE,Reliance Industries Ltd,10,2000.0,2023-01-15\n"
+            "mutual_fund,HDFC123,HDFC Nifty 50 Index Fund,100,150.0,2023/02/20\n"
+        )
+
+        result = import_csv(StringIO(csv_text))
+
+        assert result.ok
+        assert result.accepted == 2
+        assert result.rejected == 0
+        records = result.holdings.to_records()
+        assert records[1]["purchase_date"] == "2023-02-20"
+        assert records[0]["current_price"] == 2000.0
+        assert not result.has_prices
+
+    def test_bad_rows_are_rejected_with_row_and_reason(self):
+        """Test invalid rows go to the reject report instead of failing the import"""
+        csv_text = HEADER + (
+            "equity,RELIANCE,Reliance Industries Ltd,10,2000.0,2023-01-15\n"
+            "equity,TCS,Tata Consultancy Services,abc,3200.0,2023-03-10\n"
+            "equity,INFY,Infosys,-5,1500.0,2023-04-01\n"
+            "equity,WIPRO,Wipro,5,400.0,not-a-date\n"
+        )
+
+        result = import_csv(StringIO(csv_text))
+
+        assert result.ok
+        assert result.accepted == 1
+        assert result.rejected == 3
+        rejects = pd.read_csv(StringIO(result.rejects_csv))
+        assert list(rejects["row"]) == [2, 3, 4]
+        assert list(rejects["asset_id"]) == ["TCS", "INFY", "WIPRO"]
+        assert "Invalid numeric data in quantity" in rejects["reason"][0]
+        assert "Quantity must be positive" in rejects["reason"][1]
+        assert "Invalid date format in purchase_date" in rejects["reason"][2]
+
+    def test_row_numbers_span_chunks(self):
+        """Test small chunks keep file row numbers and report progress per chunk"""
+        lines = [f"equity,ID{i},Name {i},{-1 if i == 7 else 1},10.0,2023-01-01\n" for i in range(10)]
+        source = BytesIO((HEADER + "".join(lines)).encode())
+        source.size = len(source.getvalue())
+        progress = []
+
+        result = import_csv(source, chunksize=3, progress_callback=lambda fraction, rows: progress.append(rows))
+
+        assert result.accepted == 9
+        assert pd.read_csv(StringIO(result.rejects_csv))["row"].tolist() == [8]
+        assert progress == [3, 6, 9, 10]
+
+    def test_large_reject_report_spills_to_disk(self, monkeypatch):
+        """Test the reject CSV leaves memory once it outgrows the spool size"""
+        monkeypatch.setattr(csv_importer, "REJECTS_SPOOL_BYTES", 256)
+        lines = [f"equity,ID{i},Name {i},-1,10.0,2023-01-01\n" for i in range(50)]
+
+        result = import_csv(StringIO(HEADER + "".join(lines)), chunksize=10)
+
+        assert result.rejected == 50
+        assert result.rejects_file._rolled
+        assert pd.read_csv(StringIO(result.rejects_csv))["row"].tolist() == list(range(1, 51))
+        assert import_csv(StringIO(HEADER + lines[0].replace("-1", "1"))).rejects_file is None
+
+    def test_missing_columns_is_an_error(self):
+        """Test a file without required columns fails as a whole"""
+        result = import_csv(StringIO("asset_type,asset_name\nequity,Reliance\n"))
+
+        assert not result.ok
+        assert "Missing required columns" in result.error
+
+    def test_empty_file_is_an_error(self):
+        """Test an empty upload reports an error"""
+        result = import_csv(StringIO(""))
+
+        assert not result.ok
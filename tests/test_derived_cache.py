@@ -0,0 +1,108 @@
+import pytest
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.derived_cache import DerivedDataCache, get_derived_cache
+from utils.holdings_table import HoldingsTable
+from utils.portfolio_manager import PortfolioManager
+from utils.export_manager import ExportManager
+
+
+def make_portfolio(*asset_ids):
+    return {
+        "name": "Cache Test",
+        "holdings": HoldingsTable.from_records([
+            {"asset_type": "equity", "asset_id": asset_id, "asset_name": f"{asset_id} Ltd",
+             "quantity": 10.0, "purchase_price": 100.0, "current_price": 120.0, "purchase_date": "2023-01-15"}
+            for asset_id in asset_ids
+        ])
+    }
+
+
+class TestDerivedDataCache:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.cache = DerivedDataCache(max_entries=2)
+        self.portfolio_manager = PortfolioManager("test_cache_portfolio.json")
+        self.portfolio = make_portfolio("AAA", "BBB")
+
+    def test_computes_once_per_version(self):
+        """Test repeated reads reuse the cached value"""
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+
+        assert self.cache.get(self.portfolio, "payload", compute) == 1
+        assert self.cache.get(self.portfolio, "payload", compute) == 1
+        assert len(calls) == 1
+        assert self.cache.hits == 1
+
+    def test_mutation_changes_key(self):
+        """Test adding a holding makes the cache recompute"""
+        metrics_before = self.cache.metrics(self.portfolio, self.portfolio_manager)
+        self.portfolio["holdings"].append(dict(self.portfolio["holdings"].to_records()[0], asset_id="CCC"))
+
+        metrics_after = self.cache.metrics(self.portfolio, self.portfolio_manager)
+
+        assert len(metrics_before) == 2
+        assert len(metrics_after) == 3
+
+    def test_reloaded_table_is_a_new_key(self):
+        """Test a freshly loaded table never hits entries of a previous table"""
+        self.cache.get(self.portfolio, "payload", lambda: "old")
+        reloaded = make_portfolio("AAA", "BBB")
+
+        assert self.cache.get(reloaded, "payload", lambda: "new") == "new"
+
+    def test_explicit_invalidation(self):
+        """Test invalidate drops cached entries"""
+        self.cache.get(self.portfolio, "payload", lambda: "old")
+        self.cache.invalidate(self.portfolio)
+
+        assert self.cache.get(self.portfolio, "payload", lambda: "new") == "new"
+        self.cache.invalidate()
+        assert len(self.cache) == 0
+
+    def test_bounded_size(self):
+        """Test the least recently used portfolio state is evicted"""
+        portfolios = [make_portfolio(f"ID{i}") for i in range(3)]
+        for portfolio in portfolios:
+            self.cache.get(portfolio, "payload", lambda: "value")
+
+        assert len(self.cache) == 2
+        assert self.cache.get(portfolios[0], "payload", lambda: "recomputed") == "recomputed"
+
+    def test_shared_payloads(self):
+        """Test allocation, CAGR table and CSV export come from the cache"""
+        allocation = self.cache.allocation(self.portfolio, self.portfolio_manager)
+        cagr_table = self.cache.cagr_table(self.portfolio, self.portfolio_manager)
+        csv_data = self.cache.csv_export(self.portfolio, ExportManager())
+
+        assert allocation["equity"] == pytest.approx(2400.0)
+        assert list(cagr_table.columns) == ["asset_name", "asset_type", "cagr", "xirr", "gain_loss"]
+        assert "AAA" in csv_data
+        assert self.cache.csv_export(self.portfolio, None) is csv_data
+
+    def test_positions_and_tax_report(self):
+        """Test positions and the trades report are cached per portfolio state"""
+        positions = self.cache.positions(self.portfolio)
+        assert positions["asset_id"].tolist() == ["AAA", "BBB"]
+        assert positions["value_display"].tolist() == ["₹1,200.00", "₹1,200.00"]
+        assert self.cache.positions(self.portfolio) is positions
+
+        trades_csv = b"date,action,asset_id,quantity,price\n2024-01-10,sell,AAA,4,150\n"
+        realized, unrealized = self.cache.tax_report(self.portfolio, trades_csv)
+        assert realized["gain"].tolist() == [pytest.approx(200.0)]
+        assert unrealized["quantity"].tolist() == [6.0, 10.0]
+        assert self.cache.tax_report(self.portfolio, trades_csv)[0] is realized
+        with pytest.raises(ValueError, match="only 0 held"):
+            self.cache.tax_report(self.portfolio, trades_csv, include_holdings=False)
+
+    def test_get_derived_cache_from_session_state(self):
+        """Test the session helper creates the cache once"""
+        session_state = {}
+
+        assert get_derived_cache(session_state) is get_derived_cache(session_state)
@@ -1,11 +1,12 @@
 import pytest
 import sys
 import os
+from io import BytesIO
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from utils.export_manager import ExportManager
+from utils.export_manager import ExportManager, _FlowableStream
 
 
 class TestExportManager:
@@ -47,6 +48,15 @@ class TestExportManager:
         assert "RELIANCE" in csv_data
         assert "HDFC123" in csv_data
     
+    def test_export_to_csv_formatted(self):
+        """Test formatted CSV export carries display strings with Indian digit grouping"""
+        self.sample_portfolio["holdings"][0]["quantity"] = 1000.0
+        csv_data = self.export_manager.export_to_csv(self.sample_portfolio, formatted=True)
+        
+        assert "value,gain_loss" in csv_data.splitlines()[0]
+        assert "₹25,00,000.00" in csv_data
+        assert "▲ ₹5,00,000.00" in csv_data
+    
     def test_export_to_csv_empty_portfolio(self):
         """Test CSV export with empty portfolio"""
         empty_portfolio = {"name": "Empty Portfolio", "holdings": []}
@@ -71,4 +81,49 @@ class TestExportManager:
         
         assert pdf_data is not None
         assert isinstance(pdf_data, bytes)
-        assert pdf_data.startswith(b'%PDF')
\ No newline at end of file
+        assert pdf_data.startswith(b'%PDF')
+    
+    def test_write_pdf_report_to_file_sink(self, tmp_path):
+        """Test PDF is written straight into a file-like sink"""
+        path = tmp_path / "test_report.pdf"
+        with open(path, "wb") as sink:
+            self.export_manager.write_pdf_report(self.sample_portfolio, sink)
+        with open(path, "rb") as f:
+            assert f.read(4) == b'%PDF'
+    
+    def test_large_report_is_paginated(self):
+        """Test large mode splits holdings into sectioned page-sized tables"""
+        holdings = [
+            {
+                "asset_type": "equity" if i % 3 else "mutual_fund",
+                "asset_id": f"ASSET{i}",
+                "asset_name": f"Asset {i}",
+                "quantity": 1,
+                "purchase_price": 100.0,
+                "current_price": 110.0,
+                "purchase_date": "2023-01-15"
+            }
+            for i in range(250)
+        ]
+        portfolio = {"name": "Large Portfolio", "holdings": holdings}
+        
+        sink = BytesIO()
+        self.export_manager.write_pdf_report(portfolio, sink, include_chart=False, large=True, page_rows=40)
+        large_pdf = sink.getvalue()
+        
+        assert large_pdf.startswith(b'%PDF')
+        # At most page_rows holdings per table, one table per page
+        assert large_pdf.count(b'/Type /Page\n') >= 250 // 40
+    
+    def test_flowable_stream_preserves_order(self):
+        """Test lazily pulled flowables keep their order behind eager ones"""
+        stream = _FlowableStream(lookahead=2)
+        stream.append("title")
+        stream.extend_lazily(iter(["a", "b", "c"]))
+        stream.extend_lazily(iter(["d"]))
+        
+        consumed = []
+        while len(stream):
+            consumed.append(stream[0])
+            del stream[0]
+        assert consumed == ["title", "a", "b", "c", "d"]
@@ -0,0 +1,99 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.formatting import (format_amount, format_currency, format_gain_loss, format_metrics, format_number,
+                              format_percent, formatted_holdings, group_indian)
+from utils.holdings_table import HoldingsTable
+
+
+class TestFormatting:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.holdings = HoldingsTable.from_records([
+            {"asset_type": "equity", "asset_id": "RELIANCE", "asset_name": "Reliance Industries Ltd",
+             "quantity": 1000.0, "purchase_price": 2000.0, "current_price": 2500.5, "purchase_date": "2023-01-15"},
+            {"asset_type": "equity", "asset_id": "TCS", "asset_name": "Tata Consultancy Services",
+             "quantity": 5.0, "purchase_price": 3200.0, "current_price": 3000.0, "purchase_date": "2023-03-10"},
+        ])
+
+    def test_group_indian(self):
+        """Test the grouping regex puts commas after the last three digits and then every two"""
+        assert group_indian("999") == "999"
+        assert group_indian("1000") == "1,000"
+        assert group_indian("1234567") == "12,34,567"
+        assert group_indian("1000000000") == "1,00,00,00,000"
+
+    def test_format_currency(self):
+        """Test currency strings for positive, negative, zero and missing amounts"""
+        values = np.array([0.0, 12.5, 1234567.891, -100.0, -0.001, np.nan])
+
+        assert format_currency(values).tolist() == [
+            "₹0.00", "₹12.50", "₹12,34,567.89", "-₹100.00", "₹0.00", "N/A"
+        ]
+        assert format_currency(np.array([1e7]), symbol="Rs.", decimals=0).tolist() == ["Rs.1,00,00,000"]
+        assert format_currency(np.array([])).tolist() == []
+
+    def test_format_currency_matches_scalar(self):
+        """Test the vectorized column formatter agrees with the regex-based scalar one"""
+        rng = np.random.default_rng(0)
+        values = np.concatenate([rng.uniform(-1e10, 1e10, 500), rng.uniform(-1000, 1000, 500)])
+
+        assert format_currency(values).tolist() == [format_amount(value) for value in values]
+
+    def test_huge_and_non_finite_values(self):
+        """Test values too large for integer rounding keep their digits and sign"""
+        assert format_currency(np.array([1e17, -3e17])).tolist() == [
+            "₹1,00,00,00,00,00,00,00,000.00", "-₹3,00,00,00,00,00,00,00,000.00"
+        ]
+        huge = 1.2e60
+        assert format_percent(np.array([huge])).tolist() == [f"{huge:.2f}%"]
+        assert format_currency(np.array([-1e300])).tolist() == [format_amount(-1e300)]
+        assert format_gain_loss(np.array([np.inf, -np.inf, np.nan, -5e20])).tolist() == [
+            "N/A", "N/A", "N/A", "▼ " + format_amount(5e20)
+        ]
+
+    def test_rounding_ties_match_python(self):
+        """Test values whose scaled product lands on .5 round like '%.2f'"""
+        values = np.array([0.125, 0.375, 2.675, 1.005, 0.045, 1234.565, 0.005, 1e-9])
+
+        assert format_number(values).tolist() == [f"{value:.2f}" for value in values]
+        assert format_currency(-values).tolist() == [format_amount(-value) for value in values]
+
+    def test_format_gain_loss(self):
+        """Test gains get an up arrow, losses a down arrow and zero none"""
+        values = pd.Series([5000.0, -1500.25, 0.0])
+
+        assert format_gain_loss(values).tolist() == ["▲ ₹5,000.00", "▼ ₹1,500.25", "₹0.00"]
+
+    def test_format_percent_and_number(self):
+        """Test percentage labels and plain numbers are not grouped"""
+        assert format_percent(np.array([12.345, -3.0, np.nan])).tolist() == ["12.35%", "-3.00%", "N/A"]
+        assert format_number(np.array([1234.5, 10.0])).tolist() == ["1234.50", "10.00"]
+
+    def test_format_metrics_columns(self):
+        """Test display columns are added for the metric columns present"""
+        df = pd.DataFrame({"value": [1500.0], "gain_loss": [-20.0], "cagr": [7.5]}, index=[3])
+
+        display = format_metrics(df)
+
+        assert list(display.columns) == ["value_display", "gain_loss_display", "cagr_display"]
+        assert display.loc[3].tolist() == ["₹1,500.00", "▼ ₹20.00", "7.50%"]
+
+    def test_formatted_holdings_cached_per_version(self):
+        """Test holdings are formatted once per table version and symbol"""
+        formatted = formatted_holdings(self.holdings)
+
+        assert formatted["value_display"].tolist() == ["₹25,00,500.00", "₹15,000.00"]
+        assert formatted["gain_loss_display"].tolist() == ["▲ ₹5,00,500.00", "▼ ₹1,000.00"]
+        assert formatted_holdings(self.holdings) is formatted
+        assert formatted_holdings(self.holdings, "Rs.")["value_display"].iloc[1] == "Rs.15,000.00"
+
+        self.holdings.set_current_prices(np.array([2500.5, 3100.0]))
+        assert formatted_holdings(self.holdings)["value_display"].iloc[1] == "₹15,500.00"
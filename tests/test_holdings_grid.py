@@ -0,0 +1,86 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.holdings_grid import HoldingsGrid
+from utils.holdings_table import HoldingsTable
+
+
+class TestHoldingsGrid:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.table = HoldingsTable.from_records([
+            {"asset_type": "Equity", "asset_id": "RELIANCE", "asset_name": "Reliance Industries Ltd",
+             "quantity": 10.0, "purchase_price": 2000.0, "current_price": 2500.0, "purchase_date": "2023-01-15"},
+            {"asset_type": "Mutual Fund", "asset_id": "HDFC123", "asset_name": "HDFC Nifty 50 Index Fund",
+             "quantity": 100.0, "purchase_price": 150.0, "current_price": 180.0, "purchase_date": None},
+            {"asset_type": "Equity", "asset_id": "HDFCBANK", "asset_name": "HDFC Bank Ltd",
+             "quantity": 5.0, "purchase_price": 1600.0, "current_price": 1500.0, "purchase_date": "2022-06-30"},
+            {"asset_type": "Equity", "asset_id": "TCS", "asset_name": "Tata Consultancy Services",
+             "quantity": 5.0, "purchase_price": 3200.0, "current_price": 3000.0, "purchase_date": "2023-03-10"},
+        ])
+        self.grid = HoldingsGrid(self.table.to_frame())
+
+    def _ids(self, **query):
+        return self.grid.frame["asset_id"].take(self.grid.rows(**query)).astype(str).tolist()
+
+    def test_unsorted_keeps_frame_order(self):
+        """Test rows come back in entry order without a sort column"""
+        assert self._ids() == ["RELIANCE", "HDFC123", "HDFCBANK", "TCS"]
+
+    def test_sort_numeric_and_categorical(self):
+        """Test numeric and interned string columns sort both ways"""
+        assert self._ids(sort_by="quantity", ascending=False) == ["HDFC123", "RELIANCE", "HDFCBANK", "TCS"]
+        assert self._ids(sort_by="asset_id") == ["HDFC123", "HDFCBANK", "RELIANCE", "TCS"]
+        assert self._ids(sort_by="asset_id", ascending=False) == ["TCS", "RELIANCE", "HDFCBANK", "HDFC123"]
+
+    def test_missing_dates_sort_last(self):
+        """Test holdings without a purchase date sort last in either direction"""
+        assert self._ids(sort_by="purchase_date") == ["HDFCBANK", "RELIANCE", "TCS", "HDFC123"]
+        assert self._ids(sort_by="purchase_date", ascending=False) == ["TCS", "RELIANCE", "HDFCBANK", "HDFC123"]
+
+    def test_filter_and_search(self):
+        """Test asset_type filtering and case-insensitive search over id and name"""
+        assert self._ids(asset_type="Mutual Fund") == ["HDFC123"]
+        assert self._ids(search="hdfc") == ["HDFC123", "HDFCBANK"]
+        assert self._ids(search="  bank ") == ["HDFCBANK"]
+        assert self._ids(search="hdfc", asset_type="Equity", sort_by="quantity") == ["HDFCBANK"]
+        assert self._ids(search="nothing") == []
+
+    def test_page_slices_and_clamps(self):
+        """Test pages hold page_size rows and out-of-range pages are clamped"""
+        page = self.grid.page(2, 3, sort_by="asset_id")
+
+        assert (page.total, page.page, page.pages, page.start) == (4, 2, 2, 3)
+        assert page.rows["asset_id"].astype(str).tolist() == ["TCS"]
+        assert self.grid.page(9, 3).page == 2
+        assert self.grid.page(1, 3, search="nothing").pages == 1
+
+    def test_sort_order_and_queries_are_reused(self):
+        """Test sort indexes and query results are computed once"""
+        order = self.grid.sort_order("current_price")
+        assert self.grid.sort_order("current_price") is order
+        rows = self.grid.rows(sort_by="current_price", search="hdfc")
+        assert self.grid.rows(sort_by="current_price", search="HDFC") is rows
+
+    def test_large_frame_matches_pandas_sort(self):
+        """Test filtered, sorted positions agree with a pandas sort on a larger frame"""
+        rng = np.random.default_rng(0)
+        n = 5000
+        frame = pd.DataFrame({
+            "asset_type": pd.Categorical(rng.choice(["Equity", "ETF", "Bond"], n)),
+            "asset_id": pd.Categorical([f"ID{i % 700}" for i in range(n)]),
+            "asset_name": pd.Categorical([f"Asset {i % 700}" for i in range(n)]),
+            "value": rng.uniform(0, 1000, n),
+        })
+        grid = HoldingsGrid(frame)
+
+        positions = grid.rows(sort_by="value", ascending=False, asset_type="ETF", search="id1")
+        expected = frame[(frame["asset_type"] == "ETF") & frame["asset_id"].astype(str).str.contains("ID1")]
+        assert positions.tolist() == expected.sort_values("value", ascending=False, kind="stable").index.tolist()
@@ -0,0 +1,271 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.holdings_table import HoldingsTable, holdings_frame
+
+
+class TestHoldingsTable:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.records = [
+            {
+                "asset_type": "equity",
+                "asset_id": "RELIANCE",
+                "asset_name": "Reliance Industries Ltd",
+                "quantity": 10.0,
+                "purchase_price": 2000.0,
+                "current_price": 2500.0,
+                "purchase_date": "2023-01-15"
+            },
+            {
+                "asset_type": "mutual_fund",
+                "asset_id": "HDFC123",
+                "asset_name": "HDFC Nifty 50 Index Fund",
+                "quantity": 100.0,
+                "purchase_price": 150.0,
+                "current_price": 180.0,
+                "purchase_date": "2023-02-20"
+            },
+            {
+                "asset_type": "equity",
+                "asset_id": "RELIANCE",
+                "asset_name": "Reliance Industries Ltd",
+                "quantity": 5.0,
+                "purchase_price": 2200.0,
+                "current_price": 2500.0,
+                "purchase_date": "2023-06-01"
+            }
+        ]
+        self.table = HoldingsTable.from_records(self.records)
+
+    def test_round_trip_records(self):
+        """Test records survive conversion to and from the columnar store"""
+        assert len(self.table) == 3
+        assert self.table.to_records() == self.records
+
+    def test_typed_columns(self):
+        """Test columns use float64, datetime64 and categorical dtypes"""
+        df = self.table.to_frame()
+
+        assert df["quantity"].dtype == np.float64
+        assert df["current_price"].dtype == np.float64
+        assert pd.api.types.is_datetime64_any_dtype(df["purchase_date"])
+        assert isinstance(df["asset_type"].dtype, pd.CategoricalDtype)
+        # Repeated strings are interned once
+        assert list(self.table.categories("asset_id")) == ["HDFC123", "RELIANCE"]
+
+    def test_to_frame_is_zero_copy(self):
+        """Test numeric frame columns share memory with the table buffers"""
+        df = self.table.to_frame()
+
+        assert np.shares_memory(df["quantity"].to_numpy(), self.table.column("quantity"))
+
+    def test_append_and_totals(self):
+        """Test appending a holding updates length, version and totals"""
+        version = self.table.version
+        self.table.append({
+            "asset_type": "insurance",
+            "asset_id": "LIC001",
+            "asset_name": "LIC Term Plan",
+            "quantity": 1,
+            "purchase_price": 50000.0,
+            "current_price": 50000.0,
+            "purchase_date": "2023-01-01"
+        })
+
+        assert len(self.table) == 4
+        assert self.table.version > version
+        assert self.table.total_value() == pytest.approx(10 * 2500 + 100 * 180 + 5 * 2500 + 50000)
+        assert self.table.total_investment() == pytest.approx(10 * 2000 + 100 * 150 + 5 * 2200 + 50000)
+
+    def test_append_grows_capacity(self):
+        """Test appends beyond the initial capacity keep earlier rows"""
+        table = HoldingsTable(capacity=1)
+        for i in range(50):
+            table.append(dict(self.records[0], asset_id=f"ID{i}", quantity=float(i + 1)))
+
+        assert len(table) == 50
+        assert list(table.column("quantity")) == [float(i + 1) for i in range(50)]
+
+    def test_remove_by_key(self):
+        """Test removing by asset_id and by asset_id plus purchase_date"""
+        assert self.table.remove("RELIANCE", "2023-06-01") == 1
+        assert len(self.table) == 2
+        assert self.table.remove("RELIANCE") == 1
+        assert [h["asset_id"] for h in self.table] == ["HDFC123"]
+        assert self.table.remove("UNKNOWN") == 0
+
+    def test_remove_keeps_earlier_frames_intact(self):
+        """Test frames taken before a removal are not modified by it"""
+        df = self.table.to_frame()
+        self.table.remove_at(0)
+
+        assert list(df["asset_id"]) == ["RELIANCE", "HDFC123", "RELIANCE"]
+        assert list(self.table.to_frame()["asset_id"]) == ["HDFC123", "RELIANCE"]
+
+    def test_missing_purchase_date(self):
+        """Test holdings without a purchase date store NaT"""
+        record = dict(self.records[0])
+        del record["purchase_date"]
+        table = HoldingsTable.from_records([record])
+
+        assert table.to_records()[0]["purchase_date"] is None
+
+    def test_holdings_frame_accepts_lists(self):
+        """Test holdings_frame handles both plain lists and tables"""
+        assert len(holdings_frame(self.records)) == 3
+        assert len(holdings_frame(self.table)) == 3
+
+    def test_content_hash_tracks_contents(self):
+        """Test content hash is equal for equal rows and changes on mutation"""
+        same = HoldingsTable(capacity=64)
+        # Interning "mutual_fund" first gives different codes for the same contents
+        same.append(self.records[1])
+        same.remove("HDFC123")
+        for record in self.records:
+            same.append(record)
+
+        assert same.content_hash() == self.table.content_hash()
+
+        before = self.table.content_hash()
+        self.table.set_current_prices(np.array([2600.0, 180.0, 2500.0]))
+        assert self.table.content_hash() != before
+
+    def _assert_aggregates_match(self, table):
+        df = table.to_frame()
+        value = df["quantity"] * df["current_price"]
+        investment = df["quantity"] * df["purchase_price"]
+        assert table.total_value() == pytest.approx(value.sum())
+        assert table.total_investment() == pytest.approx(investment.sum())
+        by_type = table.totals_by_type()
+        expected = pd.DataFrame({
+            "holdings": df.groupby("asset_type", observed=True).size(),
+            "value": value.groupby(df["asset_type"], observed=True).sum(),
+        })
+        assert list(by_type.index) == sorted(df["asset_type"].astype(str).unique())
+        assert by_type["holdings"].tolist() == expected.loc[by_type.index, "holdings"].tolist()
+        assert by_type["value"].tolist() == pytest.approx(expected.loc[by_type.index, "value"].tolist())
+
+    def test_aggregates_follow_mutations(self):
+        """Test running aggregates match a full recompute after every kind of mutation"""
+        rng = np.random.default_rng(1)
+        types = np.array(["equity", "bond", "etf", "mutual_fund"])
+        n = 200
+        table = HoldingsTable.from_frame(pd.DataFrame({
+            "asset_type": types[rng.integers(0, 4, n)],
+            "asset_id": [f"ID{i}" for i in range(n)],
+            "asset_name": [f"Asset {i}" for i in range(n)],
+            "quantity": rng.uniform(1, 100, n),
+            "purchase_price": rng.uniform(10, 1000, n),
+            "current_price": rng.uniform(10, 1000, n),
+            "purchase_date": "2023-01-01",
+        }))
+        self._assert_aggregates_match(table)
+
+        table.append(dict(self.records[0], asset_type="insurance", asset_id="NEW"))
+        self._assert_aggregates_match(table)
+        table.remove_at(rng.choice(len(table), 50, replace=False))
+        self._assert_aggregates_match(table)
+        table.remove("NEW")
+        self._assert_aggregates_match(table)
+        prices = table.column("current_price").copy()
+        prices[::3] *= 1.1
+        table.set_current_prices(prices)
+        self._assert_aggregates_match(table)
+
+        reloaded = HoldingsTable.from_columns(*table.to_columns())
+        self._assert_aggregates_match(reloaded)
+
+    def test_aggregates_empty_after_removal(self):
+        """Test removing every holding leaves zero totals and no type buckets"""
+        self.table.remove_at(range(len(self.table)))
+
+        assert self.table.total_value() == 0.0
+        assert self.table.total_investment() == 0.0
+        assert self.table.totals_by_type().empty
+        assert self.table.allocation_by_type().empty
+
+    def test_upsert_updates_changed_rows_and_appends_new(self):
+        """Test upsert matches on asset_id and purchase date and only applies the diff"""
+        frame_before = self.table.to_frame()
+        incoming = pd.DataFrame([
+            dict(self.records[0], current_price=9999.0),           # unchanged apart from price
+            dict(self.records[1], quantity=120.0),                 # updated
+            dict(self.records[2], purchase_date="2023-07-01"),     # new key
+        ]).drop(columns="current_price")
+
+        result = self.table.upsert(incoming)
+
+        assert (result.added, result.updated, result.unchanged) == (1, 1, 1)
+        assert len(self.table) == 4
+        records = self.table.to_records()
+        assert records[1]["quantity"] == 120.0
+        assert records[1]["current_price"] == 180.0
+        assert records[3]["purchase_date"] == "2023-07-01"
+        assert [h["asset_id"] for h in result.changes] == ["HDFC123", "RELIANCE"]
+        assert frame_before["quantity"].tolist() == [10.0, 100.0, 5.0]
+        self._assert_aggregates_match(self.table)
+
+    def test_upsert_pairs_repeated_keys_by_occurrence(self):
+        """Test lots bought on the same day are matched in order, extra ones appended"""
+        table = HoldingsTable.from_records([self.records[0], dict(self.records[0], quantity=20.0)])
+        incoming = pd.DataFrame([self.records[0], dict(self.records[0], quantity=25.0),
+                                 dict(self.records[0], quantity=30.0)])
+
+        result = table.upsert(incoming)
+
+        assert (result.added, result.updated, result.unchanged) == (1, 1, 1)
+        assert result.occurrence.tolist() == [1, 2]
+        assert table.column("quantity").tolist() == [10.0, 25.0, 30.0]
+        assert table.upsert(incoming).changes.to_records() == []
+
+    def test_upsert_copies_only_changed_columns(self):
+        """Test an update copies the columns it changes once and patches the others in place"""
+        frame_before = self.table.to_frame()
+        prices = self.table.column("purchase_price")
+
+        self.table.upsert(pd.DataFrame([dict(self.records[1], quantity=120.0)]).drop(columns="current_price"))
+
+        assert frame_before["quantity"].tolist() == [10.0, 100.0, 5.0]
+        assert np.shares_memory(self.table.column("purchase_price"), prices)
+        # Nothing outside holds the new quantity buffer, so the next update writes into it
+        quantity = self.table._floats["quantity"]
+        assert not np.shares_memory(quantity, frame_before["quantity"].to_numpy())
+        self.table.upsert(pd.DataFrame([dict(self.records[1], quantity=130.0)]).drop(columns="current_price"))
+        assert self.table._floats["quantity"] is quantity
+        assert self.table.to_records()[1]["quantity"] == 130.0
+        self._assert_aggregates_match(self.table)
+
+    def test_key_lookup_is_extended_by_appends(self):
+        """Test appended rows join the key lookup, with occurrences after the existing lots"""
+        table = HoldingsTable.from_records([self.records[0]])
+        table.upsert(pd.DataFrame([self.records[0], dict(self.records[0], quantity=20.0)]))
+        lookup = table._key_index
+
+        table.upsert(pd.DataFrame([self.records[0], dict(self.records[0], quantity=25.0),
+                                   self.records[1], dict(self.records[1], quantity=50.0)]))
+        result = table.upsert(pd.DataFrame([self.records[0], dict(self.records[0], quantity=25.0),
+                                            self.records[1], dict(self.records[1], quantity=60.0)]))
+
+        assert table._key_index is lookup
+        assert (result.added, result.updated, result.unchanged) == (0, 1, 3)
+        assert table.column("quantity").tolist() == [10.0, 25.0, 100.0, 60.0]
+
+    def test_snapshot_survives_changes(self):
+        """Test a snapshot keeps its rows while the table is updated, appended to and shrunk"""
+        snapshot = self.table.snapshot()
+
+        self.table.upsert(pd.DataFrame([dict(self.records[1], quantity=120.0, asset_name="Renamed"),
+                                        dict(self.records[2], purchase_date="2024-01-01")]))
+        self.table.remove("RELIANCE")
+
+        assert snapshot.to_records() == HoldingsTable.from_records(self.records).to_records()
+        assert snapshot.token != self.table.token
+        self._assert_aggregates_match(snapshot)
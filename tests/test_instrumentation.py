@@ -0,0 +1,104 @@
+import pytest
+import json
+import logging
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils import instrumentation
+from utils.instrumentation import count, registry, timed, timer
+from utils.holdings_table import HoldingsTable
+from utils.portfolio_manager import PortfolioManager
+
+
+@timed
+def instrumented_add(a, b):
+    return a + b
+
+
+@timed("custom.name")
+def instrumented_outer():
+    with timer("custom.inner"):
+        return instrumented_add(1, 2)
+
+
+class TestInstrumentation:
+
+    def setup_method(self):
+        """Enable collection on a clean registry"""
+        self.was_enabled = instrumentation.enabled()
+        instrumentation.enable(True)
+        registry.reset()
+
+    def teardown_method(self):
+        """Restore the collection flag"""
+        registry.end_rerun()
+        registry.reset()
+        instrumentation.enable(self.was_enabled)
+
+    def test_decorator_and_context_manager(self):
+        """Test timers record calls under the qualified or given name"""
+        assert instrumented_outer() == 3
+        instrumented_add(2, 3)
+        timers = registry.snapshot()["timers"]
+
+        assert timers["instrumented_add"]["count"] == 2
+        assert timers["custom.name"]["count"] == 1
+        assert timers["custom.inner"]["total_seconds"] <= timers["custom.name"]["total_seconds"]
+        assert instrumented_add.__name__ == "instrumented_add"
+
+    def test_timer_records_on_exception(self):
+        """Test a failing call is still timed and the exception propagates"""
+        with pytest.raises(ValueError):
+            with timer("failing"):
+                raise ValueError("boom")
+        assert registry.snapshot()["timers"]["failing"]["count"] == 1
+
+    def test_rerun_spans_nest_in_call_order(self):
+        """Test spans of one rerun list parents before children with their depth"""
+        registry.begin_rerun()
+        instrumented_outer()
+        spans = registry.end_rerun()
+
+        assert [(span.name, span.depth) for span in spans] == [
+            ("custom.name", 0), ("custom.inner", 1), ("instrumented_add", 2)
+        ]
+        assert registry.end_rerun() == []
+
+    def test_disabled_records_nothing(self):
+        """Test nothing is collected while disabled"""
+        instrumentation.enable(False)
+        instrumented_outer()
+        count("events")
+        assert registry.snapshot() == {"timers": {}, "counters": {}}
+
+    def test_portfolio_manager_calls_are_timed(self):
+        """Test PortfolioManager methods are instrumented"""
+        portfolio_manager = PortfolioManager("test_portfolio.json")
+        portfolio = {"name": "Test", "holdings": HoldingsTable.from_records([
+            {"asset_type": "equity", "asset_id": "RELIANCE", "asset_name": "Reliance Industries Ltd",
+             "quantity": 10.0, "purchase_price": 100.0, "current_price": 120.0, "purchase_date": "2023-01-15"}
+        ])}
+        portfolio_manager.portfolio_totals(portfolio)
+        assert registry.snapshot()["timers"]["PortfolioManager.portfolio_totals"]["count"] == 1
+
+    def test_prometheus_text(self):
+        """Test the Prometheus dump has typed timer and counter series"""
+        instrumented_add(1, 1)
+        count('odd"name', 3)
+        text = registry.prometheus_text()
+
+        assert "# TYPE indexcopilot_timer_calls_total counter" in text
+        assert 'indexcopilot_timer_calls_total{name="instrumented_add"} 1' in text
+        assert 'indexcopilot_events_total{name="odd\\"name"} 3' in text
+        assert text.endswith("\n")
+
+    def test_structured_log(self, caplog):
+        """Test the snapshot is logged as one JSON line"""
+        instrumented_add(1, 1)
+        with caplog.at_level(logging.INFO, logger=instrumentation.LOGGER_NAME):
+            registry.log()
+        payload = json.loads(caplog.records[-1].getMessage())
+        assert payload["metrics"]["timers"]["instrumented_add"]["count"] == 1
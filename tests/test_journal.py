@@ -0,0 +1,175 @@
+import pytest
+import json
+from io import StringIO
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.journal import PortfolioJournal, get_journal
+from utils.storage import JsonFileStorage
+from utils.portfolio_manager import PortfolioManager
+from utils.holdings_table import HoldingsTable
+
+
+def make_holding(asset_id, purchase_date="2023-01-15"):
+    return {
+        "asset_type": "equity",
+        "asset_id": asset_id,
+        "asset_name": f"{asset_id} Ltd",
+        "quantity": 10.0,
+        "purchase_price": 100.0,
+        "current_price": 120.0,
+        "purchase_date": purchase_date
+    }
+
+
+class TestPortfolioJournal:
+
+    def setup_method(self):
+        """Setup a journaled manager on a fresh snapshot"""
+        self.file_path = "test_journal_portfolio.json"
+        self.teardown_method()
+        self.journal = PortfolioJournal(self.file_path, compact_threshold=1000)
+        self.journal.write_snapshot({"name": "Journal Test", "holdings": [make_holding("BASE")]})
+
+    def test_append_does_not_rewrite_snapshot(self):
+        """Test mutations go to the log and leave the snapshot untouched"""
+        with open(self.file_path) as f:
+            snapshot_before = f.read()
+
+        self.journal.append("add", holding=make_holding("NEW1"))
+        self.journal.append("add", holding=make_holding("NEW2"))
+
+        with open(self.file_path) as f:
+            assert f.read() == snapshot_before
+        with open(self.journal.log_path) as f:
+            assert len(f.readlines()) == 2
+        assert self.journal.pending == 2
+
+    def test_load_replays_log_tail(self):
+        """Test loading reads the snapshot and replays adds and removes"""
+        self.journal.append("add", holding=make_holding("NEW1"))
+        self.journal.append("add", holding=make_holding("NEW2"))
+        self.journal.append("remove", asset_id="BASE", purchase_date=None)
+
+        portfolio = PortfolioJournal(self.file_path).load()
+
+        assert portfolio["name"] == "Journal Test"
+        assert [h["asset_id"] for h in portfolio["holdings"]] == ["NEW1", "NEW2"]
+
+    def test_torn_last_record_is_ignored(self):
+        """Test a partially written final record from a crash does not break loading"""
+        self.journal.append("add", holding=make_holding("NEW1"))
+        with open(self.journal.log_path, "a") as f:
+            f.write('{"seq": 99, "op": "add", "hold')
+
+        portfolio = PortfolioJournal(self.file_path).load()
+
+        assert [h["asset_id"] for h in portfolio["holdings"]] == ["BASE", "NEW1"]
+
+    def test_append_after_torn_record_starts_a_new_line(self):
+        """Test appends after a crash mid-append are kept and the log stays readable"""
+        self.journal.append("add", holding=make_holding("NEW1"))
+        with open(self.journal.log_path, "a") as f:
+            f.write('{"seq": 99, "op": "add", "hold')
+
+        journal = PortfolioJournal(self.file_path)
+        assert len(journal.load()["holdings"]) == 2
+        journal.append("add", holding=make_holding("NEW2"))
+        journal.append("add", holding=make_holding("NEW3"))
+
+        portfolio = PortfolioJournal(self.file_path).load()
+        assert [h["asset_id"] for h in portfolio["holdings"]] == ["BASE", "NEW1", "NEW2", "NEW3"]
+
+    def test_plain_save_supersedes_the_log(self):
+        """Test a non-journaled save of the same file is not followed by a replay of stale records"""
+        self.journal.append("add", holding=make_holding("NEW1"))
+        plain = JsonFileStorage(self.file_path)
+        portfolio = PortfolioJournal(self.file_path).load()
+
+        plain.save(portfolio)
+
+        assert not os.path.exists(self.journal.log_path)
+        reloaded = PortfolioJournal(self.file_path).load()
+        assert [h["asset_id"] for h in reloaded["holdings"]] == ["BASE", "NEW1"]
+
+    def test_get_journal_applies_explicit_threshold(self):
+        """Test a later caller's compact_threshold replaces the shared journal's"""
+        journal = get_journal(self.file_path, compact_threshold=10)
+        assert get_journal(self.file_path).compact_threshold == 10
+        assert get_journal(self.file_path, compact_threshold=3) is journal
+        assert journal.compact_threshold == 3
+
+    def test_compact_folds_log_into_snapshot(self):
+        """Test compaction writes a new snapshot and empties the log"""
+        self.journal.append("add", holding=make_holding("NEW1"))
+        self.journal.compact()
+
+        assert not os.path.exists(self.journal.log_path)
+        assert self.journal.pending == 0
+        with open(self.file_path) as f:
+            snapshot = json.load(f)
+        assert [h["asset_id"] for h in snapshot["holdings"]] == ["BASE", "NEW1"]
+
+    def test_stale_log_records_are_skipped(self):
+        """Test records already folded into the snapshot are not applied twice"""
+        self.journal.append("add", holding=make_holding("NEW1"))
+        with open(self.journal.log_path) as f:
+            log_text = f.read()
+        self.journal.compact()
+        # Simulate a crash between the snapshot rename and the log truncation
+        with open(self.journal.log_path, "w") as f:
+            f.write(log_text)
+
+        portfolio = PortfolioJournal(self.file_path).load()
+
+        assert [h["asset_id"] for h in portfolio["holdings"]] == ["BASE", "NEW1"]
+
+    def test_background_compaction_on_threshold(self):
+        """Test reaching the threshold compacts on a background thread"""
+        journal = PortfolioJournal(self.file_path, compact_threshold=3)
+        for i in range(3):
+            journal.append("add", holding=make_holding(f"NEW{i}"))
+        journal.wait()
+
+        assert journal.pending == 0
+        portfolio = PortfolioJournal(self.file_path).load()
+        assert len(portfolio["holdings"]) == 4
+
+    def test_portfolio_manager_journal_mode(self):
+        """Test add_holding and remove_holding round-trip through the journal"""
+        manager = PortfolioManager(self.file_path, journal=True)
+        portfolio = manager.load_portfolio()
+
+        manager.add_holding(portfolio, make_holding("NEW1", "2023-05-01"))
+        manager.remove_holding(portfolio, "BASE")
+
+        reloaded = PortfolioManager(self.file_path, journal=True).journal.load()
+        assert isinstance(reloaded["holdings"], HoldingsTable)
+        assert [h["asset_id"] for h in reloaded["holdings"]] == ["NEW1"]
+
+    def test_merge_csv_appends_one_upsert_record(self):
+        """Test a merge import logs only its diff and replays to the merged holdings"""
+        manager = PortfolioManager(self.file_path, journal=True)
+        portfolio = manager.load_portfolio()
+        csv_text = ("asset_type,asset_id,asset_name,quantity,purchase_price,current_price,purchase_date\n"
+                    "equity,BASE,BASE Ltd,10,100,130,2023-01-15\n"
+                    "equity,NEW1,NEW1 Ltd,5,50,55,2023-05-01\n")
+
+        result = manager.merge_csv(portfolio, StringIO(csv_text))
+
+        assert (result.merge.added, result.merge.updated) == (1, 1)
+        with open(self.journal.log_path) as f:
+            records = [json.loads(line) for line in f]
+        assert [r["op"] for r in records] == ["upsert"]
+        assert len(records[0]["holdings"]) == 2
+        reloaded = PortfolioJournal(self.file_path).load()
+        assert reloaded["holdings"].to_records() == portfolio["holdings"].to_records()
+
+    def teardown_method(self):
+        """Clean up test files"""
+        for path in ("test_journal_portfolio.json", "test_journal_portfolio.json.log"):
+            if os.path.exists(path):
+                os.remove(path)
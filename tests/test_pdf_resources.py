@@ -0,0 +1,41 @@
+import pytest
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.pdf_resources import FONT_ENV_VAR, get_pdf_resources
+from utils.export_manager import ExportManager
+
+
+class TestPdfResources:
+
+    def test_resources_are_shared(self):
+        """Test fonts and styles are prepared once and shared by every ExportManager"""
+        assert get_pdf_resources() is get_pdf_resources()
+        assert ExportManager().resources is ExportManager().resources
+
+    def test_font_from_environment(self, monkeypatch):
+        """Test the font can be chosen through the environment"""
+        monkeypatch.setenv(FONT_ENV_VAR, "Times-Roman")
+        resources = get_pdf_resources()
+
+        assert resources.font_name == "Times-Roman"
+        assert resources.styles['Normal'].fontName == "Times-Roman"
+        # Standard Type 1 fonts have no rupee glyph
+        assert not resources.unicode_font
+        assert resources.currency == "Rs."
+        assert ExportManager().resources is resources
+
+    def test_unknown_font_falls_back(self):
+        """Test an unknown font name falls back to the probed platform fonts"""
+        resources = get_pdf_resources("NoSuchFont")
+        assert resources.font_name in ("UnicodeFont", "Helvetica")
+
+    def test_report_with_configured_font(self):
+        """Test a report renders with a non-default font"""
+        export_manager = ExportManager(font="Courier")
+        pdf_data = export_manager.generate_pdf_report({"name": "Font Test", "holdings": []})
+        assert pdf_data.startswith(b'%PDF')
+        assert b"Courier" in pdf_data
@@ -8,6 +8,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from utils.portfolio_manager import PortfolioManager
+from utils.holdings_table import HoldingsTable
 
 
 class TestPortfolioManager:
@@ -59,6 +60,84 @@ class TestPortfolioManager:
         cagr = self.portfolio_manager.calculate_cagr(2000.0, 1500.0, "2023-01-15")
         assert cagr < 0  # Should be negative
     
+    def test_compute_metrics_matches_scalar_functions(self):
+        """Test batch metrics agree with the scalar gain/loss and CAGR wrappers"""
+        losing_holding = dict(self.sample_holding, asset_id="TCS", current_price=1500.0, purchase_date="2022/06/30")
+        df = pd.DataFrame([self.sample_holding, losing_holding])
+        
+        metrics_df = self.portfolio_manager.compute_metrics(df)
+        
+        assert list(metrics_df["value"]) == [25000.0, 15000.0]
+        assert list(metrics_df["gain_loss"]) == [5000.0, -5000.0]
+        assert list(metrics_df["gain_pct"]) == [25.0, -25.0]
+        for i, holding in enumerate([self.sample_holding, losing_holding]):
+            expected = self.portfolio_manager.calculate_cagr(
+                holding["purchase_price"], holding["current_price"], holding["purchase_date"]
+            )
+            assert metrics_df["cagr"].iloc[i] == pytest.approx(expected)
+        # Input frame is not modified
+        assert "value" not in df.columns
+    
+    def test_compute_metrics_as_of(self):
+        """Test holding period and CAGR are measured against the as_of date"""
+        df = pd.DataFrame([self.sample_holding])
+        
+        metrics_df = self.portfolio_manager.compute_metrics(df, as_of=datetime(2025, 1, 15))
+        
+        years = (datetime(2025, 1, 15) - datetime(2023, 1, 15)).days / 365.25
+        assert metrics_df["holding_years"].iloc[0] == pytest.approx(years)
+        assert metrics_df["cagr"].iloc[0] == pytest.approx(((2500.0 / 2000.0) ** (1 / years) - 1) * 100)
+    
+    def test_compute_metrics_unparseable_date(self):
+        """Test holdings without a usable purchase date get zero CAGR"""
+        df = pd.DataFrame([dict(self.sample_holding, purchase_date="not-a-date")])
+        
+        metrics_df = self.portfolio_manager.compute_metrics(df)
+        
+        assert metrics_df["cagr"].iloc[0] == 0.0
+        assert metrics_df["gain_loss"].iloc[0] == 5000.0
+        assert metrics_df["date_issue"].iloc[0] == "Invalid purchase date"
+    
+    def test_calculate_cagr_as_of(self):
+        """Test scalar CAGR is reproducible for a fixed as_of date"""
+        cagr = self.portfolio_manager.calculate_cagr(2000.0, 2500.0, "2023-01-15", as_of=datetime(2025, 1, 15))
+        
+        years = (datetime(2025, 1, 15) - datetime(2023, 1, 15)).days / 365.25
+        assert cagr == pytest.approx(((2500.0 / 2000.0) ** (1 / years) - 1) * 100)
+    
+    def test_calculate_cagr_invalid_date(self):
+        """Test an unusable purchase date is an error rather than a flat return"""
+        with pytest.raises(ValueError, match="Invalid purchase date"):
+            self.portfolio_manager.calculate_cagr(2000.0, 2500.0, "not-a-date")
+    
+    def test_table_dates_flag_missing_or_invalid(self):
+        """Test dates a table could not parse are not reported as simply missing"""
+        table = HoldingsTable.from_records([dict(self.sample_holding, purchase_date="2023-13-45")])
+        
+        metrics_df = self.portfolio_manager.compute_metrics(table.to_frame())
+        
+        assert metrics_df["date_issue"].iloc[0] == "Missing or invalid purchase date"
+    
+    def test_date_issues_are_reported_per_row(self):
+        """Test missing, invalid and post-as_of purchase dates are flagged on their own rows"""
+        df = pd.DataFrame([
+            self.sample_holding,
+            dict(self.sample_holding, asset_id="NODATE", purchase_date=None),
+            dict(self.sample_holding, asset_id="BAD", purchase_date="2023-13-45"),
+            dict(self.sample_holding, asset_id="LATER", purchase_date="2024-06-01"),
+        ])
+        
+        metrics_df = self.portfolio_manager.compute_metrics(df, as_of=datetime(2024, 1, 1))
+        issues = self.portfolio_manager.date_issues(metrics_df)
+        
+        assert metrics_df["date_issue"].iloc[0] == ""
+        assert issues["asset_id"].tolist() == ["NODATE", "BAD", "LATER"]
+        assert issues["date_issue"].tolist() == [
+            "Missing purchase date", "Invalid purchase date", "Purchased after the as-of date"
+        ]
+        assert metrics_df["holding_years"].iloc[1:].isna().all()
+        assert (metrics_df["cagr"].iloc[1:] == 0.0).all()
+    
     def test_validate_csv_data_valid(self):
         """Test CSV validation with valid data"""
         valid_data = {
@@ -134,6 +213,44 @@ class TestPortfolioManager:
         assert is_valid == False
         assert "Invalid date format" in message
     
+    def test_validate_csv_data_does_not_modify_input(self):
+        """Test validation leaves the caller's DataFrame untouched"""
+        df = pd.DataFrame({
+            "asset_type": ["equity"],
+            "asset_id": ["RELIANCE"],
+            "asset_name": ["Reliance Industries"],
+            "quantity": ["10"],
+            "purchase_price": ["2000.0"]
+        })
+        
+        is_valid, _ = self.portfolio_manager.validate_csv_data(df)
+        assert is_valid == True
+        assert df["quantity"].tolist() == ["10"]
+    
+    def test_validate_holdings_collects_all_violations(self):
+        """Test every failing rule is reported with a mask and row numbers"""
+        df = pd.DataFrame({
+            "asset_type": ["equity", "equity", "equity"],
+            "asset_id": ["RELIANCE", "", "TCS"],
+            "asset_name": ["Reliance Industries", "Infosys", "TCS"],
+            "quantity": [10, -1, "abc"],
+            "purchase_price": [2000.0, 0, 3200.0],
+            "purchase_date": ["2023-01-15", "2023-02-30", None]
+        })
+        
+        result = self.portfolio_manager.validate_holdings(df)
+        
+        assert not result.valid
+        assert list(result.invalid_rows) == [False, True, True]
+        assert list(result.masks["quantity.positive"]) == [False, True, False]
+        assert list(result.masks["quantity.type"]) == [False, False, True]
+        violations = result.violations()
+        assert set(violations[violations["row"] == 2]["rule"]) == {
+            "asset_id.required", "quantity.positive", "purchase_price.positive", "purchase_date.type"
+        }
+        assert list(violations[violations["row"] == 3]["rule"]) == ["quantity.type"]
+        assert len(result.errors()) == 5
+    
     def teardown_method(self):
         """Clean up test files"""
         if os.path.exists("test_portfolio.json"):
@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+import pandas as pd
+import shutil
+import sys
+import os
+from io import StringIO
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.price_history import PriceHistoryStore
+from utils.holdings_table import HoldingsTable
+
+
+PRICES_CSV = """asset_id,date,price
+HDFC123,2024-01-01,100
+HDFC123,2024-01-02,101
+RELIANCE,2024-01-01,2000
+HDFC123,2024-01-04,104
+RELIANCE,2024-01-03,2100
+bad,not-a-date,1
+"""
+
+
+class TestPriceHistoryStore:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.root = "test_price_history"
+        self.teardown_method()
+        self.store = PriceHistoryStore(self.root)
+        self.store.ingest_csv(StringIO(PRICES_CSV), chunksize=2)
+
+    def teardown_method(self):
+        """Clean up test files"""
+        shutil.rmtree("test_price_history", ignore_errors=True)
+
+    def test_ingest_and_range_slice(self):
+        """Test chunked ingest groups quotes per asset, sorted by date"""
+        assert self.store.asset_ids() == ["HDFC123", "RELIANCE"]
+        series = self.store.series("HDFC123", start="2024-01-02", end="2024-01-04")
+        assert series.index.strftime("%Y-%m-%d").tolist() == ["2024-01-02", "2024-01-04"]
+        assert series.tolist() == [101.0, 104.0]
+        assert self.store.series("UNKNOWN").empty
+
+    def test_series_is_memory_mapped(self):
+        """Test history is served from the mapped file, not loaded into RAM"""
+        records = self.store.history("HDFC123")
+        assert isinstance(records.base, np.memmap) or isinstance(records, np.memmap)
+
+    def test_ingest_merges_with_existing(self):
+        """Test a later ingest replaces quotes on the same date and keeps the rest"""
+        self.store.ingest_csv(StringIO("asset_id,date,price\nHDFC123,2024-01-02,99\nHDFC123,2024-01-05,105\n"))
+        # A fresh store sees the update through the manifest
+        reopened = PriceHistoryStore(self.root)
+        assert reopened.series("HDFC123").tolist() == [100.0, 99.0, 104.0, 105.0]
+
+    def test_prices_asof(self):
+        """Test as-of lookup carries the last quote forward and is NaN before the first"""
+        dates = np.array(["2023-12-31", "2024-01-03", "2024-01-10"], dtype="datetime64[D]")
+        prices = self.store.prices_asof("HDFC123", dates)
+        assert np.isnan(prices[0])
+        assert prices[1:].tolist() == [101.0, 104.0]
+
+    def test_value_over_time(self):
+        """Test daily value follows quantities held and as-of prices"""
+        holdings = HoldingsTable.from_records([
+            {"asset_type": "mutual_fund", "asset_id": "HDFC123", "asset_name": "HDFC", "quantity": 10.0,
+             "purchase_price": 90.0, "current_price": 104.0, "purchase_date": "2024-01-01"},
+            {"asset_type": "mutual_fund", "asset_id": "HDFC123", "asset_name": "HDFC", "quantity": 5.0,
+             "purchase_price": 101.0, "current_price": 104.0, "purchase_date": "2024-01-02"},
+            {"asset_type": "insurance", "asset_id": "LIC001", "asset_name": "LIC", "quantity": 1.0,
+             "purchase_price": 500.0, "current_price": 500.0, "purchase_date": "2024-01-03"},
+        ])
+        result = self.store.value_over_time(holdings, end="2024-01-04")
+
+        assert result.index[0] == pd.Timestamp("2024-01-01")
+        # LIC001 has no history and is valued at cost from its purchase date
+        assert result["value"].tolist() == [1000.0, 1515.0, 2015.0, 2060.0]
+        assert result["investment"].tolist() == [900.0, 1405.0, 1905.0, 1905.0]
@@ -0,0 +1,147 @@
+import pytest
+import sys
+import os
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils import instrumentation
+from utils.price_provider import (CachedPriceProvider, FilePriceProvider, HttpPriceProvider, PriceFetchError,
+                                  PriceProvider)
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    """Stand-in quote server: every symbol is priced at 100 plus its length"""
+
+    def do_GET(self):
+        symbols = parse_qs(urlparse(self.path).query)["symbols"][0].split(",")
+        self.server.requests.append(symbols)
+        body = json.dumps({symbol: 100.0 + len(symbol) for symbol in symbols if symbol != "UNKNOWN"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CountingProvider(PriceProvider):
+    def __init__(self, price=10.0):
+        self.price = price
+        self.calls = []
+
+    async def fetch_prices(self, asset_ids):
+        self.calls.append(list(asset_ids))
+        return {asset_id: self.price for asset_id in asset_ids}
+
+
+class TestPriceProvider:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), QuoteHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/quotes"
+        self.price_file = "test_prices.json"
+
+    def teardown_method(self):
+        """Clean up test files"""
+        self.server.shutdown()
+        self.server.server_close()
+        if os.path.exists(self.price_file):
+            os.remove(self.price_file)
+
+    def test_http_provider_batches_symbols(self):
+        """Test thousands of symbols are fetched in one round of batched requests"""
+        provider = HttpPriceProvider(self.url, batch_size=200)
+        asset_ids = [f"SYM{i}" for i in range(2000)]
+        prices = provider.get_prices(asset_ids)
+
+        assert len(prices) == 2000
+        assert prices["SYM1"] == 104.0
+        assert len(self.server.requests) == 10
+        assert sorted(sum(self.server.requests, [])) == sorted(asset_ids)
+
+    def test_http_provider_skips_unknown(self):
+        """Test unknown symbols are left out of the prices"""
+        assert HttpPriceProvider(self.url).get_prices(["ABC", "UNKNOWN"]) == {"ABC": 103.0}
+
+    def test_http_provider_reports_failed_requests(self, caplog):
+        """Test a failed request is logged, counted and raised with no quotes"""
+        was_enabled = instrumentation.enabled()
+        instrumentation.enable(True)
+        instrumentation.registry.reset()
+        try:
+            # Nothing listens on the discard port
+            with pytest.raises(PriceFetchError, match="1 of 1 price requests failed") as error:
+                HttpPriceProvider("http://127.0.0.1:9/quotes", timeout=1).get_prices(["ABC"])
+            assert error.value.prices == {}
+            assert instrumentation.registry.snapshot()["counters"]["price_provider.failed_requests"] == 1
+        finally:
+            instrumentation.registry.reset()
+            instrumentation.enable(was_enabled)
+        assert "Price request for 1 symbols" in caplog.text
+
+    def test_cache_keeps_quotes_from_a_partial_failure(self):
+        """Test the quotes that arrived before a failure are cached and passed on"""
+        class FlakyProvider(PriceProvider):
+            async def fetch_prices(self, asset_ids):
+                raise PriceFetchError("1 of 2 price requests failed: timed out", {"A": 10.0})
+
+        provider = CachedPriceProvider(FlakyProvider(), ttl=60)
+        with pytest.raises(PriceFetchError) as error:
+            provider.get_prices(["A", "B"])
+
+        assert error.value.prices == {"A": 10.0}
+        assert provider._quotes["A"][0] == 10.0
+
+    def test_file_provider(self):
+        """Test prices are read from a JSON file and reloaded when it changes"""
+        with open(self.price_file, "w") as f:
+            json.dump({"RELIANCE": 2600.0}, f)
+        provider = FilePriceProvider(self.price_file)
+        assert provider.get_prices(["RELIANCE", "TCS"]) == {"RELIANCE": 2600.0}
+
+        with open(self.price_file, "w") as f:
+            json.dump({"RELIANCE": 2700.0, "TCS": 3500.0}, f)
+        os.utime(self.price_file, (time.time() + 5, time.time() + 5))
+        assert provider.get_prices(["RELIANCE", "TCS"]) == {"RELIANCE": 2700.0, "TCS": 3500.0}
+
+    def test_cache_serves_fresh_quotes(self):
+        """Test fresh quotes are not fetched again and only misses go to the source"""
+        source = CountingProvider()
+        provider = CachedPriceProvider(source, ttl=60)
+        provider.get_prices(["A", "B"])
+        provider.get_prices(["A", "B", "C"])
+
+        assert source.calls == [["A", "B"], ["C"]]
+
+    def test_stale_while_revalidate(self):
+        """Test stale quotes are served at once and refreshed in the background"""
+        source = CountingProvider(price=10.0)
+        provider = CachedPriceProvider(source, ttl=0, stale_ttl=60)
+        provider.get_prices(["A"])
+
+        source.price = 20.0
+        assert provider.get_prices(["A"]) == {"A": 10.0}
+        provider.wait(5)
+        # Revalidated in the background, no blocking fetch needed
+        assert provider._quotes["A"][0] == 20.0
+        assert len(source.calls) == 2
+
+    def test_expired_quotes_are_fetched(self):
+        """Test quotes older than stale_ttl are fetched before returning"""
+        source = CountingProvider(price=10.0)
+        provider = CachedPriceProvider(source, ttl=0, stale_ttl=0)
+        provider.get_prices(["A"])
+        source.price = 20.0
+        assert provider.get_prices(["A"]) == {"A": 20.0}
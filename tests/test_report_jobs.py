@@ -0,0 +1,104 @@
+import pytest
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.holdings_table import HoldingsTable
+from utils.report_jobs import ReportJobQueue
+
+
+def make_portfolio(name="Report Test", price=120.0):
+    return {
+        "name": name,
+        "holdings": HoldingsTable.from_records([
+            {"asset_type": "equity", "asset_id": "RELIANCE", "asset_name": "Reliance Industries Ltd",
+             "quantity": 10.0, "purchase_price": 100.0, "current_price": price, "purchase_date": "2023-01-15"}
+        ])
+    }
+
+
+class TestReportJobQueue:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.queue = ReportJobQueue(max_workers=1, max_finished=1)
+
+    def teardown_method(self):
+        """Clean up worker processes"""
+        self.queue.shutdown()
+
+    def test_submit_and_wait(self):
+        """Test a report renders in the pool and is served from the finished cache"""
+        job_id = self.queue.submit(make_portfolio(), include_chart=False)
+        pdf_data = self.queue.wait(job_id, timeout=120)
+
+        assert pdf_data.startswith(b'%PDF')
+        status = self.queue.status(job_id)
+        assert status.state == "done"
+        assert status.progress == 1.0
+        assert self.queue.result(job_id) is pdf_data
+
+    def test_identical_requests_share_a_job(self):
+        """Test job ids are content hashes, so identical requests are deduplicated"""
+        first = self.queue.submit(make_portfolio(), include_chart=False)
+        second = self.queue.submit(make_portfolio(), include_chart=False)
+        other = ReportJobQueue.job_id(make_portfolio(price=130.0), include_chart=False)
+
+        assert first == second
+        assert other != first
+        self.queue.wait(first, timeout=120)
+        # Resubmitting a finished report does not queue new work
+        assert self.queue.submit(make_portfolio(), include_chart=False) == first
+        assert self.queue.status(first).state == "done"
+
+    def test_finished_cache_evicts_oldest(self):
+        """Test only max_finished PDFs are kept"""
+        first = self.queue.submit(make_portfolio("First"), include_chart=False)
+        self.queue.wait(first, timeout=120)
+        second = self.queue.submit(make_portfolio("Second"), include_chart=False)
+        self.queue.wait(second, timeout=120)
+
+        assert self.queue.result(first) is None
+        assert self.queue.status(first) is None
+        assert self.queue.result(second).startswith(b'%PDF')
+
+    def _break_pool(self):
+        """Kill the pool's worker, as an out-of-memory kill would"""
+        return self.queue._executor.submit(os._exit, 1)
+
+    def test_queue_recovers_from_a_broken_pool(self):
+        """Test a dead worker fails its pending jobs but not later ones"""
+        killer = self._break_pool()
+        failed = self.queue.submit(make_portfolio("Broken"), include_chart=False)
+        with pytest.raises(Exception):
+            killer.result(timeout=120)
+
+        assert self.queue.wait(failed, timeout=120) is None
+        assert self.queue.status(failed).state == "failed"
+        job_id = self.queue.submit(make_portfolio(), include_chart=False)
+        assert self.queue.wait(job_id, timeout=120).startswith(b'%PDF')
+        # Resubmitting a failed report runs it again
+        assert self.queue.submit(make_portfolio("Broken"), include_chart=False) == failed
+        assert self.queue.wait(failed, timeout=120).startswith(b'%PDF')
+
+    def test_failed_jobs_are_evicted(self):
+        """Test only max_finished failed jobs are kept"""
+        failed = []
+        for name in ("First", "Second"):
+            self._break_pool()
+            job_id = self.queue.submit(make_portfolio(name), include_chart=False)
+            self.queue.wait(job_id, timeout=120)
+            failed.append(job_id)
+            # The next submit replaces the broken pool
+            self.queue.submit(make_portfolio(), include_chart=False)
+
+        assert self.queue.status(failed[0]) is None
+        assert self.queue.status(failed[1]).state == "failed"
+        assert failed[0] not in self.queue._jobs
+
+    def test_unknown_job(self):
+        """Test unknown ids have no status"""
+        assert self.queue.status("missing") is None
+        assert self.queue.wait("missing") is None
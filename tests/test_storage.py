@@ -0,0 +1,283 @@
+import pytest
+import numpy as np
+import pandas as pd
+from io import StringIO
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.storage import (SQLiteStorage, JsonFileStorage, NpzSnapshotStorage, ParquetSnapshotStorage,
+                           convert_portfolio, storage_for_path)
+from utils.portfolio_manager import PortfolioManager
+from utils.holdings_table import HoldingsTable
+from utils.price_provider import PriceFetchError, PriceProvider
+
+
+class StaticPriceProvider(PriceProvider):
+    def __init__(self, prices):
+        self.prices = prices
+
+    async def fetch_prices(self, asset_ids):
+        return {asset_id: self.prices[asset_id] for asset_id in asset_ids if asset_id in self.prices}
+
+
+class TestStorage:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.db_path = "test_portfolio.db"
+        self.json_path = "test_storage_portfolio.json"
+        self.npz_path = "test_storage_portfolio.npz"
+        self.parquet_path = "test_storage_portfolio.parquet"
+        self.teardown_method()
+        self.portfolio = {
+            "name": "Storage Test",
+            "holdings": HoldingsTable.from_records([
+                {"asset_type": "equity", "asset_id": "RELIANCE", "asset_name": "Reliance Industries Ltd",
+                 "quantity": 10.0, "purchase_price": 2000.0, "current_price": 2500.0, "purchase_date": "2023-01-15"},
+                {"asset_type": "mutual_fund", "asset_id": "HDFC123", "asset_name": "HDFC Nifty 50 Index Fund",
+                 "quantity": 100.0, "purchase_price": 150.0, "current_price": 180.0, "purchase_date": "2023-02-20"},
+                {"asset_type": "equity", "asset_id": "TCS", "asset_name": "Tata Consultancy Services",
+                 "quantity": 5.0, "purchase_price": 3200.0, "current_price": 3000.0, "purchase_date": "2023-03-10"}
+            ])
+        }
+
+    def test_storage_for_path_picks_backend_by_extension(self):
+        """Test .db files use SQLite, .npz/.parquet the snapshot formats and other files JSON"""
+        assert isinstance(storage_for_path(self.db_path), SQLiteStorage)
+        assert isinstance(storage_for_path(self.json_path), JsonFileStorage)
+        assert isinstance(storage_for_path(self.npz_path), NpzSnapshotStorage)
+        assert isinstance(storage_for_path(self.parquet_path), ParquetSnapshotStorage)
+
+    def test_sqlite_round_trip(self):
+        """Test saving and loading through SQLite preserves the portfolio"""
+        manager = PortfolioManager(self.db_path)
+        manager.save_portfolio(self.portfolio)
+
+        loaded = manager.load_portfolio()
+
+        assert loaded["name"] == "Storage Test"
+        assert loaded["holdings"].to_records() == self.portfolio["holdings"].to_records()
+
+    def test_sqlite_add_and_remove_are_incremental(self):
+        """Test add_holding and remove_holding touch single rows"""
+        manager = PortfolioManager(self.db_path)
+        manager.save_portfolio(self.portfolio)
+
+        manager.add_holding(self.portfolio, {
+            "asset_type": "insurance", "asset_id": "LIC001", "asset_name": "LIC Term Plan",
+            "quantity": 1.0, "purchase_price": 50000.0, "current_price": 50000.0, "purchase_date": "2023-01-01"
+        })
+        manager.remove_holding(self.portfolio, "TCS", "2023-03-10")
+
+        loaded = manager.load_portfolio()
+        assert [h["asset_id"] for h in loaded["holdings"]] == ["RELIANCE", "HDFC123", "LIC001"]
+
+    def test_sqlite_merge_csv_is_incremental(self):
+        """Test a merge import updates and inserts rows in place of a full rewrite"""
+        manager = PortfolioManager(self.db_path)
+        manager.save_portfolio(self.portfolio)
+        storage = manager.storage
+        storage.save = lambda portfolio: pytest.fail("merge must not rewrite the table")
+        csv_text = ("asset_type,asset_id,asset_name,quantity,purchase_price,purchase_date\n"
+                    "equity,RELIANCE,Reliance Industries Ltd,10,2000.0,2023-01-15\n"
+                    "equity,TCS,Tata Consultancy Services,8,3200.0,2023-03-10\n"
+                    "insurance,LIC001,LIC Term Plan,1,50000.0,\n")
+
+        result = manager.merge_csv(self.portfolio, StringIO(csv_text))
+
+        assert (result.merge.added, result.merge.updated, result.merge.unchanged) == (1, 1, 1)
+        loaded = SQLiteStorage(self.db_path).load()
+        assert loaded["holdings"].to_records() == self.portfolio["holdings"].to_records()
+        assert loaded["holdings"].to_records()[2]["current_price"] == 3000.0
+
+    def test_failed_merge_is_rolled_back(self):
+        """Test a merge whose persistence fails leaves the portfolio as it was, so a retry saves the diff"""
+        manager = PortfolioManager(self.db_path)
+        manager.save_portfolio(self.portfolio)
+        records_before = self.portfolio["holdings"].to_records()
+        csv_text = ("asset_type,asset_id,asset_name,quantity,purchase_price,purchase_date\n"
+                    "equity,TCS,Tata Consultancy Services,8,3200.0,2023-03-10\n")
+
+        def fail(portfolio, merge):
+            raise OSError("disk full")
+        record_upsert, manager.storage.record_upsert = manager.storage.record_upsert, fail
+        with pytest.raises(Exception, match="disk full"):
+            manager.merge_csv(self.portfolio, StringIO(csv_text))
+        assert self.portfolio["holdings"].to_records() == records_before
+
+        manager.storage.record_upsert = record_upsert
+        assert manager.merge_csv(self.portfolio, StringIO(csv_text)).merge.updated == 1
+        assert SQLiteStorage(self.db_path).load()["holdings"].to_records()[2]["quantity"] == 8.0
+
+    def test_sqlite_indexes_exist(self):
+        """Test the indexed columns have indexes"""
+        storage = SQLiteStorage(self.db_path)
+        indexes = storage._read("SELECT name FROM sqlite_master WHERE type = 'index'")["name"].tolist()
+
+        for name in ("idx_holdings_asset_id", "idx_holdings_asset_type", "idx_holdings_purchase_date"):
+            assert name in indexes
+
+    def test_pushdown_matches_in_memory(self):
+        """Test SQL aggregates agree with the table's running aggregates"""
+        sql_manager = PortfolioManager(self.db_path)
+        sql_manager.save_portfolio(self.portfolio)
+        json_manager = PortfolioManager(self.json_path)
+
+        sql_totals = sql_manager.storage.totals()
+        json_totals = json_manager.portfolio_totals(self.portfolio)
+        assert sql_totals["holdings"] == json_totals["holdings"] == 3
+        assert sql_totals["total_value"] == pytest.approx(json_totals["total_value"])
+        assert sql_totals["total_investment"] == pytest.approx(json_totals["total_investment"])
+
+        sql_allocation = sql_manager.storage.allocation_by_type()
+        json_allocation = json_manager.allocation_by_type(self.portfolio)
+        assert sql_allocation.to_dict() == pytest.approx(json_allocation.to_dict())
+
+        assert sql_manager.storage.top_by_gain(2)["asset_id"].tolist() == ["RELIANCE", "HDFC123"]
+        assert json_manager.top_by_gain(self.portfolio, 2)["asset_id"].tolist() == ["RELIANCE", "HDFC123"]
+
+    def test_query_holdings_filters(self):
+        """Test filtering by asset_type and purchase date range"""
+        sql_manager = PortfolioManager(self.db_path)
+        sql_manager.save_portfolio(self.portfolio)
+        json_manager = PortfolioManager(self.json_path)
+
+        for manager in (sql_manager, json_manager):
+            equity = manager.query_holdings(self.portfolio, asset_type="equity")
+            assert list(equity["asset_id"]) == ["RELIANCE", "TCS"]
+            recent = manager.query_holdings(self.portfolio, start_date="2023-02-01", end_date="2023-02-28")
+            assert list(recent["asset_id"]) == ["HDFC123"]
+
+    def test_queries_are_pushed_down_and_kept_current(self):
+        """Test SQLite answers the queries for a loaded table, with refreshed prices recorded"""
+        manager = PortfolioManager(self.db_path,
+                                   price_provider=StaticPriceProvider({"RELIANCE": 1000.0, "TCS": 5000.0}))
+        manager.save_portfolio(self.portfolio)
+        manager.refresh_prices(self.portfolio)
+        queried = []
+        query_holdings = manager.storage.query_holdings
+        manager.storage.query_holdings = lambda *args: queried.append(args) or query_holdings(*args)
+
+        assert manager.top_by_gain(self.portfolio, 1)["asset_id"].tolist() == ["TCS"]
+        equity = manager.query_holdings(self.portfolio, asset_type="equity")
+        assert equity["current_price"].tolist() == [1000.0, 5000.0]
+        assert queried == [("equity", None, None, None, None)]
+        assert manager.portfolio_totals(self.portfolio)["total_value"] == pytest.approx(10000.0 + 18000.0 + 25000.0)
+
+    def test_refresh_prices_reprices_and_persists(self):
+        """Test refreshed quotes reprice matching holdings and reach the SQLite aggregates"""
+        manager = PortfolioManager(self.db_path, price_provider=StaticPriceProvider({"RELIANCE": 2600.0, "TCS": 3000.0}))
+        manager.save_portfolio(self.portfolio)
+
+        repriced = manager.refresh_prices(self.portfolio)
+
+        assert repriced == 1
+        assert self.portfolio["holdings"].column("current_price").tolist() == [2600.0, 180.0, 3000.0]
+        assert manager.portfolio_totals(self.portfolio)["total_value"] == pytest.approx(26000.0 + 18000.0 + 15000.0)
+        # Unchanged quotes leave the table (and its derived data) alone
+        version = self.portfolio["holdings"].version
+        assert manager.refresh_prices(self.portfolio) == 0
+        assert self.portfolio["holdings"].version == version
+
+    def test_refresh_prices_applies_partial_quotes_and_reports(self):
+        """Test quotes that arrived are applied before a fetch failure is raised"""
+        class PartialPriceProvider(PriceProvider):
+            async def fetch_prices(self, asset_ids):
+                raise PriceFetchError("1 of 2 price requests failed: timed out", {"RELIANCE": 2600.0})
+
+        manager = PortfolioManager(self.json_path, price_provider=PartialPriceProvider())
+
+        with pytest.raises(Exception, match="Error fetching prices: 1 of 2 price requests failed"):
+            manager.refresh_prices(self.portfolio)
+        assert self.portfolio["holdings"].column("current_price").tolist() == [2600.0, 180.0, 3000.0]
+
+    def test_refresh_prices_without_provider(self):
+        """Test holdings keep their prices when no provider is configured"""
+        manager = PortfolioManager(self.json_path)
+        assert manager.refresh_prices(self.portfolio) == 0
+
+    @pytest.mark.parametrize("compress", [False, True])
+    def test_npz_round_trip(self, compress):
+        """Test the .npz snapshot preserves holdings, undated rows and the name"""
+        self.portfolio["holdings"].append({
+            "asset_type": "equity", "asset_id": "NODATE", "asset_name": "Undated ₹ Holding",
+            "quantity": 1.0, "purchase_price": 10.0, "current_price": 11.0, "purchase_date": None
+        })
+        storage_for_path(self.npz_path, compress=compress).save(self.portfolio)
+
+        loaded = PortfolioManager(self.npz_path).load_portfolio()
+
+        assert loaded["name"] == "Storage Test"
+        assert loaded["holdings"].to_records() == self.portfolio["holdings"].to_records()
+        assert loaded["holdings"].content_hash() == self.portfolio["holdings"].content_hash()
+
+    def test_npz_load_is_zero_copy(self):
+        """Test the loaded arrays become the table buffers behind the frame"""
+        NpzSnapshotStorage(self.npz_path).save(self.portfolio)
+        holdings = NpzSnapshotStorage(self.npz_path).load()["holdings"]
+
+        frame = holdings.to_frame()
+        assert np.shares_memory(frame["quantity"].to_numpy(), holdings.column("quantity"))
+        # The adopted buffers still grow normally
+        holdings.append({"asset_type": "equity", "asset_id": "NEW", "asset_name": "New",
+                         "quantity": 1.0, "purchase_price": 1.0, "purchase_date": "2024-01-01"})
+        assert len(holdings) == 4
+        assert frame["asset_id"].tolist() == ["RELIANCE", "HDFC123", "TCS"]
+
+    def test_npz_empty_and_missing(self):
+        """Test empty portfolios round-trip and a missing file loads empty"""
+        assert len(NpzSnapshotStorage(self.npz_path).load()["holdings"]) == 0
+        NpzSnapshotStorage(self.npz_path).save({"name": "Empty", "holdings": HoldingsTable()})
+        loaded = NpzSnapshotStorage(self.npz_path).load()
+        assert loaded["name"] == "Empty"
+        assert len(loaded["holdings"]) == 0
+
+    def test_parquet_round_trip(self):
+        """Test the Parquet snapshot preserves holdings and the name"""
+        pytest.importorskip("pyarrow")
+        manager = PortfolioManager(self.parquet_path)
+        manager.save_portfolio(self.portfolio)
+
+        loaded = manager.load_portfolio()
+
+        assert loaded["name"] == "Storage Test"
+        assert loaded["holdings"].to_records() == self.portfolio["holdings"].to_records()
+
+    def test_convert_between_formats(self):
+        """Test JSON converts to .npz and back without changes"""
+        PortfolioManager(self.json_path).save_portfolio(self.portfolio)
+
+        assert convert_portfolio(self.json_path, self.npz_path) == 3
+        os.remove(self.json_path)
+        assert convert_portfolio(self.npz_path, self.json_path) == 3
+
+        loaded = PortfolioManager(self.json_path).load_portfolio()
+        assert loaded["name"] == "Storage Test"
+        assert loaded["holdings"].to_records() == self.portfolio["holdings"].to_records()
+
+    def test_convert_replays_the_journal(self):
+        """Test holdings still in the JSON journal's log are converted too"""
+        manager = PortfolioManager(self.json_path, journal=True)
+        manager.save_portfolio(self.portfolio)
+        manager.add_holding(self.portfolio, dict(self.portfolio["holdings"].to_records()[0], asset_id="INFY"))
+        assert os.path.exists(self.json_path + ".log")
+
+        assert convert_portfolio(self.json_path, self.npz_path) == 4
+        assert NpzSnapshotStorage(self.npz_path).load()["holdings"].to_records()[-1]["asset_id"] == "INFY"
+
+    def test_from_columns_rejects_bad_codes(self):
+        """Test codes outside the categories are rejected"""
+        floats, codes, categories, dates = self.portfolio["holdings"].to_columns()
+        codes = dict(codes, asset_id=np.array([0, 1, 7], dtype=np.int32))
+        with pytest.raises(ValueError):
+            HoldingsTable.from_columns(floats, codes, categories, dates)
+
+    def teardown_method(self):
+        """Clean up test files"""
+        for path in ("test_portfolio.db", "test_portfolio.db-wal", "test_portfolio.db-shm",
+                     "test_storage_portfolio.json", "test_storage_portfolio.json.log", "test_storage_portfolio.npz", "test_storage_portfolio.parquet"):
+            if os.path.exists(path):
+                os.remove(path)
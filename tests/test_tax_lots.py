@@ -0,0 +1,150 @@
+import pytest
+import time
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.holdings_table import HoldingsTable
+from utils.tax_lots import TaxLotLedger
+
+
+class TestTaxLotLedger:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.table = HoldingsTable.from_records([
+            {"asset_type": "Equity", "asset_id": "RELIANCE", "asset_name": "Reliance Industries Ltd",
+             "quantity": 10.0, "purchase_price": 2000.0, "current_price": 2500.0, "purchase_date": "2023-01-15"},
+            {"asset_type": "Equity", "asset_id": "RELIANCE", "asset_name": "Reliance Industries Ltd",
+             "quantity": 5.0, "purchase_price": 1800.0, "current_price": 2500.0, "purchase_date": "2022-06-30"},
+            {"asset_type": "Mutual Fund", "asset_id": "HDFC123", "asset_name": "HDFC Nifty 50 Index Fund",
+             "quantity": 100.0, "purchase_price": 150.0, "current_price": 180.0, "purchase_date": "2024-02-01"},
+        ])
+
+    def test_fifo_sells_oldest_lot_first(self):
+        """Test a FIFO sell consumes lots by purchase date, not entry order"""
+        ledger = TaxLotLedger.from_holdings(self.table)
+        gain = ledger.sell("RELIANCE", 8, 2600.0, "2024-03-01")
+        realized = ledger.realized_gains()
+        assert realized["lot_id"].tolist() == ["L1", "L0"]
+        assert realized["quantity"].tolist() == [5.0, 3.0]
+        assert gain == pytest.approx(5 * 800.0 + 3 * 600.0)
+        assert realized["term"].tolist() == ["long", "long"]
+        open_lots = ledger.open_lots()
+        assert open_lots.loc[open_lots["asset_id"] == "RELIANCE", "quantity"].tolist() == [7.0]
+
+    def test_specific_lot_sell(self):
+        """Test a sell with a lot id closes that lot and FIFO skips it afterwards"""
+        ledger = TaxLotLedger()
+        ledger.buy("TCS", 5, 3000.0, "2023-01-01")
+        ledger.buy("TCS", 5, 3500.0, "2024-01-01", lot_id="NEW")
+        assert ledger.sell("TCS", 5, 3600.0, "2024-06-01", lot_id="NEW") == pytest.approx(500.0)
+        assert ledger.sell("TCS", 5, 3600.0, "2024-07-01") == pytest.approx(3000.0)
+        assert ledger.realized_gains()["term"].tolist() == ["short", "long"]
+        assert ledger.open_lots().empty
+
+    def test_oversell_and_unknown_lot_raise(self):
+        """Test selling more than is held or from a missing lot raises ValueError"""
+        ledger = TaxLotLedger.from_holdings(self.table)
+        with pytest.raises(ValueError, match="only 15 held"):
+            ledger.sell("RELIANCE", 16, 2500.0, "2024-01-01")
+        with pytest.raises(ValueError, match="Unknown lot"):
+            ledger.sell("RELIANCE", 1, 2500.0, "2024-01-01", lot_id="L2")
+        with pytest.raises(ValueError, match="only 10 left"):
+            ledger.sell("RELIANCE", 11, 2500.0, "2024-01-01", lot_id="L0")
+
+    def test_sell_only_matches_lots_bought_by_the_sale_date(self):
+        """Test FIFO skips lots bought after the sale and a shortfall changes nothing"""
+        ledger = TaxLotLedger()
+        ledger.buy("TCS", 5, 3000.0, "2023-01-01")
+        ledger.buy("TCS", 5, 3500.0, "2024-01-01", lot_id="LATE")
+
+        with pytest.raises(ValueError, match="only 5 bought by then"):
+            ledger.sell("TCS", 8, 3600.0, "2023-06-01")
+        with pytest.raises(ValueError, match="bought on 2024-01-01"):
+            ledger.sell("TCS", 1, 3600.0, "2023-06-01", lot_id="LATE")
+        assert ledger.realized_gains().empty
+
+        ledger.sell("TCS", 8, 3600.0, "2024-06-01")
+        realized = ledger.realized_gains()
+        assert realized["quantity"].tolist() == [5.0, 3.0]
+        assert (realized["holding_days"] >= 0).all()
+
+    def test_replay_sorts_trades_by_date(self):
+        """Test replayed trades apply in date order and invalid files are rejected whole"""
+        trades = pd.DataFrame({
+            "date": ["2024-05-01", "2024-01-10", "2024-02-10"],
+            "action": ["Sell", "buy", "buy"],
+            "asset_id": ["INFY", "INFY", "INFY"],
+            "quantity": [12, 10, 10],
+            "price": [1700, 1500, 1600],
+        })
+        ledger = TaxLotLedger()
+        assert ledger.replay(trades) == 3
+        realized = ledger.realized_gains()
+        assert realized["quantity"].tolist() == [10.0, 2.0]
+        assert realized["gain"].sum() == pytest.approx(10 * 200.0 + 2 * 100.0)
+
+        bad = trades.assign(action=["sell", "buy", "hold"])
+        with pytest.raises(ValueError, match="Action must be one of"):
+            TaxLotLedger().replay(bad)
+
+    def test_replay_rejects_duplicate_lot_ids(self):
+        """Test lot ids are checked before any trade is applied"""
+        ledger = TaxLotLedger.from_holdings(self.table)
+        ledger.buy("TCS", 1, 3000.0, "2023-01-01", lot_id="T1")
+        trades = pd.DataFrame({"date": ["2024-01-01", "2024-01-02"], "action": ["buy", "buy"],
+                               "asset_id": ["TCS", "TCS"], "quantity": [1, 1], "price": [3000, 3100],
+                               "lot_id": ["T2", "T1"]})
+        with pytest.raises(ValueError, match="Duplicate lot id: T1"):
+            ledger.replay(trades)
+        with pytest.raises(ValueError, match="L0 is reserved"):
+            ledger.replay(trades.assign(lot_id=["T2", "L0"]))
+        assert len(ledger) == 4
+
+    def test_positions_aggregate_lots_per_asset(self):
+        """Test positions sum every open lot of an asset and value it at the market price"""
+        ledger = TaxLotLedger.from_holdings(self.table)
+        ledger.sell("RELIANCE", 5, 2600.0, "2024-03-01")
+        positions = ledger.positions().set_index("asset_id")
+        reliance = positions.loc["RELIANCE"]
+        assert reliance["asset_name"] == "Reliance Industries Ltd"
+        assert reliance["lots"] == 1
+        assert reliance["quantity"] == 10.0
+        assert reliance["avg_cost"] == pytest.approx(2000.0)
+        assert reliance["value"] == pytest.approx(25000.0)
+        assert reliance["unrealized_gain"] == pytest.approx(5000.0)
+        assert reliance["realized_gain"] == pytest.approx(5 * 800.0)
+        assert positions.loc["HDFC123", "realized_gain"] == 0.0
+
+    def test_unrealized_gains_as_of(self):
+        """Test open lots report holding days and term against the as-of date"""
+        ledger = TaxLotLedger.from_holdings(self.table)
+        unrealized = ledger.unrealized_gains(as_of="2024-03-02").set_index("lot_id")
+        assert unrealized.loc["L2", "holding_days"] == 30
+        assert unrealized.loc["L2", "term"] == "short"
+        assert unrealized.loc["L1", "term"] == "long"
+        assert unrealized["gain"].sum() == pytest.approx(10 * 500.0 + 5 * 700.0 + 100 * 30.0)
+
+    def test_replay_large_account(self):
+        """Test a year of trades over many lots replays well under a second"""
+        rng = np.random.default_rng(0)
+        n = 30_000
+        assets = np.char.add("ASSET", rng.integers(0, 300, n).astype(str))
+        trades = pd.DataFrame({
+            "date": np.datetime_as_string(np.datetime64("2024-01-01") + rng.integers(0, 300, n), unit="D"),
+            "action": "buy",
+            "asset_id": assets,
+            "quantity": rng.integers(2, 100, n).astype(np.float64),
+            "price": rng.uniform(10, 1000, n),
+        })
+        sells = trades.iloc[::3].assign(date="2024-12-31", action="sell", quantity=1.0)
+        ledger = TaxLotLedger()
+        start = time.perf_counter()
+        ledger.replay(pd.concat([trades, sells], ignore_index=True))
+        assert time.perf_counter() - start < 1.0
+        assert len(ledger.realized_gains()) >= len(sells)
@@ -0,0 +1,138 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+import sys
+import os
+import time
+import tracemalloc
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.xirr import grouped_xirr, solve_xirr
+from utils.portfolio_manager import PortfolioManager
+
+
+def _scalar_xirr(amounts, years):
+    """Reference XIRR by plain bisection on one cash-flow vector"""
+    def npv(rate):
+        return sum(a * (1 + rate) ** -t for a, t in zip(amounts, years))
+    lo, hi = -0.99, 10.0
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if np.sign(npv(mid)) == np.sign(npv(lo)):
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+class TestXirr:
+
+    def setup_method(self):
+        """Setup test data"""
+        self.portfolio_manager = PortfolioManager("test_portfolio.json")
+
+    def test_two_flows_match_cagr(self):
+        """Test a single purchase and current value solve to the CAGR"""
+        rates = solve_xirr([[-100.0, 150.0], [-100.0, 80.0]], [[-2.0, 0.0], [-0.5, 0.0]])
+        assert rates[0] == pytest.approx(1.5 ** 0.5 - 1, rel=1e-9)
+        assert rates[1] == pytest.approx(0.8 ** 2 - 1, rel=1e-9)
+
+    def test_multiple_flows_match_scalar_reference(self):
+        """Test padded multi-flow rows against a scalar root-find"""
+        amounts = np.array([
+            [-1000.0, -500.0, -250.0, 2100.0],
+            [-1000.0, 300.0, 0.0, 900.0],
+            [-50.0, -50.0, -50.0, 140.0],
+        ])
+        years = np.array([
+            [-3.0, -2.0, -0.5, 0.0],
+            [-2.0, -1.0, 0.0, 0.0],
+            [-1.5, -1.0, -0.25, 0.0],
+        ])
+        rates = solve_xirr(amounts, years)
+        for row, rate in enumerate(rates):
+            assert rate == pytest.approx(_scalar_xirr(amounts[row], years[row]), abs=1e-8)
+
+    def test_no_solution_is_nan(self):
+        """Test rows without a sign change or with missing dates return NaN"""
+        rates = solve_xirr(
+            [[-100.0, -50.0], [-100.0, 150.0], [-100.0, 150.0]],
+            [[-1.0, 0.0], [0.0, 0.0], [np.nan, 0.0]],
+        )
+        assert np.isnan(rates).all()
+
+    def test_grouped_xirr_groups_lots(self):
+        """Test lots in the same group share one cash-flow vector"""
+        rates = grouped_xirr(
+            groups=np.array([1, 0, 1]),
+            costs=np.array([1000.0, 100.0, 500.0]),
+            holding_years=np.array([3.0, 1.0, 2.0]),
+            values=np.array([1200.0, 110.0, 600.0]),
+        )
+        assert rates[0] == pytest.approx(0.10, rel=1e-9)
+        assert rates[1] == pytest.approx(_scalar_xirr([-1000.0, -500.0, 1800.0], [-3.0, -2.0, 0.0]), abs=1e-8)
+
+    def test_compute_metrics_xirr_matches_cagr(self):
+        """Test per-holding XIRR equals CAGR for single-lot holdings"""
+        df = pd.DataFrame([
+            {"asset_id": "A", "asset_name": "A", "asset_type": "equity", "quantity": 10,
+             "purchase_price": 100.0, "current_price": 150.0, "purchase_date": "2022-01-15"},
+            {"asset_id": "B", "asset_name": "B", "asset_type": "debt", "quantity": 5,
+             "purchase_price": 200.0, "current_price": 180.0, "purchase_date": "2024-06-30"},
+        ])
+        metrics_df = self.portfolio_manager.compute_metrics(df, as_of=datetime(2025, 1, 15))
+        np.testing.assert_allclose(metrics_df["xirr"], metrics_df["cagr"], rtol=1e-8)
+
+    def test_portfolio_and_asset_xirr(self):
+        """Test portfolio XIRR combines lots and undated lots are left out"""
+        df = pd.DataFrame([
+            {"asset_id": "A", "asset_name": "A", "asset_type": "equity", "quantity": 10,
+             "purchase_price": 100.0, "current_price": 121.0, "purchase_date": "2023-01-15"},
+            {"asset_id": "A", "asset_name": "A", "asset_type": "equity", "quantity": 10,
+             "purchase_price": 110.0, "current_price": 121.0, "purchase_date": "2024-01-15"},
+            {"asset_id": "B", "asset_name": "B", "asset_type": "debt", "quantity": 1,
+             "purchase_price": 100.0, "current_price": 100.0, "purchase_date": "not a date"},
+        ])
+        metrics_df = self.portfolio_manager.compute_metrics(df, as_of=datetime(2025, 1, 15))
+        by_asset = self.portfolio_manager.xirr_by_asset(metrics_df)
+        assert list(by_asset["asset_id"]) == ["A"]
+        assert by_asset["lots"].iloc[0] == 2
+        assert by_asset["xirr"].iloc[0] == pytest.approx(self.portfolio_manager.portfolio_xirr(metrics_df))
+        assert np.isnan(metrics_df["xirr"].iloc[2])
+
+    def test_large_batch_is_fast(self):
+        """Test tens of thousands of holdings solve in one vectorized call"""
+        rng = np.random.default_rng(0)
+        n = 50_000
+        costs = rng.uniform(100, 10_000, n)
+        holding_years = rng.uniform(0.1, 10, n)
+        growth = rng.uniform(-0.5, 0.5, n)
+        values = costs * (1 + growth) ** holding_years
+        start = time.perf_counter()
+        rates = grouped_xirr(np.arange(n), costs, holding_years, values)
+        elapsed = time.perf_counter() - start
+        np.testing.assert_allclose(rates, growth, atol=1e-8)
+        assert elapsed < 5.0
+
+    def test_uneven_groups_are_not_padded(self):
+        """Test one asset with many lots next to many single-lot assets needs no dense matrix"""
+        rng = np.random.default_rng(1)
+        n_small, n_lots = 2000, 20_000
+        groups = np.concatenate([np.zeros(n_lots, dtype=np.intp), np.arange(1, n_small + 1)])
+        costs = rng.uniform(100, 10_000, len(groups))
+        holding_years = rng.uniform(0.1, 10, len(groups))
+        growth = np.concatenate([np.full(n_lots, 0.12), rng.uniform(-0.5, 0.5, n_small)])
+        values = costs * (1 + growth) ** holding_years
+
+        tracemalloc.start()
+        try:
+            rates = grouped_xirr(groups, costs, holding_years, values)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        np.testing.assert_allclose(rates, np.concatenate([[0.12], growth[n_lots:]]), atol=1e-8)
+        # A padded (groups, max lots + 1) float64 matrix would take 2001 x 20001 x 8 bytes, about 320 MB
+        assert peak < 50_000_000